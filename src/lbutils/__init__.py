@@ -1,6 +1,8 @@
 from .targets import *
 from .file_helpers import *
 from .build_image import build_image
+from .build_context import BuildContext
+from .async_build import build_image_async
 
 __all__ = [
     # targets
@@ -10,13 +12,21 @@ __all__ = [
     "StaticFile",
     "AptPreference", "AptPreferenceType",
     "DirectConfig",
+    "CopyStrategy",
+    "SyncOptions",
+    "frozen_target_type", "freeze_target", "thaw_target",
 
     # file_helpers
     "render_template_to_file",
     "render_template_to_string",
+    "get_template_environment",
     "escape_string_for_shell_script",
     "download_file",
 
     # build_image
     "build_image",
-]
\ No newline at end of file
+
+    # async_build
+    "BuildContext",
+    "build_image_async",
+]
@@ -0,0 +1,109 @@
+import asyncio
+
+from .auto_scripts.auto_scripts import AutoScriptType
+from .auto_scripts.auto_scripts import write_auto_script
+from .build_context import BuildContext
+from .defaults import DEFAULT_LOGGER
+from .defaults import DEFAULT_RESOLVE_WORKERS
+from .extensions import copy_bootloaders
+from .live_build import LBOperation
+from .live_build import remove_build_dir
+from .live_build import run_lb_operation_async
+from .package_cache import PackageCache
+from .target_writer import TargetWriter
+from .target_writer import create_target_handlers
+
+
+async def build_image_async(
+    targets: list,
+    context: BuildContext = None,
+    fresh_build: bool = True,
+    skip_build: bool = False,
+    resolve_workers: int = DEFAULT_RESOLVE_WORKERS,
+    handler_workers: int = 1,
+    keep_cache: bool = False,
+    package_cache: PackageCache = None,
+    background_remove: bool = False,
+):
+    """
+    Build image from targets without blocking the event loop. Same as :func:`lbutils.build_image`, but paths,
+    binaries and logger come from ``context``, so several builds can run concurrently in one process.
+
+    ``lb`` runs as asyncio subprocesses, and file operations run in worker threads. Cancelling the build task
+    terminates running ``lb`` processes, or waits for the running file operation, before the cancellation propagates.
+
+    :param Iterable targets: Targets to process. Elements can be :class:`Target` or iterables of them, nested
+       arbitrarily. Iterables are consumed lazily, so generators can be given directly.
+    :param BuildContext,Optional context: Build settings. Module defaults are used if not given.
+    :param bool fresh_build: If ``True``, remove build directory before performing any operations for fresh build.
+    :param bool skip_build: If ``True``, ``lb build`` won't run.
+    :param int resolve_workers: Number of threads resolving target callbacks. See :class:`TargetWriter`.
+    :param int handler_workers: Number of target handlers running at the same time. See :class:`TargetWriter`.
+    :param bool keep_cache: If ``True``, fresh build keeps live-build caches under the build directory.
+    :param PackageCache,Optional package_cache: Package cache shared with other build directories.
+    :param bool background_remove: If ``True``, fresh build removes the old build directory in background.
+    """
+    context = BuildContext() if context is None else context
+    iso_build_dir = context.iso_build_dir
+
+    with context.activate():
+        DEFAULT_LOGGER.info(f"Cleanup build directory {iso_build_dir}")
+        await _run_in_thread(remove_build_dir, iso_build_dir=iso_build_dir, exist_ok=not fresh_build,
+                              keep_cache=keep_cache, background=background_remove)
+
+        DEFAULT_LOGGER.info(f"Write auto-scripts")
+        await _run_in_thread(_write_auto_scripts, context)
+
+        DEFAULT_LOGGER.info(f"Run lb config")
+        await run_lb_operation_async(
+            operation=LBOperation.CONFIG, iso_build_dir=iso_build_dir, live_build_binary=context.live_build_binary)
+
+        DEFAULT_LOGGER.info(f"Write targets")
+        target_writer = TargetWriter(
+            target_handlers=create_target_handlers(iso_build_dir, dpkg_name_binary=context.dpkg_name_binary),
+            targets=[
+                targets,
+                copy_bootloaders(iso_build_dir=iso_build_dir, source_bootloader_dir=context.source_bootloader_dir),
+            ],
+            resolve_workers=resolve_workers,
+            handler_workers=handler_workers,
+        )
+        await _run_in_thread(target_writer.execute)
+
+        DEFAULT_LOGGER.info(f"Build image")
+        if skip_build:
+            DEFAULT_LOGGER.info(f"Skip build")
+            return
+
+        if package_cache is not None:
+            await _run_in_thread(package_cache.restore, iso_build_dir)
+
+        try:
+            await run_lb_operation_async(
+                operation=LBOperation.BUILD, iso_build_dir=iso_build_dir, live_build_binary=context.live_build_binary)
+        finally:
+            if package_cache is not None:
+                await _run_in_thread(package_cache.save, iso_build_dir)
+
+
+def _write_auto_scripts(context: BuildContext):
+    write_auto_script(
+        iso_build_dir=context.iso_build_dir,
+        script_type=AutoScriptType.CONFIG,
+        distribution=context.distribution, image_name=context.image_name)
+    write_auto_script(iso_build_dir=context.iso_build_dir, script_type=AutoScriptType.BUILD)
+    write_auto_script(iso_build_dir=context.iso_build_dir, script_type=AutoScriptType.CLEAN)
+
+
+async def _run_in_thread(func, *args, **kwargs):
+    """
+    Run ``func`` in a worker thread with the current context. Threads can't be interrupted, so on cancellation, wait
+    for ``func`` to finish before propagating it. Otherwise the build directory could still be modified after the
+    build task is cancelled.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
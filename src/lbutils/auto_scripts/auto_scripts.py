@@ -4,7 +4,8 @@ from pathlib import Path
 
 from lbutils import defaults
 from lbutils.defaults import DEFAULT_LOGGER
-from lbutils.file_helpers import render_template_to_file
+from lbutils.file_helpers import render_template_to_file, render_template_to_string
+from lbutils.plan import FileOperation, FileOperationType
 from dataclasses import dataclass
 
 
@@ -61,6 +62,28 @@ def write_auto_script(iso_build_dir: Path, script_type: AutoScriptType, source_s
     DEFAULT_LOGGER.info(f"Auto script {script_type} saved.")
 
 
+def plan_auto_script(iso_build_dir: Path, script_type: AutoScriptType, source_script_path: Path = None, **kwargs) -> FileOperation:
+    """
+    Planned operation of :func:`write_auto_script`. The script is rendered in memory to get its size.
+
+    :param pathlib.Path iso_build_dir: Image build directory.
+    :param AutoScriptType script_type: Which type of auto script to write.
+    :param pathlib.Path,Optional source_script_path: Source script template. See :func:`write_auto_script`.
+    :param kwargs: Additional kwargs to render the template.
+    :return: Planned operation.
+    :rtype: FileOperation
+    """
+    script_info = __get_script_info(iso_build_dir, script_type)
+
+    source_script_path = script_info.default_source_script_path if source_script_path is None else source_script_path
+    rendered_script = render_template_to_string(source_script_path, **kwargs)
+
+    return FileOperation(
+        operation_type=FileOperationType.WRITE, handler="auto_scripts", target=script_type.value,
+        source=source_script_path, destination=script_info.target_script_path, size=len(rendered_script.encode()),
+    )
+
+
 def __get_script_info(iso_build_dir: Path, script_type: AutoScriptType) -> __AutoScriptInfo:
     """
     Get script info for given auto script type.
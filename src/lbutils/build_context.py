@@ -0,0 +1,77 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from lbutils import defaults
+
+
+@dataclass
+class BuildContext:
+    """
+    Settings of a single build, used instead of module defaults so several builds can run in one process.
+    See :func:`lbutils.async_build.build_image_async`.
+
+    :param pathlib.Path iso_build_dir: Image build directory.
+    :param logging.Logger logger: Logger receiving logs of the build, including logs of :const:`defaults.DEFAULT_LOGGER`
+       emitted while the context is active.
+    :param str distribution: Base Debian distribution for image.
+    :param str image_name: Name of image.
+    :param pathlib.Path live_build_binary: Live build binary path.
+    :param pathlib.Path dpkg_name_binary: dpkg-name binary path.
+    :param pathlib.Path source_bootloader_dir: Bootloaders copied to the image. See
+       :func:`lbutils.extensions.copy_bootloaders`.
+    """
+    iso_build_dir: Path = defaults.DEFAULT_ISO_BUILD_DIR
+    logger: logging.Logger = defaults.DEFAULT_LOGGER
+    distribution: str = defaults.DEFAULT_DISTRIBUTION
+    image_name: str = defaults.DEFAULT_IMAGE_NAME
+    live_build_binary: Path = defaults.DEFAULT_LIVE_BUILD_BINARY
+    dpkg_name_binary: Path = defaults.DEFAULT_DPKG_NAME_BINARY
+    source_bootloader_dir: Path = defaults.BUILTIN_BOOTLOADER_DIR
+
+    @contextmanager
+    def activate(self):
+        """
+        Make this context the current build context of the running task or thread while in the context.
+        Threads started via :func:`asyncio.to_thread` or with a copied :mod:`contextvars` context inherit it.
+        """
+        token = CURRENT_BUILD_CONTEXT.set(self)
+        try:
+            yield self
+        finally:
+            CURRENT_BUILD_CONTEXT.reset(token)
+
+
+CURRENT_BUILD_CONTEXT: ContextVar[Optional[BuildContext]] = ContextVar("lbutils_build_context", default=None)
+"""
+Build context of the running task or thread. ``None`` outside of builds with a context.
+"""
+
+
+def current_build_context() -> Optional[BuildContext]:
+    """
+    :return: Build context of the running task or thread, or ``None``.
+    :rtype: BuildContext
+    """
+    return CURRENT_BUILD_CONTEXT.get()
+
+
+class BuildContextFilter(logging.Filter):
+    """
+    Redirects records of the logger it's attached to, to the logger of the current :class:`BuildContext`.
+    Records are kept as is if there's no build context or the context uses the same logger.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = CURRENT_BUILD_CONTEXT.get()
+        if context is None or context.logger.name == record.name:
+            return True
+
+        if context.logger.isEnabledFor(record.levelno):
+            context.logger.handle(record)
+        return False
+
+
+defaults.DEFAULT_LOGGER.addFilter(BuildContextFilter())
@@ -0,0 +1,275 @@
+import heapq
+import itertools
+import os
+import time
+from contextlib import ExitStack
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from enum import StrEnum
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from lbutils import defaults
+from lbutils.build_image import build_image
+from lbutils.locking import file_lock
+
+
+class JobState(StrEnum):
+    """
+    State of a :class:`BuildJob` in a :class:`BuildFarm`.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class BuildJob:
+    """
+    A build request of a :class:`BuildFarm`.
+
+    :param str name: Unique job name. Used as name of the job's image build directory, so it must be a single path
+       component: not empty, without ``/`` and not starting with ``.``, which also rules out ``.`` and ``..``.
+    :param Callable targets_factory: Function returning targets of the image. Jobs run in other processes and
+       targets usually hold lambdas, so targets are created in the worker process. Must be picklable, e.g. a
+       module-level function.
+    :param int priority: Jobs with higher priority start first. Jobs with the same priority start in submission order.
+    :param dict build_options: Additional keyword arguments of :func:`lbutils.build_image`, except ``targets``
+       and ``iso_build_dir``.
+    """
+    name: str
+    targets_factory: Callable[[], list]
+    priority: int = 0
+    build_options: dict = field(default_factory=dict)
+
+
+@dataclass
+class JobResult:
+    """
+    Status of a :class:`BuildJob`.
+
+    :param str name: Job name.
+    :param JobState state: Job state.
+    :param pathlib.Path iso_build_dir: Image build directory of the job.
+    :param BaseException,Optional error: Error raised by the job if it failed.
+    :param float queued_at: Submission time, from :func:`time.monotonic`.
+    :param float,Optional started_at: Start time.
+    :param float,Optional finished_at: Finish time.
+    """
+    name: str
+    state: JobState
+    iso_build_dir: Path
+    error: Optional[BaseException] = None
+    queued_at: float = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def wait_seconds(self) -> Optional[float]:
+        """
+        Seconds the job stayed in queue.
+        """
+        return None if self.started_at is None else self.started_at - self.queued_at
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        """
+        Seconds the job ran.
+        """
+        return None if self.started_at is None or self.finished_at is None else self.finished_at - self.started_at
+
+
+@dataclass
+class QueueMetrics:
+    """
+    Snapshot of a :class:`BuildFarm` queue.
+
+    :param int queued: Jobs waiting for a worker.
+    :param int running: Jobs running.
+    :param int succeeded: Jobs succeeded.
+    :param int failed: Jobs failed.
+    :param int cancelled: Jobs cancelled before starting.
+    :param int max_workers: Concurrency limit.
+    :param int peak_queued: Highest number of waiting jobs so far.
+    :param float mean_wait_seconds: Mean seconds started jobs waited in queue.
+    """
+    queued: int
+    running: int
+    succeeded: int
+    failed: int
+    cancelled: int
+    max_workers: int
+    peak_queued: int
+    mean_wait_seconds: float
+
+
+class BuildFarm:
+    """
+    Runs many :func:`lbutils.build_image` jobs on a process pool. Every job builds in its own directory under
+    ``farm_dir`` and holds a host-wide lock on it, so jobs of this or other farms on the same host never share a
+    build directory. A job whose directory is locked fails without touching it.
+
+    :param pathlib.Path farm_dir: Directory containing build directories of jobs.
+    :param int,Optional max_workers: Maximum number of jobs running at the same time. Number of CPUs by default.
+       ``lb build`` is mostly IO and network bound, but a few concurrent builds already saturate disks.
+    :param Callable,Optional executor_factory: Function creating the executor from ``max_workers``.
+       :class:`concurrent.futures.ProcessPoolExecutor` by default.
+    """
+    def __init__(
+        self,
+        farm_dir: Path,
+        max_workers: int = None,
+        executor_factory: Callable[[int], Executor] = ProcessPoolExecutor,
+    ):
+        self.__farm_dir = farm_dir
+        self.__max_workers = max_workers if max_workers is not None else os.cpu_count() or 1
+        self.__executor_factory = executor_factory
+
+        self.__queue: List[tuple] = []
+        self.__sequence = itertools.count()
+        self.__jobs: Dict[str, BuildJob] = {}
+        self.__results: Dict[str, JobResult] = {}
+        self.__peak_queued = 0
+
+    @property
+    def farm_dir(self) -> Path:
+        return self.__farm_dir
+
+    def submit(self, job: BuildJob) -> JobResult:
+        """
+        Queue a job. Queued jobs start when :meth:`run` is called.
+
+        :param BuildJob job: Job to queue.
+        :return: Result of the job, updated as the job runs.
+        :rtype: JobResult
+        """
+        if not job.name or job.name.startswith(".") or "/" in job.name or "\0" in job.name:
+            # The build directory of the job is removed for fresh builds, so it must stay under the farm directory
+            # and apart from its hidden state, e.g. ".locks"
+            raise Exception(f"Job name {job.name!r} must be a single path component not starting with '.'")
+        if job.name in self.__jobs:
+            raise Exception(f"Job {job.name} is already submitted")
+
+        self.__jobs[job.name] = job
+        self.__results[job.name] = JobResult(
+            name=job.name, state=JobState.QUEUED,
+            iso_build_dir=self.__farm_dir / job.name, queued_at=time.monotonic(),
+        )
+        heapq.heappush(self.__queue, (-job.priority, next(self.__sequence), job.name))
+        self.__peak_queued = max(self.__peak_queued, self.__queued_count())
+
+        defaults.DEFAULT_LOGGER.info(f"Job {job.name} queued with priority {job.priority}.")
+        return self.__results[job.name]
+
+    def cancel(self, name: str) -> bool:
+        """
+        Cancel a job which hasn't started.
+
+        :param str name: Job name.
+        :return: ``True`` if the job is cancelled.
+        :rtype: bool
+        """
+        result = self.__results[name]
+        if result.state is not JobState.QUEUED:
+            return False
+
+        result.state = JobState.CANCELLED
+        defaults.DEFAULT_LOGGER.info(f"Job {name} cancelled.")
+        return True
+
+    def metrics(self) -> QueueMetrics:
+        """
+        :return: Current queue metrics.
+        :rtype: QueueMetrics
+        """
+        states = [result.state for result in self.__results.values()]
+        wait_seconds = [result.wait_seconds for result in self.__results.values() if result.wait_seconds is not None]
+
+        return QueueMetrics(
+            queued=states.count(JobState.QUEUED),
+            running=states.count(JobState.RUNNING),
+            succeeded=states.count(JobState.SUCCEEDED),
+            failed=states.count(JobState.FAILED),
+            cancelled=states.count(JobState.CANCELLED),
+            max_workers=self.__max_workers,
+            peak_queued=self.__peak_queued,
+            mean_wait_seconds=sum(wait_seconds) / len(wait_seconds) if wait_seconds else 0,
+        )
+
+    def results(self) -> Dict[str, JobResult]:
+        """
+        :return: Map of job name to its result.
+        :rtype: Dict[str, JobResult]
+        """
+        return dict(self.__results)
+
+    def run(self) -> Dict[str, JobResult]:
+        """
+        Run queued jobs until the queue is empty, keeping at most ``max_workers`` jobs running. Failed jobs don't
+        stop other jobs.
+
+        :return: Map of job name to its result.
+        :rtype: Dict[str, JobResult]
+        """
+        running: Dict[Future, str] = {}
+
+        with self.__executor_factory(self.__max_workers) as executor:
+            while True:
+                while len(running) < self.__max_workers and self.__queue:
+                    _, _, name = heapq.heappop(self.__queue)
+                    if self.__results[name].state is not JobState.QUEUED:
+                        continue
+                    running[self.__start(executor, name)] = name
+
+                if not running:
+                    break
+
+                defaults.DEFAULT_LOGGER.info(f"Build farm metrics: {self.metrics()}")
+                done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.__finish(running.pop(future), future)
+
+        return self.results()
+
+    def __start(self, executor: Executor, name: str) -> Future:
+        job = self.__jobs[name]
+        result = self.__results[name]
+        result.state = JobState.RUNNING
+        result.started_at = time.monotonic()
+
+        defaults.DEFAULT_LOGGER.info(f"Job {name} started in {result.iso_build_dir}.")
+        return executor.submit(
+            _run_job,
+            iso_build_dir=result.iso_build_dir,
+            lock_file=self.__farm_dir / ".locks" / f"{name}.lock",
+            targets_factory=job.targets_factory,
+            build_options=job.build_options,
+        )
+
+    def __finish(self, name: str, future: Future):
+        result = self.__results[name]
+        result.finished_at = time.monotonic()
+        result.error = future.exception()
+
+        if result.error is None:
+            result.state = JobState.SUCCEEDED
+            defaults.DEFAULT_LOGGER.info(f"Job {name} succeeded in {result.run_seconds:.1f} seconds.")
+        else:
+            result.state = JobState.FAILED
+            defaults.DEFAULT_LOGGER.error(f"Job {name} failed: {result.error!r}")
+
+    def __queued_count(self) -> int:
+        return sum(1 for result in self.__results.values() if result.state is JobState.QUEUED)
+
+
+def _run_job(iso_build_dir: Path, lock_file: Path, targets_factory: Callable[[], list], build_options: dict):
+    # Runs in worker processes, so it must be importable by name
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(file_lock(lock_file, blocking=False))
+        except BlockingIOError as e:
+            raise Exception(f"Build directory {iso_build_dir} is used by another job") from e
+
+        build_image(targets=targets_factory(), iso_build_dir=iso_build_dir, **build_options)
@@ -1,26 +1,25 @@
 from pathlib import Path
 
 from .auto_scripts.auto_scripts import AutoScriptType
-from .auto_scripts.auto_scripts import write_auto_script
+from .auto_scripts.auto_scripts import write_auto_script, plan_auto_script
 from .defaults import DEFAULT_ISO_BUILD_DIR
 from .defaults import DEFAULT_LOGGER
 from .defaults import DEFAULT_DISTRIBUTION, DEFAULT_IMAGE_NAME
+from .defaults import DEFAULT_RESOLVE_WORKERS, DEFAULT_COPY_WORKERS
 from .live_build import LBOperation
-from .live_build import remove_build_dir
-from .live_build import run_lb_operation
-from .target_writer import AptPreferencesWriter
-from .target_writer import CustomDebWriter
-from .target_writer import DirectConfigWriter
-from .target_writer import HookScriptWriter
-from .target_writer import StaticFileWriter
+from .live_build import remove_build_dir, invalidate_build_stages
+from .live_build import run_lb_operation, plan_lb_operation
+from .copy_engine import CopyEngine
+from .targets import CopyStrategy
+from .checkpoint import BuildCheckpoints, BuildPhase, fingerprint
+from .manifest import BuildManifest
+from .deb_store import DebStore
+from .package_cache import PackageCache
+from .preflight import PackageIndex, check_packages
+from .plan import BuildPlan, FileOperation, FileOperationType
+from .trace import Tracer
 from .target_writer import TargetWriter
-from .target_writer import UpstreamPackagesWriter
-from .targets import AptPreference
-from .targets import CustomDeb
-from .targets import DirectConfig
-from .targets import HookScript
-from .targets import StaticFile
-from .targets import UpstreamPackages
+from .target_writer import create_target_handlers
 from .extensions import copy_bootloaders
 
 
@@ -30,50 +29,264 @@ def build_image(
     distribution: str = DEFAULT_DISTRIBUTION,
     image_name: str = DEFAULT_IMAGE_NAME,
     skip_build: bool = False,
-):
+    incremental: bool = False,
+    resolve_workers: int = DEFAULT_RESOLVE_WORKERS,
+    handler_workers: int = 1,
+    plan: bool = False,
+    trace_file: Path = None,
+    keep_cache: bool = False,
+    package_cache: PackageCache = None,
+    background_remove: bool = False,
+    resume: bool = False,
+    bundle_hooks: bool = False,
+    copy_strategy: CopyStrategy = CopyStrategy.COPY,
+    copy_workers: int = DEFAULT_COPY_WORKERS,
+    deb_store: DebStore = None,
+    package_index: PackageIndex = None,
+    validate: bool = False,
+) -> BuildPlan | None:
     """
     Build image from targets.
 
-    :param List targets: Targets to process. Elements can be :class:`Target` or List[:class:`Target`].
+    :param Iterable targets: Targets to process. Elements can be :class:`Target` or iterables of them, nested
+       arbitrarily. Iterables are consumed lazily, so generators can be given directly.
     :param pathlib.Path,Optional iso_build_dir: Image build directory.
     :param bool fresh_build: If ``True``, remove build directory before performing any operations for fresh build.
     :param str distribution: Base Debian distribution for image. ``trixie`` by default.
     :param str image_name: Name of image. ``myos`` by default.
     :param bool skip_build: If ``True``, ``lb build`` won't run.
+    :param bool incremental: If ``True``, keep the build directory and only rewrite targets whose inputs changed
+       since last incremental build, based on the manifest under the build directory. See
+       :class:`lbutils.manifest.BuildManifest`. ``fresh_build`` only takes effect when there's no manifest yet.
+       If any target is rewritten, stages of the previous ``lb build`` are invalidated, see
+       :func:`lbutils.live_build.invalidate_build_stages`.
+    :param int resolve_workers: Number of threads resolving target callbacks. See :class:`TargetWriter`.
+    :param int handler_workers: Number of target handlers running at the same time. Handlers writing overlapping
+       paths are still serialized. See :class:`TargetWriter`.
+    :param bool plan: If ``True``, only compute operations the build would perform and return them, without touching
+       the build directory or running ``lb``. Target callbacks are still called. Targets are planned as a fresh
+       build even for incremental builds.
+    :param pathlib.Path,Optional trace_file: If given, export timing of every build phase to this file in Chrome trace
+       event format, even if the build fails. See :class:`lbutils.trace.Tracer`.
+    :param bool keep_cache: If ``True``, fresh build keeps live-build caches, e.g. downloaded packages and bootstrap,
+       under the build directory. See :func:`lbutils.live_build.remove_build_dir`.
+    :param PackageCache,Optional package_cache: Package cache shared with other build directories. Cached packages
+       are restored before building, and downloaded packages are saved to it after building, even if the build fails.
+    :param bool background_remove: If ``True``, fresh build renames the old build directory aside and removes it in
+       background instead of waiting for removal. The build waits for removal after ``lb build``.
+       See :func:`lbutils.live_build.remove_build_dir`.
+    :param bool resume: If ``True``, record a checkpoint with a fingerprint of inputs after each phase, and resume
+       a previous build of ``iso_build_dir`` from the first phase whose inputs changed or which never completed.
+       The build directory is kept if there are checkpoints. Target callbacks are always called to fingerprint
+       targets. Targets are written incrementally (see ``incremental``) when their phase runs again, so outputs of
+       the previous attempt are replaced. Stages of the previous ``lb build`` are invalidated if ``lb config`` runs
+       again or any target is rewritten. See :class:`lbutils.checkpoint.BuildCheckpoints`.
+    :param bool bundle_hooks: If ``True``, consecutive hooks are bundled into one chroot hook. See
+       :class:`lbutils.target_writer.HookScriptWriter`.
+    :param CopyStrategy copy_strategy: How static files and direct configs are copied, unless their targets specify
+       one. :attr:`CopyStrategy.COPY` by default. See :class:`lbutils.copy_engine.CopyEngine`.
+    :param int copy_workers: Number of threads copying files of directory sources.
+    :param DebStore,Optional deb_store: Content-addressed store custom debs are hardlinked from, shared with other
+       build directories. Custom debs are copied if not given.
+    :param PackageIndex,Optional package_index: Index of the repositories the image is built from. If given, check
+       that upstream packages exist and dependencies of packages and custom debs can be satisfied before writing
+       targets, and fail early otherwise. See :func:`lbutils.preflight.check_packages`.
+    :param bool validate: If ``True``, fail before writing targets if targets conflict, e.g. static files writing the
+       same path or package sets sharing a code. See :func:`lbutils.validation.validate_targets`.
+    :return: Planned operations if ``plan`` is ``True``, otherwise ``None``.
+    :rtype: BuildPlan
     """
-    DEFAULT_LOGGER.info(f"Cleanup build directory {iso_build_dir}")
-    remove_build_dir(iso_build_dir=iso_build_dir, exist_ok=fresh_build)
+    if plan:
+        return _plan_image(
+            targets=targets, iso_build_dir=iso_build_dir, fresh_build=fresh_build,
+            distribution=distribution, image_name=image_name, skip_build=skip_build,
+            resolve_workers=resolve_workers, bundle_hooks=bundle_hooks,
+        )
+
+    tracer = Tracer(enabled=trace_file is not None)
+    try:
+        with tracer.span("build_image", iso_build_dir=iso_build_dir):
+            _build_image(
+                targets=targets, iso_build_dir=iso_build_dir, fresh_build=fresh_build,
+                distribution=distribution, image_name=image_name, skip_build=skip_build,
+                incremental=incremental, resolve_workers=resolve_workers, handler_workers=handler_workers,
+                keep_cache=keep_cache, package_cache=package_cache, background_remove=background_remove,
+                resume=resume, bundle_hooks=bundle_hooks, copy_strategy=copy_strategy, copy_workers=copy_workers,
+                deb_store=deb_store, package_index=package_index, validate=validate,
+                tracer=tracer,
+            )
+    finally:
+        if trace_file is not None:
+            tracer.export(trace_file)
+
+
+def _build_image(
+    targets: list, iso_build_dir: Path, fresh_build: bool,
+    distribution: str, image_name: str, skip_build: bool,
+    incremental: bool, resolve_workers: int, handler_workers: int,
+    keep_cache: bool, package_cache: PackageCache, background_remove: bool, resume: bool, bundle_hooks: bool,
+    copy_strategy: CopyStrategy, copy_workers: int, deb_store: DebStore,
+    package_index: PackageIndex, validate: bool, tracer: Tracer,
+):
+    manifest = BuildManifest.load(iso_build_dir) if incremental else None
+    checkpoints = BuildCheckpoints.load(iso_build_dir) if resume else None
+
+    removal = None
+    if manifest is not None and manifest.exists():
+        DEFAULT_LOGGER.info(f"Keep build directory {iso_build_dir} for incremental build")
+    elif checkpoints is not None and checkpoints.exists():
+        DEFAULT_LOGGER.info(f"Keep build directory {iso_build_dir} to resume build")
+    else:
+        DEFAULT_LOGGER.info(f"Cleanup build directory {iso_build_dir}")
+        with tracer.span("remove_build_dir"):
+            removal = remove_build_dir(
+                iso_build_dir=iso_build_dir, exist_ok=not fresh_build, keep_cache=keep_cache,
+                background=background_remove,
+            )
+
+    if manifest is None and resume:
+        # Resumed builds rewrite targets over the kept build directory, so outputs of the previous attempt are
+        # tracked to be replaced rather than appended to
+        manifest = BuildManifest.load(iso_build_dir)
+
+    def write_auto_scripts():
+        DEFAULT_LOGGER.info(f"Write auto-scripts")
+        with tracer.span("write_auto_script", script_type=AutoScriptType.CONFIG.value):
+            write_auto_script(
+                iso_build_dir=iso_build_dir,
+                script_type=AutoScriptType.CONFIG,
+                distribution=distribution, image_name=image_name)
+        with tracer.span("write_auto_script", script_type=AutoScriptType.BUILD.value):
+            write_auto_script(iso_build_dir=iso_build_dir, script_type=AutoScriptType.BUILD)
+        with tracer.span("write_auto_script", script_type=AutoScriptType.CLEAN.value):
+            write_auto_script(iso_build_dir=iso_build_dir, script_type=AutoScriptType.CLEAN)
 
-    DEFAULT_LOGGER.info(f"Write auto-scripts")
-    write_auto_script(
-        iso_build_dir=iso_build_dir,
-        script_type=AutoScriptType.CONFIG,
-        distribution=distribution, image_name=image_name)
-    write_auto_script(iso_build_dir=iso_build_dir, script_type=AutoScriptType.BUILD)
-    write_auto_script(iso_build_dir=iso_build_dir, script_type=AutoScriptType.CLEAN)
+    auto_scripts_fingerprint = fingerprint(distribution, image_name)
+    _run_phase(checkpoints, BuildPhase.AUTO_SCRIPTS, auto_scripts_fingerprint, write_auto_scripts)
 
-    DEFAULT_LOGGER.info(f"Run lb config")
-    run_lb_operation(operation=LBOperation.CONFIG, iso_build_dir=iso_build_dir)
+    def run_lb_config():
+        DEFAULT_LOGGER.info(f"Run lb config")
+        with tracer.span("lb config"):
+            run_lb_operation(operation=LBOperation.CONFIG, iso_build_dir=iso_build_dir)
+        if checkpoints is not None:
+            # Resumed builds only get here if auto-scripts or their inputs changed, so stages of previous builds,
+            # e.g. a bootstrapped chroot of another distribution, are stale
+            with tracer.span("invalidate_build_stages"):
+                invalidate_build_stages(iso_build_dir=iso_build_dir)
+
+    lb_config_fingerprint = fingerprint(auto_scripts_fingerprint, LBOperation.CONFIG.value)
+    _run_phase(checkpoints, BuildPhase.LB_CONFIG, lb_config_fingerprint, run_lb_config)
 
     DEFAULT_LOGGER.info(f"Attach built-in targets")
     copy_bootloaders_target = copy_bootloaders(iso_build_dir=iso_build_dir)
-    targets.append(copy_bootloaders_target)
-
-    DEFAULT_LOGGER.info(f"Write targets")
-    TargetWriter(
-        target_handlers={
-            UpstreamPackages: UpstreamPackagesWriter(iso_build_dir=iso_build_dir),
-            CustomDeb: CustomDebWriter(iso_build_dir=iso_build_dir),
-            HookScript: HookScriptWriter(iso_build_dir=iso_build_dir),
-            StaticFile: StaticFileWriter(iso_build_dir=iso_build_dir),
-            AptPreference: AptPreferencesWriter(iso_build_dir=iso_build_dir),
-            DirectConfig: DirectConfigWriter(iso_build_dir=iso_build_dir),
-        },
+    targets = [targets, copy_bootloaders_target]
+
+    copy_engine = CopyEngine(strategy=copy_strategy, workers=copy_workers)
+    target_writer = TargetWriter(
+        target_handlers=create_target_handlers(
+            iso_build_dir, bundle_hooks=bundle_hooks, copy_engine=copy_engine, deb_store=deb_store),
         targets=targets,
-    ).execute()
+        manifest=manifest,
+        resolve_workers=resolve_workers,
+        handler_workers=handler_workers,
+        tracer=tracer,
+    )
+
+    if validate:
+        DEFAULT_LOGGER.info(f"Validate targets")
+        target_writer.validate().raise_for_issues()
+
+    if package_index is not None:
+        DEFAULT_LOGGER.info(f"Check packages")
+        with tracer.span("preflight"):
+            check_packages(target_writer.resolved_targets(), package_index).raise_for_errors()
+
+    def write_targets():
+        DEFAULT_LOGGER.info(f"Write targets")
+        previous_units = dict(manifest.units) if manifest is not None else None
+        with tracer.span("write targets"):
+            target_writer.execute()
+        if manifest is not None and manifest.units != previous_units:
+            # Stages of previous builds don't include rewritten targets
+            with tracer.span("invalidate_build_stages"):
+                invalidate_build_stages(iso_build_dir=iso_build_dir)
+        DEFAULT_LOGGER.info(f"Copy strategies used: {copy_engine.report.summary()}")
+
+    # Fingerprinting targets resolves them, so only do it when checkpoints are recorded
+    targets_fingerprint = fingerprint(lb_config_fingerprint, target_writer.resolve()) if resume else None
+    _run_phase(checkpoints, BuildPhase.TARGETS, targets_fingerprint, write_targets)
+
+    def run_lb_build():
+        if package_cache is not None:
+            with tracer.span("restore package cache"):
+                package_cache.restore(iso_build_dir)
+
+        try:
+            with tracer.span("lb build"):
+                run_lb_operation(operation=LBOperation.BUILD, iso_build_dir=iso_build_dir)
+        finally:
+            if package_cache is not None:
+                with tracer.span("save package cache"):
+                    package_cache.save(iso_build_dir)
 
     DEFAULT_LOGGER.info(f"Build image")
-    if not skip_build:
-        run_lb_operation(operation=LBOperation.BUILD, iso_build_dir=iso_build_dir)
-    else:
+    if skip_build:
         DEFAULT_LOGGER.info(f"Skip build")
+    else:
+        lb_build_fingerprint = fingerprint(targets_fingerprint, LBOperation.BUILD.value)
+        _run_phase(checkpoints, BuildPhase.LB_BUILD, lb_build_fingerprint, run_lb_build)
+
+    if removal is not None:
+        # Failures are logged by the removal thread
+        DEFAULT_LOGGER.info(f"Wait for background removal of the previous build")
+        with tracer.span("wait_background_removal"):
+            removal.join()
+
+
+def _run_phase(checkpoints: BuildCheckpoints | None, phase: BuildPhase, phase_fingerprint: str, run):
+    if checkpoints is None:
+        run()
+        return
+
+    if checkpoints.is_completed(phase, phase_fingerprint):
+        DEFAULT_LOGGER.info(f"Skip phase {phase.value}, which completed with the same inputs")
+        return
+
+    checkpoints.start(phase)
+    run()
+    checkpoints.complete(phase, phase_fingerprint)
+
+
+def _plan_image(
+    targets: list, iso_build_dir: Path, fresh_build: bool,
+    distribution: str, image_name: str, skip_build: bool, resolve_workers: int, bundle_hooks: bool,
+) -> BuildPlan:
+    DEFAULT_LOGGER.info(f"Plan build in {iso_build_dir}")
+    build_plan = BuildPlan()
+
+    if fresh_build:
+        build_plan.operations.append(FileOperation(
+            operation_type=FileOperationType.REMOVE, handler="live_build", destination=iso_build_dir))
+
+    build_plan.operations.extend([
+        plan_auto_script(
+            iso_build_dir=iso_build_dir,
+            script_type=AutoScriptType.CONFIG,
+            distribution=distribution, image_name=image_name),
+        plan_auto_script(iso_build_dir=iso_build_dir, script_type=AutoScriptType.BUILD),
+        plan_auto_script(iso_build_dir=iso_build_dir, script_type=AutoScriptType.CLEAN),
+        plan_lb_operation(operation=LBOperation.CONFIG, iso_build_dir=iso_build_dir),
+    ])
+
+    target_plan = TargetWriter(
+        target_handlers=create_target_handlers(iso_build_dir, bundle_hooks=bundle_hooks),
+        targets=[targets, copy_bootloaders(iso_build_dir=iso_build_dir)],
+        resolve_workers=resolve_workers,
+    ).plan()
+    build_plan.operations.extend(target_plan.operations)
+
+    if not skip_build:
+        build_plan.operations.append(plan_lb_operation(operation=LBOperation.BUILD, iso_build_dir=iso_build_dir))
+
+    DEFAULT_LOGGER.info(f"Build plan:\n{build_plan.summary()}")
+    return build_plan
@@ -0,0 +1,258 @@
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import types
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from lbutils import defaults
+from lbutils.copy_engine import CopyEngine
+from lbutils.locking import file_lock
+from lbutils.targets import Target, CopyStrategy
+
+ENTRY_FILE = "entry.json"
+"""
+Metadata file of a cache entry.
+"""
+
+
+class CallbackCache:
+    """
+    Persistent cache of target callback results, e.g. :attr:`lbutils.targets.StaticFile.get_source_file`, shared
+    by builds and processes on the same host. Callbacks usually render templates or download artifacts, so a
+    cached callback returns a private copy of the file or directory its first call returned, until the entry expires
+    or is invalidated. Copies are made while the cache is locked, so pruning never removes results in use.
+    Like :func:`lbutils.file_helpers.download_file`, copies are temporary files left to the caller.
+
+    Caching is opt-in per callback (:meth:`cached`) or per target (:meth:`cache_target`). Entries are keyed by an
+    explicit key or by the identity of the callback: its module, qualified name, code, values of its default
+    arguments and closure, and the instance of bound methods. Identity keys can't notice changes of anything else,
+    e.g. the content of a file whose path the callback returns, so give those callbacks an explicit key and a
+    ``ttl``, or invalidate them.
+
+    :param pathlib.Path cache_dir: Cache directory.
+    :param float,Optional ttl: Seconds an entry stays valid after it's stored. Valid forever if not given.
+    :param int,Optional max_bytes: Maximum total size of cached results. Least recently used entries are removed once
+       exceeded. Unlimited if not given.
+    """
+    def __init__(self, cache_dir: Path, ttl: float = None, max_bytes: int = None):
+        self.__cache_dir = cache_dir
+        self.__ttl = ttl
+        self.__max_bytes = max_bytes
+        self.__lock_file = cache_dir / ".lock"
+        self.__copy_engine = CopyEngine(strategy=CopyStrategy.AUTO)
+
+    @property
+    def cache_dir(self) -> Path:
+        return self.__cache_dir
+
+    def cached(self, callback: Callable[[], Path], key: str = None) -> Callable[[], Path]:
+        """
+        Wrap a callback returning a path, so its result is cached.
+
+        :param Callable[[], pathlib.Path] callback: Callback to wrap.
+        :param str,Optional key: Cache key. Identity of ``callback`` by default, see :func:`callback_key`.
+        :return: Callback returning a copy of the cached result of ``callback``.
+        :rtype: Callable[[], pathlib.Path]
+        """
+        cache_key = callback_key(callback) if key is None else key
+        return lambda: self.get(cache_key, callback)
+
+    def cache_target(self, target: Target, key: str) -> Target:
+        """
+        Copy of ``target`` whose callbacks are cached with :meth:`cached`.
+
+        :param Target target: Target whose callbacks to cache.
+        :param str key: Cache key prefix. Callbacks are keyed by ``<key>:<field name>``.
+        :return: Target with cached callbacks.
+        :rtype: Target
+        """
+        cached_callbacks = {
+            target_field.name: self.cached(getattr(target, target_field.name), key=f"{key}:{target_field.name}")
+            for target_field in dataclasses.fields(target) if callable(getattr(target, target_field.name))
+        }
+
+        return dataclasses.replace(target, **cached_callbacks)
+
+    def get(self, key: str, callback: Callable[[], Path]) -> Path:
+        """
+        Cached result of ``key``. ``callback`` is called and its result stored if there's no valid entry.
+
+        :param str key: Cache key.
+        :param Callable[[], pathlib.Path] callback: Callback returning a file or directory.
+        :return: Copy of the cached result in a new temporary directory. Keeps the name of the result.
+        :rtype: pathlib.Path
+        """
+        entry_dir = self.__entry_dir(key)
+
+        with file_lock(self.__lock_file, shared=True):
+            result = self.__valid_result(entry_dir)
+            if result is not None:
+                defaults.DEFAULT_LOGGER.debug(f"Callback cache hit of {key}.")
+                return self.__copy_out(result)
+
+        defaults.DEFAULT_LOGGER.info(f"Callback cache miss of {key}, calling callback ...")
+        source = Path(callback())
+
+        with file_lock(self.__lock_file):
+            result = self.__copy_out(self.__store(key, entry_dir, source))
+            self.__prune(keep=entry_dir)
+
+        return result
+
+    def invalidate(self, key: str = None):
+        """
+        Remove the entry of ``key``, or all entries.
+
+        :param str,Optional key: Cache key. All entries are removed if not given.
+        """
+        with file_lock(self.__lock_file):
+            entry_dirs = [self.__entry_dir(key)] if key is not None else self.__entry_dirs()
+            for entry_dir in entry_dirs:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+        defaults.DEFAULT_LOGGER.info(f"Invalidated callback cache {'entry ' + key if key else 'entries'}.")
+
+    def prune(self):
+        """
+        Remove expired entries, then least recently used entries until the cache fits ``max_bytes``.
+        """
+        with file_lock(self.__lock_file):
+            self.__prune()
+
+    def __valid_result(self, entry_dir: Path) -> Optional[Path]:
+        entry = self.__read_entry(entry_dir)
+        if entry is None or self.__is_expired(entry):
+            return None
+
+        result = entry_dir / entry["name"]
+        if not os.path.lexists(result):
+            return None
+
+        # Record usage for pruning
+        os.utime(entry_dir / ENTRY_FILE)
+        return result
+
+    def __copy_out(self, result: Path) -> Path:
+        copied_result = Path(tempfile.mkdtemp(prefix="lbutils-callback-")) / result.name
+        self.__copy_engine.copy(result, copied_result)
+        return copied_result
+
+    def __store(self, key: str, entry_dir: Path, source: Path) -> Path:
+        # Build the entry aside and swap it in, so readers never see partial results
+        temp_entry_dir = entry_dir.with_name(f".{entry_dir.name}.{uuid.uuid4().hex}")
+        temp_entry_dir.mkdir(parents=True)
+
+        if source.is_dir():
+            shutil.copytree(source, temp_entry_dir / source.name, symlinks=True)
+        else:
+            shutil.copy2(source, temp_entry_dir / source.name)
+
+        with open(temp_entry_dir / ENTRY_FILE, "w", encoding="utf-8") as f:
+            json.dump(
+                {"key": key, "name": source.name, "stored_at": time.time(), "size": _tree_size(temp_entry_dir)},
+                f, indent=2,
+            )
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.rename(temp_entry_dir, entry_dir)
+        defaults.DEFAULT_LOGGER.info(f"Stored result {source} of {key} to callback cache.")
+        return entry_dir / source.name
+
+    def __prune(self, keep: Path = None):
+        entries = []
+        for entry_dir in self.__entry_dirs():
+            entry = self.__read_entry(entry_dir)
+            if entry is None or self.__is_expired(entry):
+                defaults.DEFAULT_LOGGER.info(f"Pruning expired callback cache entry {entry_dir} ...")
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            entries.append((entry_dir, entry["size"], (entry_dir / ENTRY_FILE).stat().st_mtime))
+
+        if self.__max_bytes is None:
+            return
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for entry_dir, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total_bytes <= self.__max_bytes:
+                break
+            if entry_dir == keep:
+                continue
+
+            defaults.DEFAULT_LOGGER.info(f"Pruning callback cache entry {entry_dir} ...")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_bytes -= size
+
+    def __is_expired(self, entry: dict) -> bool:
+        return self.__ttl is not None and time.time() - entry["stored_at"] > self.__ttl
+
+    @staticmethod
+    def __read_entry(entry_dir: Path) -> Optional[dict]:
+        try:
+            with open(entry_dir / ENTRY_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def __entry_dir(self, key: str) -> Path:
+        return self.__cache_dir / hashlib.sha256(key.encode()).hexdigest()
+
+    def __entry_dirs(self) -> List[Path]:
+        if not self.__cache_dir.is_dir():
+            return []
+        return [path for path in self.__cache_dir.iterdir() if path.is_dir() and not path.name.startswith(".")]
+
+
+def callback_key(callback: Callable) -> str:
+    """
+    Cache key of a callback from its identity: module, qualified name, its code, and ``repr`` of default
+    arguments, closure values and the instance of bound methods. Functions referenced by the closure are identified
+    by their code. Stable across processes as long as those ``repr`` are.
+
+    :param Callable callback: Function or bound method. Other callables, e.g. :func:`functools.partial`, can't be
+       identified and need an explicit key.
+    :return: Cache key.
+    :rtype: str
+    """
+    if isinstance(callback, types.MethodType):
+        instance = hashlib.sha256(_value_identity(callback.__self__).encode()).hexdigest()
+        return f"{callback_key(callback.__func__)}:{instance}"
+    if not isinstance(callback, types.FunctionType):
+        raise Exception(f"Can't identify callback {callback!r}, give it an explicit cache key")
+
+    closure = []
+    for cell in callback.__closure__ or ():
+        try:
+            closure.append(_value_identity(cell.cell_contents))
+        except ValueError:
+            # Empty cell
+            closure.append(None)
+
+    identity = hashlib.sha256(
+        f"{_code_identity(callback.__code__)}{callback.__defaults__!r}{callback.__kwdefaults__!r}{closure!r}".encode()
+    ).hexdigest()
+    return f"{callback.__module__}.{callback.__qualname__}:{identity}"
+
+
+def _code_identity(code: types.CodeType) -> str:
+    # repr of nested code objects contains their addresses
+    consts = [_code_identity(const) if isinstance(const, types.CodeType) else const for const in code.co_consts]
+    return f"{code.co_code!r}{consts!r}{code.co_names!r}"
+
+
+def _value_identity(value) -> str:
+    if isinstance(value, types.FunctionType):
+        return f"{value.__module__}.{value.__qualname__}:{_code_identity(value.__code__)}"
+    return repr(value)
+
+
+def _tree_size(path: Path) -> int:
+    return sum(
+        Path(dir_path, filename).lstat().st_size
+        for dir_path, _, filenames in os.walk(path) for filename in filenames
+    )
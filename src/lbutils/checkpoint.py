@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+from enum import StrEnum
+from pathlib import Path
+from typing import Dict
+
+from lbutils import defaults
+
+
+class BuildPhase(StrEnum):
+    """
+    Phases of :func:`lbutils.build_image` after cleanup, in execution order.
+    """
+    AUTO_SCRIPTS = "auto_scripts"
+    """
+    Write auto scripts.
+    """
+    LB_CONFIG = "lb_config"
+    """
+    Run ``lb config``.
+    """
+    TARGETS = "targets"
+    """
+    Write targets.
+    """
+    LB_BUILD = "lb_build"
+    """
+    Run ``lb build``.
+    """
+
+
+class BuildCheckpoints:
+    """
+    Records completed phases of a build with fingerprints of their inputs, so a failed or interrupted build can be
+    resumed from the first phase whose inputs changed or which never completed. Fingerprints of a phase should
+    include the fingerprint of its previous phase (see :func:`fingerprint`), so changes of earlier phases invalidate
+    later ones. Stored as :const:`lbutils.defaults.CHECKPOINT_FILE` under the image build directory.
+
+    :param pathlib.Path iso_build_dir: Image build directory.
+    """
+    VERSION = 1
+
+    def __init__(self, iso_build_dir: Path):
+        self.__checkpoint_file = iso_build_dir.joinpath(defaults.CHECKPOINT_FILE)
+        self.__phases: Dict[str, str] = {}
+
+    @property
+    def phases(self) -> Dict[str, str]:
+        """
+        Map of completed phase to its fingerprint.
+        """
+        return dict(self.__phases)
+
+    @classmethod
+    def load(cls, iso_build_dir: Path) -> "BuildCheckpoints":
+        """
+        Load checkpoints of ``iso_build_dir``. Returns empty checkpoints if there are no checkpoints or they are
+        not readable.
+
+        :param pathlib.Path iso_build_dir: Image build directory.
+        :return: Loaded checkpoints.
+        :rtype: BuildCheckpoints
+        """
+        checkpoints = cls(iso_build_dir)
+
+        if not checkpoints.exists():
+            return checkpoints
+
+        try:
+            with open(checkpoints.__checkpoint_file, "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError) as e:
+            defaults.DEFAULT_LOGGER.warning(f"Ignore unreadable checkpoints {checkpoints.__checkpoint_file}: {e}")
+            return checkpoints
+
+        if content.get("version") != cls.VERSION:
+            defaults.DEFAULT_LOGGER.warning(f"Ignore checkpoints {checkpoints.__checkpoint_file} of unknown version.")
+            return checkpoints
+
+        checkpoints.__phases = {
+            phase: phase_fingerprint for phase, phase_fingerprint in content["phases"].items()
+            if phase in [build_phase.value for build_phase in BuildPhase]
+        }
+        return checkpoints
+
+    def exists(self) -> bool:
+        return self.__checkpoint_file.is_file()
+
+    def is_completed(self, phase: BuildPhase, phase_fingerprint: str) -> bool:
+        """
+        :param BuildPhase phase: Phase to check.
+        :param str phase_fingerprint: Fingerprint of the phase's current inputs.
+        :return: ``True`` if ``phase`` completed with the same inputs.
+        :rtype: bool
+        """
+        return self.__phases.get(phase.value) == phase_fingerprint
+
+    def start(self, phase: BuildPhase):
+        """
+        Drop checkpoints of ``phase`` and following phases before running ``phase``, since running it invalidates
+        their results.
+
+        :param BuildPhase phase: Phase to run.
+        """
+        phases = list(BuildPhase)
+        for following_phase in phases[phases.index(phase):]:
+            self.__phases.pop(following_phase.value, None)
+        self.save()
+
+    def complete(self, phase: BuildPhase, phase_fingerprint: str):
+        """
+        Record ``phase`` as completed with inputs of ``phase_fingerprint``.
+
+        :param BuildPhase phase: Completed phase.
+        :param str phase_fingerprint: Fingerprint of the phase's inputs.
+        """
+        self.__phases[phase.value] = phase_fingerprint
+        self.save()
+        defaults.DEFAULT_LOGGER.info(f"Checkpoint {phase.value} recorded.")
+
+    def save(self):
+        """
+        Save checkpoints to :const:`lbutils.defaults.CHECKPOINT_FILE` under the image build directory.
+        """
+        self.__checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_checkpoint_file = self.__checkpoint_file.with_name(f"{self.__checkpoint_file.name}.tmp")
+
+        with open(temp_checkpoint_file, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "phases": self.__phases}, f, indent=2)
+
+        os.replace(temp_checkpoint_file, self.__checkpoint_file)
+
+
+def fingerprint(*values) -> str:
+    """
+    Fingerprint of given values, based on their ``repr``.
+
+    :param values: Values to fingerprint, e.g. the fingerprint of the previous phase and inputs of the current phase.
+    :return: Hex digest.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(f"{value!r}\n".encode())
+
+    return digest.hexdigest()
@@ -0,0 +1,444 @@
+import contextvars
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from lbutils import defaults
+from lbutils.targets import CopyStrategy
+
+FICLONE = 0x40049409
+"""
+``ioctl`` request cloning a file on filesystems supporting reflinks, e.g. btrfs and xfs.
+"""
+
+UNSUPPORTED_ERRNOS = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EBADF, errno.ENOSYS)
+"""
+Errors meaning a copy mechanism is not supported for given files, so the next mechanism should be tried.
+"""
+
+
+class CopyReport:
+    """
+    Number of files and bytes copied with each :class:`CopyStrategy`. Strategies record the mechanism actually used,
+    e.g. :attr:`CopyStrategy.COPY_FILE_RANGE` if reflinking is requested but not supported. Thread-safe.
+    """
+    def __init__(self):
+        self.__files: Dict[CopyStrategy, int] = {}
+        self.__bytes: Dict[CopyStrategy, int] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def files(self) -> Dict[CopyStrategy, int]:
+        """
+        Files copied per strategy.
+        """
+        with self.__lock:
+            return dict(self.__files)
+
+    @property
+    def bytes(self) -> Dict[CopyStrategy, int]:
+        """
+        Total size of files copied per strategy.
+        """
+        with self.__lock:
+            return dict(self.__bytes)
+
+    def record(self, strategy: CopyStrategy, size: int):
+        """
+        Record a copied file.
+
+        :param CopyStrategy strategy: Strategy actually used.
+        :param int size: File size.
+        """
+        with self.__lock:
+            self.__files[strategy] = self.__files.get(strategy, 0) + 1
+            self.__bytes[strategy] = self.__bytes.get(strategy, 0) + size
+
+    def summary(self) -> str:
+        """
+        Human-readable summary of the report.
+
+        :return: Summary.
+        :rtype: str
+        """
+        with self.__lock:
+            return ", ".join(
+                f"{strategy.value}: {files} files, {self.__bytes[strategy]} bytes"
+                for strategy, files in self.__files.items()
+            ) or "no files copied"
+
+
+@dataclass
+class SyncReport:
+    """
+    Result of :meth:`CopyEngine.sync`. Paths are destination paths.
+
+    :param List[pathlib.Path] copied: Files and symlinks written.
+    :param List[pathlib.Path] skipped: Files and symlinks already up to date.
+    :param List[pathlib.Path] deleted: Extraneous files, symlinks and directories removed.
+    """
+    copied: List[Path] = field(default_factory=list)
+    skipped: List[Path] = field(default_factory=list)
+    deleted: List[Path] = field(default_factory=list)
+
+    def summary(self) -> str:
+        """
+        Human-readable summary of the report.
+
+        :return: Summary.
+        :rtype: str
+        """
+        return f"{len(self.copied)} copied, {len(self.skipped)} skipped, {len(self.deleted)} deleted"
+
+
+class CopyEngine:
+    """
+    Copies files and directory trees for target writers with a :class:`CopyStrategy`.
+
+    - :attr:`CopyStrategy.REFLINK` clones files sharing extents with the source via ``FICLONE``.
+    - :attr:`CopyStrategy.HARDLINK` links the source, if source and destination are on the same filesystem.
+    - :attr:`CopyStrategy.COPY_FILE_RANGE` copies in kernel via ``copy_file_range``, preserving holes of sparse files.
+    - :attr:`CopyStrategy.COPY` copies through userspace like :func:`shutil.copy`.
+    - :attr:`CopyStrategy.AUTO` tries reflink, then ``copy_file_range``. Sources are never hardlinked unless
+      :attr:`CopyStrategy.HARDLINK` is asked for, since a later change of either file would show up in the other.
+
+    Strategies fall back to ``copy_file_range``, and ``copy_file_range`` to :attr:`CopyStrategy.COPY`, when not
+    supported. Used strategies are recorded in :attr:`report`.
+
+    Directory trees are walked once. Directories and symlinks are created while walking, and files are copied on a
+    pool of ``workers`` threads.
+
+    :param CopyStrategy strategy: Default strategy. :attr:`CopyStrategy.COPY` by default, like :func:`shutil.copy`.
+    :param int workers: Number of threads copying files of a directory tree. Files are copied one by one if ``1``.
+    """
+    def __init__(self, strategy: CopyStrategy = CopyStrategy.COPY, workers: int = defaults.DEFAULT_COPY_WORKERS):
+        self.__strategy = strategy
+        self.__workers = workers
+        self.__report = CopyReport()
+
+    @property
+    def strategy(self) -> CopyStrategy:
+        return self.__strategy
+
+    @property
+    def report(self) -> CopyReport:
+        return self.__report
+
+    def copy(self, source: Path, destination: Path, strategy: CopyStrategy = None):
+        """
+        Copy file ``source`` to ``destination``, or directory ``source`` into ``destination`` recursively with
+        symlinks preserved, like :func:`shutil.copy` and :func:`shutil.copytree` respectively. A file is copied into
+        ``destination`` if it's an existing directory. Raise :class:`FileNotFoundError` without creating anything if
+        ``source`` doesn't exist.
+
+        :param pathlib.Path source: Source file or directory.
+        :param pathlib.Path destination: Destination path.
+        :param CopyStrategy,Optional strategy: Strategy overriding the default strategy.
+        """
+        _check_source_exists(source)
+
+        if source.is_file():
+            if destination.is_dir():
+                destination = destination / source.name
+            self.copy_file(source, destination, strategy=strategy)
+            return
+
+        destination.mkdir(parents=True, exist_ok=True)
+        copied_dirs = [(source, destination)]
+        file_jobs = []
+
+        for dir_path, dir_names, filenames in os.walk(source):
+            relative_dir = Path(dir_path).relative_to(source)
+
+            for name in dir_names + filenames:
+                source_path = Path(dir_path, name)
+                destination_path = destination / relative_dir / name
+
+                if source_path.is_symlink():
+                    if destination_path.is_symlink() or destination_path.is_file():
+                        destination_path.unlink()
+                    os.symlink(os.readlink(source_path), destination_path)
+                elif source_path.is_dir():
+                    destination_path.mkdir(exist_ok=True)
+                    copied_dirs.append((source_path, destination_path))
+                else:
+                    file_jobs.append(
+                        lambda s=source_path, d=destination_path:
+                        self.copy_file(s, d, strategy=strategy, preserve_times=True)
+                    )
+
+        self.__run_jobs(file_jobs)
+        self.__copy_dir_stats(copied_dirs)
+
+    def sync(
+        self, source: Path, destination: Path, strategy: CopyStrategy = None,
+        checksum: bool = False, delete: bool = False,
+    ) -> SyncReport:
+        """
+        Sync file or directory ``source`` to ``destination``, like ``rsync -a``. Files are skipped if their size and
+        modification time, or content hash if ``checksum``, match the source, so only changed files are written.
+        Times are preserved, so files synced once are skipped next time. Raise :class:`FileNotFoundError` without
+        changing anything if ``source`` doesn't exist.
+
+        :param pathlib.Path source: Source file or directory.
+        :param pathlib.Path destination: Destination path.
+        :param CopyStrategy,Optional strategy: Strategy overriding the default strategy.
+        :param bool checksum: If ``True``, compare content hashes instead of modification times.
+        :param bool delete: If ``True``, delete files and directories under ``destination`` not in ``source``.
+        :return: Copied, skipped and deleted paths.
+        :rtype: SyncReport
+        """
+        _check_source_exists(source)
+        report = SyncReport()
+
+        if source.is_file():
+            self.__sync_file(source, destination, strategy, checksum, report)
+            return report
+
+        if destination.is_symlink() or destination.is_file():
+            destination.unlink()
+        destination.mkdir(parents=True, exist_ok=True)
+        copied_dirs = [(source, destination)]
+        file_jobs = []
+
+        for dir_path, dir_names, filenames in os.walk(source):
+            relative_dir = Path(dir_path).relative_to(source)
+
+            if delete:
+                for extraneous_path in sorted(set(os.listdir(destination / relative_dir)) - set(dir_names + filenames)):
+                    _remove_path(destination / relative_dir / extraneous_path)
+                    report.deleted.append(destination / relative_dir / extraneous_path)
+
+            for name in dir_names + filenames:
+                source_path = Path(dir_path, name)
+                destination_path = destination / relative_dir / name
+
+                if source_path.is_symlink():
+                    link = os.readlink(source_path)
+                    if destination_path.is_symlink() and os.readlink(destination_path) == link:
+                        report.skipped.append(destination_path)
+                        continue
+                    _remove_path(destination_path)
+                    os.symlink(link, destination_path)
+                    report.copied.append(destination_path)
+                elif source_path.is_dir():
+                    if destination_path.is_symlink() or destination_path.is_file():
+                        destination_path.unlink()
+                    destination_path.mkdir(exist_ok=True)
+                    copied_dirs.append((source_path, destination_path))
+                else:
+                    file_jobs.append(
+                        lambda s=source_path, d=destination_path:
+                        self.__sync_file(s, d, strategy, checksum, report)
+                    )
+
+        self.__run_jobs(file_jobs)
+        self.__copy_dir_stats(copied_dirs)
+        return report
+
+    def __run_jobs(self, jobs: List[Callable[[], None]]):
+        if self.__workers <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                job()
+            return
+
+        with ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix="lbutils-copy") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, job) for job in jobs]
+
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise ExceptionGroup(f"Failed to copy {len(errors)} files", errors)
+
+    @staticmethod
+    def __copy_dir_stats(copied_dirs: List[tuple]):
+        # Directory times change while their content is written, so copy them last
+        for source_dir, destination_dir in copied_dirs:
+            shutil.copystat(source_dir, destination_dir)
+
+    def __sync_file(
+        self, source: Path, destination: Path, strategy: CopyStrategy, checksum: bool, report: SyncReport,
+    ):
+        if _is_unchanged(source, destination, checksum):
+            report.skipped.append(destination)
+            return
+
+        if destination.is_dir() and not destination.is_symlink():
+            shutil.rmtree(destination)
+        self.copy_file(source, destination, strategy=strategy, preserve_times=True)
+        report.copied.append(destination)
+
+    def copy_file(
+        self, source: Path, destination: Path, strategy: CopyStrategy = None, preserve_times: bool = False,
+    ) -> CopyStrategy:
+        """
+        Copy file ``source`` to ``destination``. Permission bits are copied, as well as times if ``preserve_times``.
+        Hardlinks share permission bits and times with the source.
+
+        :param pathlib.Path source: Source file.
+        :param pathlib.Path destination: Destination file. Replaced if exists.
+        :param CopyStrategy,Optional strategy: Strategy overriding the default strategy.
+        :param bool preserve_times: If ``True``, copy access and modification times as well.
+        :return: Strategy actually used.
+        :rtype: CopyStrategy
+        """
+        strategy = self.__strategy if strategy is None else strategy
+        source_stat = source.stat()
+
+        # Never write through existing links, which may share the inode with the source
+        if destination.is_symlink() or destination.is_file():
+            destination.unlink()
+
+        used_strategy = None
+        if strategy in (CopyStrategy.AUTO, CopyStrategy.REFLINK) and reflink(source, destination):
+            used_strategy = CopyStrategy.REFLINK
+        elif strategy is CopyStrategy.HARDLINK and hardlink(source, destination):
+            used_strategy = CopyStrategy.HARDLINK
+        elif strategy is not CopyStrategy.COPY and copy_file_range(source, destination):
+            used_strategy = CopyStrategy.COPY_FILE_RANGE
+        else:
+            shutil.copyfile(source, destination)
+            used_strategy = CopyStrategy.COPY
+
+        if used_strategy is not CopyStrategy.HARDLINK:
+            if preserve_times:
+                shutil.copystat(source, destination)
+            else:
+                shutil.copymode(source, destination)
+
+        defaults.DEFAULT_LOGGER.debug(f"Copied {source} to {destination} with {used_strategy.value}.")
+        self.__report.record(used_strategy, source_stat.st_size)
+        return used_strategy
+
+
+def _check_source_exists(source: Path):
+    # A missing source would otherwise be taken for a directory and half-create the destination tree
+    if not source.exists():
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(source))
+
+
+def _is_unchanged(source: Path, destination: Path, checksum: bool) -> bool:
+    if destination.is_symlink() or not destination.is_file():
+        return False
+
+    source_stat, destination_stat = source.stat(), destination.stat()
+    if source_stat.st_size != destination_stat.st_size:
+        return False
+    if not checksum:
+        return source_stat.st_mtime_ns == destination_stat.st_mtime_ns
+
+    with open(source, "rb") as source_file, open(destination, "rb") as destination_file:
+        return hashlib.file_digest(source_file, "sha256").digest() == \
+            hashlib.file_digest(destination_file, "sha256").digest()
+
+
+def _remove_path(path: Path):
+    if path.is_symlink() or path.is_file():
+        path.unlink()
+    elif path.is_dir():
+        shutil.rmtree(path)
+
+
+def reflink(source: Path, destination: Path) -> bool:
+    """
+    Clone ``source`` to ``destination`` with ``FICLONE``.
+
+    :param pathlib.Path source: Source file.
+    :param pathlib.Path destination: Destination file. Replaced if exists.
+    :return: ``False`` if the filesystem doesn't support reflinks between the files.
+    :rtype: bool
+    """
+    try:
+        with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+        return True
+    except OSError as e:
+        if e.errno not in UNSUPPORTED_ERRNOS:
+            raise
+        destination.unlink(missing_ok=True)
+        return False
+
+
+def hardlink(source: Path, destination: Path) -> bool:
+    """
+    Link ``destination`` to ``source``.
+
+    :param pathlib.Path source: Source file.
+    :param pathlib.Path destination: Destination file. Replaced if exists.
+    :return: ``False`` if the files are on different filesystems or the filesystem doesn't support hardlinks.
+    :rtype: bool
+    """
+    temp_destination = destination.with_name(f".{destination.name}.link")
+    temp_destination.unlink(missing_ok=True)
+
+    try:
+        os.link(source, temp_destination)
+    except OSError as e:
+        if e.errno not in UNSUPPORTED_ERRNOS + (errno.EPERM, errno.EMLINK):
+            raise
+        return False
+
+    os.replace(temp_destination, destination)
+    return True
+
+
+def copy_file_range(source: Path, destination: Path) -> bool:
+    """
+    Copy ``source`` to ``destination`` in kernel with ``copy_file_range``. Only data segments found by
+    ``SEEK_DATA`` / ``SEEK_HOLE`` are copied, so holes of sparse files stay holes.
+
+    :param pathlib.Path source: Source file.
+    :param pathlib.Path destination: Destination file. Replaced if exists.
+    :return: ``False`` if ``copy_file_range`` is not supported between the files.
+    :rtype: bool
+    """
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        source_fd, destination_fd = source_file.fileno(), destination_file.fileno()
+        size = os.fstat(source_fd).st_size
+
+        try:
+            for offset, length in _data_segments(source_fd, size):
+                copied = 0
+                while copied < length:
+                    count = os.copy_file_range(
+                        source_fd, destination_fd, length - copied, offset + copied, offset + copied)
+                    if count == 0:
+                        break
+                    copied += count
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+            return False
+
+        os.ftruncate(destination_fd, size)
+
+    return True
+
+
+def _data_segments(fd: int, size: int):
+    """
+    ``(offset, length)`` of data segments of a file. The whole file is a single segment if the filesystem can't
+    report holes.
+    """
+    offset = 0
+    while offset < size:
+        try:
+            data_start = os.lseek(fd, offset, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # Only a hole is left
+                return
+            if e.errno in UNSUPPORTED_ERRNOS:
+                yield offset, size - offset
+                return
+            raise
+
+        data_end = os.lseek(fd, data_start, os.SEEK_HOLE)
+        yield data_start, data_end - data_start
+        offset = data_end
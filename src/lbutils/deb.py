@@ -0,0 +1,159 @@
+import io
+import re
+import tarfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+AR_MAGIC = b"!<arch>\n"
+"""
+Magic bytes starting an ``ar`` archive, which ``.deb`` files are.
+"""
+
+AR_HEADER_SIZE = 60
+
+CONTROL_MEMBER_PREFIX = "control.tar"
+
+
+@dataclass
+class DebMetadata:
+    """
+    Fields of the ``control`` file of a ``.deb`` package.
+
+    :param str package: ``Package`` field.
+    :param str version: ``Version`` field, including epoch if any.
+    :param str architecture: ``Architecture`` field.
+    :param Dict[str, str] fields: All fields of the control file. Multi-line values keep their continuation lines.
+    """
+    package: str
+    version: str
+    architecture: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def canonical_name(self) -> str:
+        """
+        File name ``dpkg-name`` gives the package, ``<package>_<version without epoch>_<architecture>.deb``.
+        """
+        version = re.sub(r"^\d+:", "", self.version)
+        return f"{self.package}_{version}_{self.architecture}.deb"
+
+
+def is_ar_archive(path: Path) -> bool:
+    """
+    :param pathlib.Path path: File to check.
+    :return: ``True`` if ``path`` starts with the ``ar`` magic, i.e. looks like a ``.deb`` package.
+    :rtype: bool
+    """
+    with open(path, "rb") as f:
+        return f.read(len(AR_MAGIC)) == AR_MAGIC
+
+
+def read_deb_metadata(deb_path: Path) -> DebMetadata:
+    """
+    Read package metadata of a ``.deb`` file in process, without ``dpkg``. Only the ``ar`` member
+    ``control.tar{,.gz,.xz,.zst}`` is read, so the cost doesn't depend on the size of the package content.
+    ``control.tar.zst`` requires the optional ``zstandard`` package of the ``zstd`` extra.
+
+    :param pathlib.Path deb_path: ``.deb`` file.
+    :return: Package metadata.
+    :rtype: DebMetadata
+    """
+    with open(deb_path, "rb") as f:
+        for name, member in _ar_members(f, deb_path):
+            if name.startswith(CONTROL_MEMBER_PREFIX):
+                control = _read_control_file(name, member, deb_path)
+                break
+        else:
+            raise Exception(f"{deb_path} has no control archive")
+
+    fields = parse_control_fields(control)
+    missing_fields = [name for name in ("Package", "Version", "Architecture") if name not in fields]
+    if missing_fields:
+        raise Exception(f"Control file of {deb_path} misses fields {missing_fields}")
+
+    return DebMetadata(
+        package=fields["Package"], version=fields["Version"], architecture=fields["Architecture"], fields=fields,
+    )
+
+
+def parse_control_fields(control: str) -> Dict[str, str]:
+    """
+    Parse the first paragraph of a Debian control file, e.g. ``DEBIAN/control`` or a ``Packages`` stanza.
+
+    :param str control: Control file content.
+    :return: Map of field name to value. Continuation lines are joined with newlines.
+    :rtype: Dict[str, str]
+    """
+    fields = {}
+    current_field = None
+
+    for line in control.splitlines():
+        if not line.strip():
+            if fields:
+                break
+            continue
+
+        if line[0] in " \t":
+            if current_field is not None:
+                fields[current_field] += f"\n{line.strip()}"
+            continue
+
+        name, separator, value = line.partition(":")
+        if not separator:
+            continue
+        current_field = name.strip()
+        fields[current_field] = value.strip()
+
+    return fields
+
+
+def _ar_members(f: BinaryIO, deb_path: Path) -> Iterator[Tuple[str, bytes]]:
+    if f.read(len(AR_MAGIC)) != AR_MAGIC:
+        raise Exception(f"{deb_path} is not an ar archive")
+
+    while True:
+        header = f.read(AR_HEADER_SIZE)
+        if not header:
+            return
+        if len(header) < AR_HEADER_SIZE or header[58:60] != b"`\n":
+            raise Exception(f"{deb_path} has a corrupted ar member header")
+
+        # GNU ar terminates names with "/"
+        name = header[0:16].decode("ascii").strip().rstrip("/")
+        size = int(header[48:58].decode("ascii").strip())
+
+        if name.startswith(CONTROL_MEMBER_PREFIX):
+            yield name, f.read(size)
+        else:
+            f.seek(size, io.SEEK_CUR)
+
+        # Members are aligned to 2 bytes
+        if size % 2:
+            f.seek(1, io.SEEK_CUR)
+
+
+def _read_control_file(member_name: str, member: bytes, deb_path: Path) -> str:
+    if member_name.endswith(".zst"):
+        if zstandard is None:
+            raise Exception(
+                f"Reading {member_name} of {deb_path} requires the zstandard package, "
+                f"install it with the zstd extra: pip install 'lbutils[zstd]'")
+        member = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(member)).read()
+        mode = "r:"
+    elif member_name.endswith((".gz", ".xz")) or member_name == CONTROL_MEMBER_PREFIX:
+        mode = "r:*"
+    else:
+        raise Exception(f"Unsupported control archive {member_name} of {deb_path}")
+
+    with tarfile.open(fileobj=io.BytesIO(member), mode=mode) as control_tar:
+        for tar_member in control_tar.getmembers():
+            if tar_member.isfile() and tar_member.name.lstrip("./") == "control":
+                return control_tar.extractfile(tar_member).read().decode("utf-8")
+
+    raise Exception(f"{member_name} of {deb_path} has no control file")
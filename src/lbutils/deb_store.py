@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import List, Optional
+
+from lbutils import defaults
+from lbutils.copy_engine import hardlink
+from lbutils.deb import is_ar_archive, read_deb_metadata
+from lbutils.fingerprint import hash_file
+from lbutils.locking import file_lock
+
+
+@dataclass
+class StoredDeb:
+    """
+    A ``.deb`` file in a :class:`DebStore`.
+
+    :param str sha256: SHA-256 of the file content. Key of the file in the store.
+    :param pathlib.Path path: Path of the file in the store.
+    :param int size: File size.
+    :param str,Optional package: ``Package`` field, if the file is a readable deb.
+    :param str,Optional version: ``Version`` field.
+    :param str,Optional architecture: ``Architecture`` field.
+    """
+    sha256: str
+    path: Path
+    size: int
+    package: Optional[str] = None
+    version: Optional[str] = None
+    architecture: Optional[str] = None
+
+
+class DebStore:
+    """
+    A content-addressed store of custom debs shared by image build directories on the same host. Debs are stored
+    once per SHA-256 of their content with their package metadata, and hardlinked into build directories, so
+    repeated builds and variants returning the same deb from :attr:`lbutils.targets.CustomDeb.get_deb` share one
+    copy on disk. Stored debs are never modified, as live-build only reads ``packages.chroot``.
+
+    The store is locked while adding and pruning, so several build directories can use it at the same time.
+
+    :param pathlib.Path store_dir: Store directory.
+    :param int,Optional max_bytes: Maximum total size of stored debs. Least recently used debs are removed once
+       exceeded. Unlimited if not given.
+    """
+    def __init__(self, store_dir: Path, max_bytes: int = None):
+        self.__store_dir = store_dir
+        self.__objects_dir = store_dir / "objects"
+        self.__max_bytes = max_bytes
+        self.__lock_file = store_dir / ".lock"
+
+    @property
+    def store_dir(self) -> Path:
+        return self.__store_dir
+
+    def add(self, deb_path: Path) -> StoredDeb:
+        """
+        Store ``deb_path`` if its content is not stored yet, then prune the store.
+
+        :param pathlib.Path deb_path: Deb to store.
+        :return: Stored deb.
+        :rtype: StoredDeb
+        """
+        return self.__add(deb_path)
+
+    def link(self, deb_path: Path, destination: Path) -> StoredDeb:
+        """
+        Store ``deb_path``, then hardlink the stored deb to ``destination``. Copied instead if ``destination`` is on
+        another filesystem.
+
+        :param pathlib.Path deb_path: Deb to store.
+        :param pathlib.Path destination: Destination path, e.g. under :const:`lbutils.defaults.CHROOT_DEB_DIR`.
+           Replaced if exists.
+        :return: Stored deb.
+        :rtype: StoredDeb
+        """
+        # Link while the store is locked, so the stored deb can't be pruned in between
+        return self.__add(deb_path, link_destination=destination)
+
+    def find(self, sha256: str) -> Optional[StoredDeb]:
+        """
+        :param str sha256: SHA-256 of deb content.
+        :return: Stored deb with given SHA-256, or ``None`` if not stored.
+        :rtype: StoredDeb
+        """
+        with file_lock(self.__lock_file, shared=True):
+            return self.__find(sha256)
+
+    def entries(self) -> List[StoredDeb]:
+        """
+        :return: All stored debs.
+        :rtype: List[StoredDeb]
+        """
+        with file_lock(self.__lock_file, shared=True):
+            return [self.__find(object_path.stem) for object_path in self.__object_paths()]
+
+    def prune(self):
+        """
+        Remove least recently used debs until the store fits ``max_bytes``.
+        """
+        with file_lock(self.__lock_file):
+            self.__prune()
+
+    def __add(self, deb_path: Path, link_destination: Path = None) -> StoredDeb:
+        sha256 = hash_file(deb_path)
+
+        with file_lock(self.__lock_file):
+            stored_deb = self.__find(sha256)
+            if stored_deb is not None:
+                # Record usage for pruning
+                os.utime(stored_deb.path)
+            else:
+                stored_deb = self.__store(deb_path, sha256)
+                defaults.DEFAULT_LOGGER.info(f"Stored {deb_path} as {stored_deb.path}.")
+                self.__prune(keep=stored_deb.path)
+
+            if link_destination is not None and not hardlink(stored_deb.path, link_destination):
+                shutil.copyfile(stored_deb.path, link_destination)
+
+        return stored_deb
+
+    def __store(self, deb_path: Path, sha256: str) -> StoredDeb:
+        object_path = self.__object_path(sha256)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+
+        metadata = self.__read_metadata(deb_path)
+        stored_deb = StoredDeb(
+            sha256=sha256, path=object_path, size=deb_path.stat().st_size,
+            package=metadata.package if metadata else None,
+            version=metadata.version if metadata else None,
+            architecture=metadata.architecture if metadata else None,
+        )
+
+        # Publish atomically so readers never see partial debs. Sources are copied rather than linked, since
+        # callbacks may modify them later.
+        temp_object_path = object_path.with_name(f".{object_path.name}.tmp")
+        shutil.copyfile(deb_path, temp_object_path)
+        os.chmod(temp_object_path, 0o444)
+        os.replace(temp_object_path, object_path)
+
+        with open(object_path.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump({key: value for key, value in asdict(stored_deb).items() if key != "path"}, f, indent=2)
+
+        return stored_deb
+
+    @staticmethod
+    def __read_metadata(deb_path: Path):
+        if not is_ar_archive(deb_path):
+            return None
+
+        try:
+            return read_deb_metadata(deb_path)
+        except Exception as e:
+            defaults.DEFAULT_LOGGER.warning(f"Failed to read metadata of {deb_path}, store it without metadata: {e}")
+            return None
+
+    def __find(self, sha256: str) -> Optional[StoredDeb]:
+        object_path = self.__object_path(sha256)
+        if not object_path.is_file():
+            return None
+
+        try:
+            with open(object_path.with_suffix(".json"), "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            metadata = {"sha256": sha256, "size": object_path.stat().st_size}
+
+        return StoredDeb(path=object_path, **metadata)
+
+    def __prune(self, keep: Path = None):
+        if self.__max_bytes is None:
+            return
+
+        object_paths = self.__object_paths()
+        total_bytes = sum(object_path.stat().st_size for object_path in object_paths)
+        object_paths.sort(key=lambda object_path: object_path.stat().st_mtime)
+
+        for object_path in object_paths:
+            if total_bytes <= self.__max_bytes:
+                break
+            if object_path == keep:
+                continue
+
+            size = object_path.stat().st_size
+            defaults.DEFAULT_LOGGER.info(f"Pruning stored deb {object_path} ...")
+            object_path.unlink()
+            object_path.with_suffix(".json").unlink(missing_ok=True)
+            total_bytes -= size
+
+    def __object_path(self, sha256: str) -> Path:
+        return self.__objects_dir / sha256[:2] / f"{sha256}.deb"
+
+    def __object_paths(self) -> List[Path]:
+        return list(self.__objects_dir.glob("*/*.deb"))
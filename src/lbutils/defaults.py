@@ -87,6 +87,44 @@ Default builtin bootloader directory on host. Copied as default bootloaders for
 See https://live-team.pages.debian.net/live-manual/html/live-manual/customizing-binary.en.html#640
 """
 
+# live-build caches
+LB_CACHE_DIR = Path("cache")
+"""
+live-build cache directory under the image build directory. Contains downloaded packages and stage caches.
+See https://manpages.debian.org/testing/live-build/lb_config.1.en.html
+"""
+LB_PACKAGE_CACHE_DIRS = [
+    LB_CACHE_DIR / "packages.bootstrap",
+    LB_CACHE_DIR / "packages.chroot",
+    LB_CACHE_DIR / "packages.binary",
+]
+"""
+Downloaded package directories under :const:`LB_CACHE_DIR`.
+"""
+
+LB_STAGE_DIR = Path(".build")
+"""
+live-build stage directory under the image build directory. ``lb build`` skips stages whose stage files exist.
+"""
+LB_CONFIG_STAGE_FILE = LB_STAGE_DIR / "config"
+"""
+Stage file recorded by ``lb config``, required by ``lb build``.
+"""
+
+# lbutils states
+STATE_DIR = Path(".lbutils")
+"""
+Directory under the image build directory for states kept by lbutils between builds.
+"""
+MANIFEST_FILE = STATE_DIR / "manifest.json"
+"""
+Manifest of files written by target writers. See :class:`lbutils.manifest.BuildManifest`.
+"""
+CHECKPOINT_FILE = STATE_DIR / "checkpoints.json"
+"""
+Completed build phases. See :class:`lbutils.checkpoint.BuildCheckpoints`.
+"""
+
 DEFAULT_LOGGER = logging.getLogger("lbutils")
 """
 Default logger
@@ -106,6 +144,30 @@ DEFAULT_DPKG_NAME_BINARY = Path("/usr/bin/dpkg-name")
 """
 Default dpkg-name executable path
 """
+TEMPLATE_BYTECODE_CACHE = False
+"""
+Whether templates are compiled once across runs by default. See :func:`lbutils.file_helpers.get_template_environment`.
+"""
+TEMPLATE_ENVIRONMENT_POOL_SIZE = 32
+"""
+Number of template directories whose environments are kept. See :func:`lbutils.file_helpers.get_template_environment`.
+"""
+
+DEFAULT_RESOLVE_WORKERS = 1
+"""
+Default number of threads resolving target callbacks. Callbacks are resolved one by one in the calling thread,
+since they must be thread-safe to be resolved concurrently. See :class:`lbutils.target_writer.TargetWriter`.
+"""
+
+DEFAULT_REMOVE_WORKERS = 8
+"""
+Default number of threads removing a build directory in background. See :func:`lbutils.trash.remove_tree`.
+"""
+
+DEFAULT_COPY_WORKERS = 8
+"""
+Default number of threads copying files of a directory tree. See :class:`lbutils.copy_engine.CopyEngine`.
+"""
 
 DEFAULT_IMAGE_NAME = "myos"
 """
@@ -1,8 +1,10 @@
 from pathlib import Path
+import functools
 import tempfile
 import jinja2
 import requests
 
+from lbutils import defaults
 from lbutils.defaults import DEFAULT_LOGGER
 
 
@@ -24,8 +26,6 @@ def render_template_to_file(template_path: Path, target_path: Path = None, **kwa
     written_file_path = target_path
 
     if target_path is None:
-        DEFAULT_LOGGER.info(f"Rendering template to {target_path} ...")
-
         with tempfile.NamedTemporaryFile(mode="w+", delete=False) as tmp:
             tmp.write(rendered_template)
             written_file_path = Path(tmp.name)
@@ -33,11 +33,10 @@ def render_template_to_file(template_path: Path, target_path: Path = None, **kwa
         DEFAULT_LOGGER.info(f"Ensuring parent directory of {target_path} ...")
         target_path.parent.mkdir(parents=True, exist_ok=True)
 
-        DEFAULT_LOGGER.info(f"Rendering template to {target_path} ...")
         with target_path.open(mode="w+", encoding="utf-8") as f:
-            f.write(render_template_to_string(template_path, **kwargs))
+            f.write(rendered_template)
 
-    DEFAULT_LOGGER.info(f"Template {template_path} rendered to {target_path}.")
+    DEFAULT_LOGGER.info(f"Template {template_path} rendered to {written_file_path}.")
 
     return written_file_path
 
@@ -52,11 +51,38 @@ def render_template_to_string(template_path: Path, **kwargs) -> str:
     :return: Rendered string.
     :rtype: str
     """
-    env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_path.parent), undefined=jinja2.StrictUndefined)
+    env = get_template_environment(template_path.parent)
     template = env.get_template(template_path.name)
     return template.render(**kwargs)
 
 
+def get_template_environment(template_dir: Path, bytecode_cache: bool = None) -> jinja2.Environment:
+    """
+    Pooled environment loading templates from ``template_dir``. Loaded templates are kept by the environment and
+    reloaded only when their files change. The pool keeps :const:`lbutils.defaults.TEMPLATE_ENVIRONMENT_POOL_SIZE`
+    most recently used environments. Environments are thread-safe for rendering.
+
+    :param pathlib.Path template_dir: Template directory.
+    :param bool,Optional bytecode_cache: If ``True``, compiled templates are saved to jinja2's per-user cache
+       directory, so later runs skip compiling templates which didn't change. See
+       :class:`jinja2.FileSystemBytecodeCache`. Default to :const:`lbutils.defaults.TEMPLATE_BYTECODE_CACHE`.
+    :return: Environment of ``template_dir``.
+    :rtype: jinja2.Environment
+    """
+    bytecode_cache = defaults.TEMPLATE_BYTECODE_CACHE if bytecode_cache is None else bytecode_cache
+    return _template_environment(template_dir.resolve(), bytecode_cache)
+
+
+@functools.lru_cache(maxsize=defaults.TEMPLATE_ENVIRONMENT_POOL_SIZE)
+def _template_environment(template_dir: Path, bytecode_cache: bool) -> jinja2.Environment:
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(template_dir),
+        undefined=jinja2.StrictUndefined,
+        # Without a directory, jinja2 uses a per-user directory and checks its ownership and permissions
+        bytecode_cache=jinja2.FileSystemBytecodeCache() if bytecode_cache else None,
+    )
+
+
 def escape_string_for_shell_script(s: str) -> str:
     """
     Escape "\" and "$". Useful when writing string to file via shell scripts. For instance, when writing strings
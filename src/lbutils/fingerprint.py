@@ -0,0 +1,88 @@
+import dataclasses
+import hashlib
+import os
+from enum import Enum
+from pathlib import Path
+from typing import Iterable
+
+from lbutils.targets import Target
+
+
+def hash_file(path: Path) -> str:
+    """
+    SHA-256 of file content, read in chunks so memory use doesn't depend on the file size.
+
+    :param pathlib.Path path: File to hash.
+    :return: Hex digest.
+    :rtype: str
+    """
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def hash_path(path: Path) -> str:
+    """
+    SHA-256 of a file, symlink or directory. A symlink is hashed by its destination and a directory is hashed
+    by relative paths and content of everything under it.
+
+    :param pathlib.Path path: Path to hash.
+    :return: Hex digest.
+    :rtype: str
+    """
+    if path.is_symlink():
+        return hashlib.sha256(os.readlink(path).encode()).hexdigest()
+    if not path.is_dir():
+        return hash_file(path)
+
+    digest = hashlib.sha256()
+    for dir_path, dir_names, filenames in os.walk(path):
+        dir_names.sort()
+        for name in sorted(dir_names + filenames):
+            child = Path(dir_path, name)
+            if child.is_dir() and not child.is_symlink():
+                digest.update(f"d {child.relative_to(path)}\n".encode())
+            else:
+                digest.update(f"f {child.relative_to(path)} {hash_path(child)}\n".encode())
+
+    return digest.hexdigest()
+
+
+def fingerprint_target(target: Target) -> str:
+    """
+    Stable digest of a target: its type, declarative fields and the content of what its callbacks return, e.g. the
+    source file of :class:`lbutils.targets.StaticFile`, the deb of :class:`lbutils.targets.CustomDeb` or the script
+    of :class:`lbutils.targets.HookScript`. Equal for a target and its frozen variant
+    (see :func:`lbutils.targets.freeze_target`). Callbacks should already be resolved, e.g. returning a prepared file.
+
+    :param Target target: Target to fingerprint.
+    :return: Hex digest.
+    :rtype: str
+    """
+    return digest_targets([target])
+
+
+def digest_targets(targets: Iterable[Target]) -> str:
+    """
+    Digest of declarative fields of given targets, see :func:`fingerprint_target`.
+
+    :param Iterable[Target] targets: Targets to digest.
+    :return: Hex digest.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+
+    for target in targets:
+        target_type = getattr(type(target), "mutable_type", type(target))
+        digest.update(f"{target_type.__name__}\n".encode())
+        for target_field in dataclasses.fields(target):
+            value = getattr(target, target_field.name)
+            if callable(value):
+                value = hash_path(Path(value()))
+            elif isinstance(value, Enum):
+                value = value.value
+            elif isinstance(value, tuple):
+                # Frozen variants hold tuples instead of lists
+                value = list(value)
+            digest.update(f"{target_field.name}={value!r}\n".encode())
+
+    return digest.hexdigest()
@@ -1,25 +1,78 @@
 import shutil
+import threading
 from enum import StrEnum
 from pathlib import Path
+from typing import List, Optional
 
 from lbutils import defaults
-from lbutils.run_command import run_command
+from lbutils.plan import FileOperation, FileOperationType
+from lbutils.run_command import run_command, run_command_async
+from lbutils.trash import move_to_trash, remove_in_background, remove_tree, stale_trash_dirs
 
 
-def remove_build_dir(iso_build_dir: Path, exist_ok: bool = False):
+def remove_build_dir(
+    iso_build_dir: Path,
+    exist_ok: bool = False,
+    keep_cache: bool = False,
+    background: bool = False,
+) -> Optional[threading.Thread]:
     """
     Remove ``iso_build_dir``. Usually used before start fresh build.
 
     :param pathlib.Path iso_build_dir: Path to image build directory.
     :param bool exist_ok: If ``True``, remove ``iso_build_dir`` for fresh build.
+    :param bool keep_cache: If ``True``, remove everything except live-build caches
+       (:const:`lbutils.defaults.LB_CACHE_DIR`), so downloaded packages and bootstrap are reused.
+    :param bool background: If ``True``, rename ``iso_build_dir`` aside and remove it in a background thread, so the
+       build can start immediately. Trash left by previous runs is removed on every call, in background as well if
+       ``background``. See :mod:`lbutils.trash`.
+    :return: Background removal thread if anything is removed in background.
+    :rtype: threading.Thread,Optional
     """
+    # Left by background removals of runs which crashed or were killed
+    trash_dirs = stale_trash_dirs(iso_build_dir)
+    if trash_dirs:
+        defaults.DEFAULT_LOGGER.info(f"Found {len(trash_dirs)} stale trash directories of {iso_build_dir}.")
+
     if exist_ok:
         defaults.DEFAULT_LOGGER.info(f"Skip build dir {iso_build_dir} removal.")
-        return
+        return _remove_trash(trash_dirs, background)
+
+    if background:
+        keep = [iso_build_dir / defaults.LB_CACHE_DIR] if keep_cache else []
+        trash_dir = move_to_trash(iso_build_dir, keep=keep)
+        if trash_dir is not None:
+            trash_dirs.append(trash_dir)
+
+        return _remove_trash(trash_dirs, background)
+
+    if keep_cache:
+        defaults.DEFAULT_LOGGER.info(f"Removing build dir {iso_build_dir} except caches ...")
+        cache_dir = iso_build_dir / defaults.LB_CACHE_DIR
+        for path in iso_build_dir.iterdir() if iso_build_dir.is_dir() else []:
+            if path == cache_dir:
+                continue
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+        defaults.DEFAULT_LOGGER.info(f"Build dir {iso_build_dir} removed except caches.")
+        return _remove_trash(trash_dirs, background)
 
     defaults.DEFAULT_LOGGER.info(f"Removing build dir {iso_build_dir} ...")
     shutil.rmtree(iso_build_dir, ignore_errors=True)
     defaults.DEFAULT_LOGGER.info(f"Build dir {iso_build_dir} removed.")
+    return _remove_trash(trash_dirs, background)
+
+
+def _remove_trash(trash_dirs: List[Path], background: bool) -> Optional[threading.Thread]:
+    if background and trash_dirs:
+        return remove_in_background(trash_dirs)
+
+    for trash_dir in trash_dirs:
+        defaults.DEFAULT_LOGGER.info(f"Removing {trash_dir} ...")
+        remove_tree(trash_dir)
+    return None
 
 
 class LBOperation(StrEnum):
@@ -44,3 +97,71 @@ def run_lb_operation(
     defaults.DEFAULT_LOGGER.info(f"Running lb {operation.value} in {iso_build_dir} ...")
     run_command(command=[str(live_build_binary), operation.value], cwd=iso_build_dir)
     defaults.DEFAULT_LOGGER.info(f"Finish {operation.value} in {iso_build_dir}.")
+
+
+def invalidate_build_stages(
+    iso_build_dir: Path,
+    live_build_binary: Path = defaults.DEFAULT_LIVE_BUILD_BINARY,
+):
+    """
+    Make the next ``lb build`` in a kept ``iso_build_dir`` rebuild the image from bootstrap, after its config
+    changed, e.g. targets were rewritten. Otherwise ``lb build`` skips stages completed by a previous build and
+    ignores the changes. Removes chroot and binary trees with ``lb clean noauto --chroot --binary`` (``noauto`` skips
+    ``auto/clean``, which removes the config) and removes stage files except
+    :const:`lbutils.defaults.LB_CONFIG_STAGE_FILE`. Caches are kept. Does nothing if nothing was built yet.
+
+    :param pathlib.Path iso_build_dir: Image build directory.
+    :param pathlib.Path,Optional live_build_binary: Live build binary path.
+      Default to :const:`defaults.DEFAULT_LIVE_BUILD_BINARY`.
+    """
+    stage_dir = iso_build_dir / defaults.LB_STAGE_DIR
+    stage_files = [
+        stage_file for stage_file in stage_dir.iterdir() if stage_file.name != defaults.LB_CONFIG_STAGE_FILE.name
+    ] if stage_dir.is_dir() else []
+    if not stage_files:
+        return
+
+    defaults.DEFAULT_LOGGER.info(f"Invalidating {len(stage_files)} live-build stages in {iso_build_dir} ...")
+    run_command(command=[str(live_build_binary), "clean", "noauto", "--chroot", "--binary"], cwd=iso_build_dir)
+    for stage_file in stage_files:
+        stage_file.unlink(missing_ok=True)
+    defaults.DEFAULT_LOGGER.info(f"live-build stages in {iso_build_dir} invalidated.")
+
+
+async def run_lb_operation_async(
+    operation: LBOperation,
+    iso_build_dir: Path,
+    live_build_binary: Path = defaults.DEFAULT_LIVE_BUILD_BINARY,
+):
+    """
+    Async version of :func:`run_lb_operation`. Cancelling the calling task terminates the operation.
+
+    :param LBOperation operation: A live build operation.
+    :param pathlib.Path iso_build_dir: Image build directory.
+    :param pathlib.Path,Optional live_build_binary: Live build binary path.
+      Default to :const:`defaults.DEFAULT_LIVE_BUILD_BINARY`.
+    """
+    defaults.DEFAULT_LOGGER.info(f"Running lb {operation.value} in {iso_build_dir} ...")
+    await run_command_async(command=[str(live_build_binary), operation.value], cwd=iso_build_dir)
+    defaults.DEFAULT_LOGGER.info(f"Finish {operation.value} in {iso_build_dir}.")
+
+
+def plan_lb_operation(
+    operation: LBOperation,
+    iso_build_dir: Path,
+    live_build_binary: Path = defaults.DEFAULT_LIVE_BUILD_BINARY,
+) -> FileOperation:
+    """
+    Planned operation of :func:`run_lb_operation`.
+
+    :param LBOperation operation: A live build operation.
+    :param pathlib.Path iso_build_dir: Image build directory.
+    :param pathlib.Path,Optional live_build_binary: Live build binary path.
+      Default to :const:`defaults.DEFAULT_LIVE_BUILD_BINARY`.
+    :return: Planned operation.
+    :rtype: FileOperation
+    """
+    return FileOperation(
+        operation_type=FileOperationType.RUN, handler="live_build", target=operation.value,
+        command=[str(live_build_binary), operation.value], cwd=iso_build_dir,
+    )
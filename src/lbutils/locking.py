@@ -0,0 +1,26 @@
+import fcntl
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def file_lock(lock_file: Path, shared: bool = False, blocking: bool = True):
+    """
+    Hold an advisory ``flock`` on ``lock_file`` while in the context. Works across processes on the same host.
+
+    :param pathlib.Path lock_file: Lock file path. Created if not exists.
+    :param bool shared: If ``True``, take a shared lock which can be held by several holders at the same time.
+    :param bool blocking: If ``False``, raise :class:`BlockingIOError` instead of waiting when the lock is held.
+    """
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(lock_file, "a") as f:
+        operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            operation |= fcntl.LOCK_NB
+
+        fcntl.flock(f.fileno(), operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,240 @@
+import dataclasses
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Iterable, Tuple
+
+from lbutils import defaults
+
+
+@dataclass
+class ManifestEntry:
+    """
+    A file emitted by a target writer.
+
+    :param str path: File path relative to the image build directory.
+    :param int size: File size in bytes.
+    :param int mtime_ns: Modification time in nanoseconds. Symlinks are not followed.
+    :param str target: Key of the unit which produced the file. See :meth:`lbutils.target_writer.TargetHandler.unit_key`.
+    """
+    path: str
+    size: int
+    mtime_ns: int
+    target: str
+
+
+@dataclass
+class ManifestUnit:
+    """
+    Outputs of a set of targets written together.
+
+    :param str digest: Digest of the targets' inputs when the outputs were written.
+    :param List[ManifestEntry] outputs: Files written by the targets.
+    """
+    digest: str
+    outputs: List[ManifestEntry] = field(default_factory=list)
+
+
+class BuildManifest:
+    """
+    Records files emitted by target writers in an image build directory, so following builds can skip
+    targets whose inputs are not changed and remove outputs of targets which no longer exist.
+    Stored as :const:`lbutils.defaults.MANIFEST_FILE` under the image build directory.
+
+    :param pathlib.Path iso_build_dir: Image build directory.
+    """
+    VERSION = 2
+
+    def __init__(self, iso_build_dir: Path):
+        self.__iso_build_dir = iso_build_dir
+        self.__manifest_file = iso_build_dir.joinpath(defaults.MANIFEST_FILE)
+        self.__units: Dict[str, ManifestUnit] = {}
+
+    @property
+    def iso_build_dir(self) -> Path:
+        return self.__iso_build_dir
+
+    @property
+    def units(self) -> Dict[str, ManifestUnit]:
+        return self.__units
+
+    @classmethod
+    def load(cls, iso_build_dir: Path) -> "BuildManifest":
+        """
+        Load manifest of ``iso_build_dir``. Returns an empty manifest if there's no manifest or the manifest is
+        not readable.
+
+        :param pathlib.Path iso_build_dir: Image build directory.
+        :return: Loaded manifest.
+        :rtype: BuildManifest
+        """
+        manifest = cls(iso_build_dir)
+
+        if not manifest.exists():
+            return manifest
+
+        try:
+            with open(manifest.__manifest_file, "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError) as e:
+            defaults.DEFAULT_LOGGER.warning(f"Ignore unreadable manifest {manifest.__manifest_file}: {e}")
+            return manifest
+
+        if content.get("version") != cls.VERSION:
+            defaults.DEFAULT_LOGGER.warning(f"Ignore manifest {manifest.__manifest_file} of unknown version.")
+            return manifest
+
+        for unit_key, unit in content["units"].items():
+            manifest.__units[unit_key] = ManifestUnit(
+                digest=unit["digest"],
+                outputs=[ManifestEntry(**output) for output in unit["outputs"]],
+            )
+
+        return manifest
+
+    def exists(self) -> bool:
+        return self.__manifest_file.is_file()
+
+    def save(self):
+        """
+        Save manifest to :const:`lbutils.defaults.MANIFEST_FILE` under the image build directory.
+        """
+        self.__manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_manifest_file = self.__manifest_file.with_name(f"{self.__manifest_file.name}.tmp")
+
+        with open(temp_manifest_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": self.VERSION,
+                    "units": {
+                        unit_key: dataclasses.asdict(unit) for unit_key, unit in self.__units.items()
+                    },
+                },
+                f, indent=2,
+            )
+
+        os.replace(temp_manifest_file, self.__manifest_file)
+        defaults.DEFAULT_LOGGER.info(f"Manifest {self.__manifest_file} saved.")
+
+    def is_up_to_date(self, unit_key: str, digest: str) -> bool:
+        """
+        Check whether outputs of given unit are written from the same inputs and still present unmodified, i.e.
+        with the recorded size and modification time.
+
+        :param str unit_key: Unit key.
+        :param str digest: Digest of current inputs of the unit.
+        :return: ``True`` if the unit can be skipped.
+        :rtype: bool
+        """
+        unit = self.__units.get(unit_key)
+        if unit is None or unit.digest != digest:
+            return False
+
+        for output in unit.outputs:
+            output_path = self.__iso_build_dir / output.path
+            try:
+                stat = output_path.lstat()
+                if stat.st_size != output.size or stat.st_mtime_ns != output.mtime_ns:
+                    return False
+            except FileNotFoundError:
+                return False
+
+        return True
+
+    def remove_unit(self, unit_key: str):
+        """
+        Remove outputs of given unit from the image build directory and forget the unit.
+
+        :param str unit_key: Unit key.
+        """
+        unit = self.__units.pop(unit_key, None)
+        if unit is None:
+            return
+
+        for output in unit.outputs:
+            output_path = self.__iso_build_dir / output.path
+            defaults.DEFAULT_LOGGER.info(f"Removing output {output_path} of {unit_key} ...")
+            output_path.unlink(missing_ok=True)
+            self.__remove_empty_parents(output_path)
+
+    def record_unit(self, unit_key: str, digest: str, outputs: Iterable[Path]):
+        """
+        Record outputs of given unit.
+
+        :param str unit_key: Unit key.
+        :param str digest: Digest of inputs which produced the outputs.
+        :param Iterable[pathlib.Path] outputs: Files written by the unit.
+        """
+        outputs = sorted(outputs)
+        stats = [output.lstat() for output in outputs]
+        self.__units[unit_key] = ManifestUnit(
+            digest=digest,
+            outputs=[
+                ManifestEntry(
+                    path=str(output.relative_to(self.__iso_build_dir)),
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    target=unit_key,
+                )
+                for output, stat in zip(outputs, stats)
+            ],
+        )
+
+    def __remove_empty_parents(self, path: Path):
+        stop_dir = self.__iso_build_dir / defaults.CONFIG_DIR
+        parent = path.parent
+
+        while parent != stop_dir and stop_dir in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                # Not empty or already removed
+                return
+            parent = parent.parent
+
+
+FileState = Tuple[int, int, int]
+
+
+def snapshot_paths(paths: Iterable[Path]) -> Dict[Path, FileState]:
+    """
+    Collect size, modification time and inode of every file (including symlinks) under given paths.
+    Symlinks are not followed.
+
+    :param Iterable[pathlib.Path] paths: Files or directories to scan.
+    :return: Map of file path to its state.
+    :rtype: Dict[pathlib.Path, Tuple[int, int, int]]
+    """
+    states = {}
+
+    for path in paths:
+        if not os.path.lexists(path):
+            continue
+
+        if path.is_dir() and not path.is_symlink():
+            for dir_path, _, filenames in os.walk(path):
+                for filename in filenames:
+                    file_path = Path(dir_path, filename)
+                    states[file_path] = _file_state(file_path)
+        else:
+            states[path] = _file_state(path)
+
+    return states
+
+
+def changed_paths(before: Dict[Path, FileState], after: Dict[Path, FileState]) -> List[Path]:
+    """
+    Compare two snapshots from :func:`snapshot_paths`.
+
+    :param before: Snapshot taken before writing.
+    :param after: Snapshot taken after writing.
+    :return: Files which are created or modified.
+    :rtype: List[pathlib.Path]
+    """
+    return [path for path, state in after.items() if before.get(path) != state]
+
+
+def _file_state(path: Path) -> FileState:
+    stat = path.lstat()
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
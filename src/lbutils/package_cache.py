@@ -0,0 +1,136 @@
+import errno
+import os
+import shutil
+from pathlib import Path
+from typing import List
+
+from lbutils import defaults
+from lbutils.locking import file_lock
+
+
+class PackageCache:
+    """
+    A package cache shared by image build directories on the same host. live-build keeps downloaded ``.deb``
+    packages under :const:`lbutils.defaults.LB_PACKAGE_CACHE_DIRS`. :meth:`restore` links cached packages into a build
+    directory before building, and :meth:`save` links packages downloaded by the build back into the shared cache.
+
+    Packages are shared via hardlinks. live-build only reads cached packages and moves new packages into the cache,
+    so builds never modify shared files. The cache is locked while saving and pruning, so several build
+    directories can use it at the same time.
+
+    :param pathlib.Path cache_dir: Shared cache directory.
+    :param int,Optional max_bytes: Maximum total size of cached packages. Least recently used packages are removed
+       once exceeded. Unlimited if not given.
+    """
+    def __init__(self, cache_dir: Path, max_bytes: int = None):
+        self.__cache_dir = cache_dir
+        self.__max_bytes = max_bytes
+        self.__lock_file = cache_dir / ".lock"
+
+    @property
+    def cache_dir(self) -> Path:
+        return self.__cache_dir
+
+    def restore(self, iso_build_dir: Path):
+        """
+        Link cached packages into live-build package caches of ``iso_build_dir``.
+
+        :param pathlib.Path iso_build_dir: Image build directory.
+        """
+        defaults.DEFAULT_LOGGER.info(f"Restoring package cache {self.__cache_dir} to {iso_build_dir} ...")
+        restored = 0
+
+        with file_lock(self.__lock_file, shared=True):
+            for package_cache_dir in defaults.LB_PACKAGE_CACHE_DIRS:
+                shared_dir = self.__cache_dir / package_cache_dir.name
+                if not shared_dir.is_dir():
+                    continue
+
+                build_cache_dir = iso_build_dir / package_cache_dir
+                build_cache_dir.mkdir(parents=True, exist_ok=True)
+
+                for package in shared_dir.glob("*.deb"):
+                    build_package = build_cache_dir / package.name
+                    if build_package.exists():
+                        continue
+
+                    _link_or_copy(package, build_package)
+                    # Record usage for pruning
+                    os.utime(package)
+                    restored += 1
+
+        defaults.DEFAULT_LOGGER.info(f"{restored} packages restored to {iso_build_dir}.")
+
+    def save(self, iso_build_dir: Path):
+        """
+        Link packages in live-build package caches of ``iso_build_dir`` which are not cached yet into the shared cache,
+        then prune the shared cache.
+
+        :param pathlib.Path iso_build_dir: Image build directory.
+        """
+        defaults.DEFAULT_LOGGER.info(f"Saving package cache of {iso_build_dir} to {self.__cache_dir} ...")
+        saved = 0
+
+        with file_lock(self.__lock_file):
+            for package_cache_dir in defaults.LB_PACKAGE_CACHE_DIRS:
+                build_cache_dir = iso_build_dir / package_cache_dir
+                if not build_cache_dir.is_dir():
+                    continue
+
+                shared_dir = self.__cache_dir / package_cache_dir.name
+                shared_dir.mkdir(parents=True, exist_ok=True)
+
+                for package in build_cache_dir.glob("*.deb"):
+                    shared_package = shared_dir / package.name
+                    if shared_package.exists():
+                        continue
+
+                    # Publish atomically so readers never see partial packages
+                    temp_package = shared_dir / f".{package.name}.tmp"
+                    temp_package.unlink(missing_ok=True)
+                    _link_or_copy(package, temp_package)
+                    os.replace(temp_package, shared_package)
+                    saved += 1
+
+            defaults.DEFAULT_LOGGER.info(f"{saved} packages saved to {self.__cache_dir}.")
+            self.__prune()
+
+    def prune(self):
+        """
+        Remove least recently used packages until the cache fits ``max_bytes``.
+        """
+        with file_lock(self.__lock_file):
+            self.__prune()
+
+    def __prune(self):
+        if self.__max_bytes is None:
+            return
+
+        packages = self.__cached_packages()
+        total_bytes = sum(package.stat().st_size for package in packages)
+        packages.sort(key=lambda package: package.stat().st_mtime)
+
+        for package in packages:
+            if total_bytes <= self.__max_bytes:
+                break
+
+            size = package.stat().st_size
+            defaults.DEFAULT_LOGGER.info(f"Pruning cached package {package} ...")
+            package.unlink()
+            total_bytes -= size
+
+    def __cached_packages(self) -> List[Path]:
+        return [
+            package
+            for package_cache_dir in defaults.LB_PACKAGE_CACHE_DIRS
+            for package in (self.__cache_dir / package_cache_dir.name).glob("*.deb")
+        ]
+
+
+def _link_or_copy(source: Path, destination: Path):
+    try:
+        os.link(source, destination)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copy2(source, destination)
@@ -0,0 +1,189 @@
+import os
+from dataclasses import dataclass, field
+from enum import StrEnum
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class FileOperationType(StrEnum):
+    """
+    Type of operation in a :class:`BuildPlan`.
+    """
+    REMOVE = "remove"
+    """
+    Remove a directory recursively.
+    """
+    MKDIR = "mkdir"
+    """
+    Create a directory and its parents.
+    """
+    WRITE = "write"
+    """
+    Write generated content to a file.
+    """
+    COPY = "copy"
+    """
+    Copy a file, or recreate a symlink, from source to destination.
+    """
+    APPEND = "append"
+    """
+    Append generated content to a file.
+    """
+    RENAME = "rename"
+    """
+    Rename a file. Destination is ``None`` if it's decided by a command, e.g. ``dpkg-name``.
+    """
+    RUN = "run"
+    """
+    Spawn a subprocess.
+    """
+
+
+@dataclass
+class FileOperation:
+    """
+    An operation a build would perform.
+
+    :param FileOperationType operation_type: Operation type.
+    :param str handler: Name of the component performing the operation, e.g. the target handler.
+    :param str target: Description of the target causing the operation.
+    :param pathlib.Path,Optional destination: Path to create or modify.
+    :param pathlib.Path,Optional source: Path to read from.
+    :param int size: Bytes to copy or write.
+    :param List[str],Optional command: Command to spawn for :attr:`FileOperationType.RUN`.
+    :param pathlib.Path,Optional cwd: Working directory of the command.
+    """
+    operation_type: FileOperationType
+    handler: str
+    target: str = ""
+    destination: Optional[Path] = None
+    source: Optional[Path] = None
+    size: int = 0
+    command: Optional[List[str]] = None
+    cwd: Optional[Path] = None
+
+
+@dataclass
+class BuildPlan:
+    """
+    Every operation a build would perform, without performing any of them.
+
+    :param List[FileOperation] operations: Operations in execution order.
+    """
+    operations: List[FileOperation] = field(default_factory=list)
+
+    @property
+    def bytes_to_copy(self) -> int:
+        """
+        Total bytes copied from target sources.
+        """
+        return sum(operation.size for operation in self.operations if operation.operation_type is FileOperationType.COPY)
+
+    @property
+    def bytes_to_write(self) -> int:
+        """
+        Total bytes of generated content written or appended.
+        """
+        return sum(
+            operation.size for operation in self.operations
+            if operation.operation_type in (FileOperationType.WRITE, FileOperationType.APPEND)
+        )
+
+    @property
+    def commands(self) -> List[FileOperation]:
+        """
+        Subprocesses to spawn.
+        """
+        return [operation for operation in self.operations if operation.operation_type is FileOperationType.RUN]
+
+    def file_counts(self) -> Dict[str, int]:
+        """
+        Number of distinct files copied, written or appended per handler.
+
+        :return: Map of handler name to file count.
+        :rtype: Dict[str, int]
+        """
+        files = {}
+        for operation in self.operations:
+            if operation.operation_type in (FileOperationType.COPY, FileOperationType.WRITE, FileOperationType.APPEND):
+                files.setdefault(operation.handler, set()).add(operation.destination)
+
+        return {handler: len(destinations) for handler, destinations in files.items()}
+
+    def bytes_per_target(self) -> Dict[str, int]:
+        """
+        Bytes copied or written per target. Useful to spot targets pulling unexpectedly large sources.
+
+        :return: Map of target description to bytes, from the largest.
+        :rtype: Dict[str, int]
+        """
+        sizes = {}
+        for operation in self.operations:
+            if operation.size:
+                key = f"{operation.handler}: {operation.target}"
+                sizes[key] = sizes.get(key, 0) + operation.size
+
+        return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+    def summary(self) -> str:
+        """
+        Human-readable summary of the plan.
+
+        :return: Summary.
+        :rtype: str
+        """
+        lines = [
+            f"Operations: {len(self.operations)}",
+            f"Bytes to copy: {self.bytes_to_copy}",
+            f"Bytes to write: {self.bytes_to_write}",
+            "Files per handler:",
+        ]
+        lines.extend(f"  {handler}: {count}" for handler, count in self.file_counts().items())
+        lines.append("Commands:")
+        lines.extend(f"  {' '.join(operation.command)}" for operation in self.commands)
+
+        return "\n".join(lines)
+
+
+def plan_copy(handler: str, target: str, source: Path, destination: Path) -> List[FileOperation]:
+    """
+    Operations to copy ``source`` to ``destination`` like target writers do: files are copied directly
+    and directories are copied recursively with symlinks preserved.
+
+    :param str handler: Handler name.
+    :param str target: Target description.
+    :param pathlib.Path source: Source file or directory.
+    :param pathlib.Path destination: Destination path.
+    :return: Planned operations.
+    :rtype: List[FileOperation]
+    """
+    if not source.is_dir() or source.is_symlink():
+        return [FileOperation(
+            operation_type=FileOperationType.COPY, handler=handler, target=target,
+            source=source, destination=destination, size=source.lstat().st_size,
+        )]
+
+    operations = [FileOperation(
+        operation_type=FileOperationType.MKDIR, handler=handler, target=target, destination=destination)]
+
+    for dir_path, dir_names, filenames in os.walk(source):
+        dir_names.sort()
+        relative_dir = Path(dir_path).relative_to(source)
+
+        for name in sorted(dir_names + filenames):
+            source_path = Path(dir_path, name)
+            destination_path = destination / relative_dir / name
+
+            if name in dir_names and not source_path.is_symlink():
+                operations.append(FileOperation(
+                    operation_type=FileOperationType.MKDIR, handler=handler, target=target,
+                    destination=destination_path,
+                ))
+            else:
+                operations.append(FileOperation(
+                    operation_type=FileOperationType.COPY, handler=handler, target=target,
+                    source=source_path, destination=destination_path,
+                    size=0 if source_path.is_symlink() else source_path.lstat().st_size,
+                ))
+
+    return operations
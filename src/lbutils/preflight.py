@@ -0,0 +1,501 @@
+import fnmatch
+import gzip
+import lzma
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lbutils import defaults
+from lbutils.deb import is_ar_archive, read_deb_metadata, parse_control_fields
+from lbutils.targets import Target, UpstreamPackages, CustomDeb, AptPreference, AptPreferenceType
+
+PACKAGES_INDEX_NAMES = ("Packages", "Packages.xz", "Packages.gz")
+"""
+Names of apt ``Packages`` indices in preference order. Only the first existing one of a directory is loaded.
+"""
+
+DEFAULT_PIN_PRIORITY = 500
+"""
+Priority of package versions not matched by any apt preference.
+"""
+
+DEPENDENCY_PATTERN = re.compile(
+    r"^(?P<name>[a-z0-9][a-z0-9+.\-]*)(?::[a-z0-9\-]+)?"
+    r"\s*(?:\(\s*(?P<relation><<|<=|=|>=|>>|<|>)\s*(?P<version>[^)\s]+)\s*\))?"
+    r"\s*(?:\[[^]]*\])?\s*(?:<[^>]*>\s*)*$"
+)
+
+
+@dataclass
+class PackageRecord:
+    """
+    A package version of a :class:`PackageIndex`.
+
+    :param str package: Package name.
+    :param str version: Package version.
+    :param str architecture: Package architecture.
+    :param str,Optional depends: ``Pre-Depends`` and ``Depends`` fields, comma-separated.
+    :param str,Optional provides: ``Provides`` field.
+    :param int,Optional installed_size: ``Installed-Size`` field in KiB.
+    """
+    package: str
+    version: str
+    architecture: str
+    depends: str = ""
+    provides: str = ""
+    installed_size: int = 0
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, str]) -> "PackageRecord":
+        """
+        :param Dict[str, str] fields: Fields of a ``Packages`` stanza or a deb control file.
+        :return: Package record.
+        :rtype: PackageRecord
+        """
+        return cls(
+            package=fields["Package"],
+            version=fields["Version"],
+            architecture=fields.get("Architecture", "all"),
+            depends=", ".join(fields[name] for name in ("Pre-Depends", "Depends") if fields.get(name)),
+            provides=fields.get("Provides", ""),
+            installed_size=int(fields.get("Installed-Size", "0") or 0),
+        )
+
+
+@dataclass
+class Dependency:
+    """
+    A package relation, e.g. ``libc6 (>= 2.36)``.
+
+    :param str name: Package name.
+    :param str,Optional relation: One of ``<<``, ``<=``, ``=``, ``>=``, ``>>``. ``None`` if any version satisfies.
+    :param str,Optional version: Version compared with ``relation``.
+    """
+    name: str
+    relation: Optional[str] = None
+    version: Optional[str] = None
+
+    def __str__(self):
+        return self.name if self.relation is None else f"{self.name} ({self.relation} {self.version})"
+
+
+class PackageIndex:
+    """
+    In-memory index of apt ``Packages`` indices, e.g. of a local mirror, keyed by package name and provided name.
+    Only packages of ``architecture`` and ``all`` are indexed.
+
+    :param str,Optional architecture: Architecture of the image. ``amd64`` by default.
+    """
+    def __init__(self, architecture: str = "amd64"):
+        self.__architecture = architecture
+        self.__packages: Dict[str, List[PackageRecord]] = {}
+        self.__providers: Dict[str, List[Tuple[PackageRecord, Optional[str]]]] = {}
+
+    @property
+    def architecture(self) -> str:
+        return self.__architecture
+
+    @classmethod
+    def load(cls, paths: Iterable[Path], architecture: str = "amd64") -> "PackageIndex":
+        """
+        Load ``Packages`` indices.
+
+        :param Iterable[pathlib.Path] paths: Index files, plain or compressed with gzip or xz, or directories
+           searched recursively for indices named like :const:`PACKAGES_INDEX_NAMES`, e.g. ``dists`` of a mirror.
+        :param str,Optional architecture: Architecture of the image.
+        :return: Loaded index.
+        :rtype: PackageIndex
+        """
+        index = cls(architecture=architecture)
+
+        for path in paths:
+            for index_file in (_find_index_files(path) if path.is_dir() else [path]):
+                index.add_index_file(index_file)
+
+        defaults.DEFAULT_LOGGER.info(f"Loaded {len(index)} packages of {architecture} to package index.")
+        return index
+
+    def add_index_file(self, index_file: Path):
+        """
+        Add packages of a ``Packages`` index.
+
+        :param pathlib.Path index_file: Index file, plain or compressed with gzip or xz.
+        """
+        defaults.DEFAULT_LOGGER.info(f"Loading package index {index_file} ...")
+
+        if index_file.suffix == ".gz":
+            content = gzip.decompress(index_file.read_bytes())
+        elif index_file.suffix == ".xz":
+            content = lzma.decompress(index_file.read_bytes())
+        else:
+            content = index_file.read_bytes()
+
+        for stanza in re.split(r"\n\s*\n", content.decode("utf-8")):
+            fields = parse_control_fields(stanza)
+            if "Package" in fields and "Version" in fields:
+                self.add(PackageRecord.from_fields(fields))
+
+    def add(self, record: PackageRecord):
+        """
+        Add a package version. Versions of other architectures are ignored.
+
+        :param PackageRecord record: Package version.
+        """
+        if record.architecture not in (self.__architecture, "all"):
+            return
+
+        self.__packages.setdefault(record.package, []).append(record)
+        for group in parse_dependencies(record.provides):
+            for provided in group:
+                self.__providers.setdefault(provided.name, []).append((record, provided.version))
+
+    def candidates(self, name: str) -> List[PackageRecord]:
+        """
+        :param str name: Package name.
+        :return: Indexed versions of the package.
+        :rtype: List[PackageRecord]
+        """
+        return self.__packages.get(name, [])
+
+    def providers(self, name: str) -> List[Tuple[PackageRecord, Optional[str]]]:
+        """
+        :param str name: Virtual package name.
+        :return: Packages providing ``name``, with the provided version if any.
+        :rtype: List[Tuple[PackageRecord, Optional[str]]]
+        """
+        return self.__providers.get(name, [])
+
+    def __len__(self):
+        return sum(len(records) for records in self.__packages.values())
+
+
+@dataclass
+class PreflightReport:
+    """
+    Result of :func:`check_packages`.
+
+    :param List[str] errors: Packages which can't be installed.
+    :param Dict[str, PackageRecord] resolved: Packages to install with their dependencies, by name.
+    :param List[str] warnings: Inputs which are not checked, e.g. apt preferences pinning by release.
+    """
+    errors: List[str] = field(default_factory=list)
+    resolved: Dict[str, PackageRecord] = field(default_factory=dict)
+    warnings: List[str] = field(default_factory=list)
+
+    @property
+    def installed_size(self) -> int:
+        """
+        Estimated installed size of resolved packages in KiB. Packages installed by debootstrap are not included.
+        """
+        return sum(record.installed_size for record in self.resolved.values())
+
+    def raise_for_errors(self):
+        """
+        Raise an :class:`ExceptionGroup` of :attr:`errors` if there are any.
+        """
+        if self.errors:
+            raise ExceptionGroup(
+                f"Preflight check found {len(self.errors)} problems", [Exception(error) for error in self.errors])
+
+
+def check_packages(targets: Iterable[Target], index: PackageIndex) -> PreflightReport:
+    """
+    Check that packages of :class:`UpstreamPackages` targets exist in ``index`` and that dependencies of those
+    packages and of :class:`CustomDeb` targets can be satisfied. Packages excluded by ``ARCHITECTURES`` conditions
+    of package lists are skipped, and missing packages under other conditions are only warned about, see
+    :func:`evaluate_package_list`. Candidate versions are chosen like apt does,
+    by build time :class:`AptPreference` pins matching by version, then by version.
+
+    :param Iterable[Target] targets: Resolved targets, see :meth:`lbutils.target_writer.TargetWriter.resolved_targets`.
+    :param PackageIndex index: Index of the repositories the image is built from.
+    :return: Check result.
+    :rtype: PreflightReport
+    """
+    targets = list(targets)
+    report = PreflightReport()
+    pins = [
+        target for target in targets
+        if isinstance(target, AptPreference) and target.preference_type is AptPreferenceType.BUILD_TIME
+    ]
+    for pin in pins:
+        if not pin.pin.startswith("version "):
+            report.warnings.append(f"Pin '{pin.pin}' of {pin.package} is not checked, only version pins are.")
+
+    resolver = _Resolver(index, pins, report)
+
+    for target in targets:
+        if isinstance(target, CustomDeb):
+            deb_path = target.get_deb()
+            if not is_ar_archive(deb_path):
+                report.warnings.append(f"{deb_path} is not a deb archive, skip checking it.")
+                continue
+            resolver.install(PackageRecord.from_fields(read_deb_metadata(deb_path).fields), required_by=deb_path.name)
+
+    for target in targets:
+        if isinstance(target, UpstreamPackages):
+            for package, condition in evaluate_package_list(target.packages, index.architecture):
+                if condition is False:
+                    continue
+                resolver.install_name(
+                    package.split(":")[0], required_by=f"package set {target.package_set_code}",
+                    conditional=condition is None,
+                )
+
+    resolver.resolve_dependencies()
+
+    for warning in report.warnings:
+        defaults.DEFAULT_LOGGER.warning(warning)
+    defaults.DEFAULT_LOGGER.info(
+        f"Preflight check resolved {len(report.resolved)} packages of {report.installed_size} KiB "
+        f"with {len(report.errors)} problems."
+    )
+    return report
+
+
+class _Resolver:
+    def __init__(self, index: PackageIndex, pins: List[AptPreference], report: PreflightReport):
+        self.__index = index
+        self.__pins = pins
+        self.__report = report
+        self.__provided: Dict[str, List[Optional[str]]] = {}
+        self.__queue: List[PackageRecord] = []
+
+    def install_name(self, name: str, required_by: str, conditional: bool = False):
+        if name in self.__report.resolved or name in self.__provided:
+            return
+
+        candidate = self.__candidate(Dependency(name=name))
+        if candidate is None and conditional:
+            self.__report.warnings.append(
+                f"Conditional package {name} of {required_by} is not found, it may not be installed anyway.")
+            return
+        if candidate is None:
+            self.__report.errors.append(f"Package {name} of {required_by} is not found.")
+            return
+        self.install(candidate, required_by=required_by)
+
+    def install(self, record: PackageRecord, required_by: str):
+        if record.package in self.__report.resolved:
+            return
+
+        self.__report.resolved[record.package] = record
+        self.__provided.setdefault(record.package, []).append(record.version)
+        for group in parse_dependencies(record.provides):
+            for provided in group:
+                self.__provided.setdefault(provided.name, []).append(provided.version)
+        self.__queue.append(record)
+
+    def resolve_dependencies(self):
+        while self.__queue:
+            record = self.__queue.pop()
+
+            for group in parse_dependencies(record.depends):
+                if any(self.__is_installed(dependency) for dependency in group):
+                    continue
+
+                for dependency in group:
+                    candidate = self.__candidate(dependency)
+                    if candidate is not None:
+                        self.install(candidate, required_by=record.package)
+                        break
+                else:
+                    self.__report.errors.append(
+                        f"{record.package} {record.version} depends on {' | '.join(map(str, group))}, "
+                        f"which can't be satisfied."
+                    )
+
+    def __is_installed(self, dependency: Dependency) -> bool:
+        return any(
+            dependency.relation is None or (version is not None and version_satisfies(version, dependency))
+            for version in self.__provided.get(dependency.name, [])
+        )
+
+    def __candidate(self, dependency: Dependency) -> Optional[PackageRecord]:
+        candidates = [
+            (self.__pin_priority(record), record) for record in self.__index.candidates(dependency.name)
+            if dependency.relation is None or version_satisfies(record.version, dependency)
+        ]
+        candidates = [(priority, record) for priority, record in candidates if priority >= 0]
+
+        if candidates:
+            best_priority = max(priority for priority, _ in candidates)
+            best_records = [record for priority, record in candidates if priority == best_priority]
+            best_record = best_records[0]
+            for record in best_records[1:]:
+                if compare_versions(record.version, best_record.version) > 0:
+                    best_record = record
+            return best_record
+
+        for record, provided_version in self.__index.providers(dependency.name):
+            if dependency.relation is None or (
+                provided_version is not None and version_satisfies(provided_version, dependency)
+            ):
+                return record
+
+        return None
+
+    def __pin_priority(self, record: PackageRecord) -> int:
+        # Like apt, the first matching preference applies
+        for pin in self.__pins:
+            if not pin.pin.startswith("version "):
+                continue
+            if not any(fnmatch.fnmatchcase(record.package, pattern) for pattern in pin.package.split()):
+                continue
+            if fnmatch.fnmatchcase(record.version, pin.pin.removeprefix("version ").strip()):
+                return pin.pin_priority
+
+        return DEFAULT_PIN_PRIORITY
+
+
+def evaluate_package_list(packages: Iterable[str], architecture: str) -> Iterator[Tuple[str, Optional[bool]]]:
+    """
+    Evaluate live-build directives of a package list. Lines starting with ``#`` are directives, e.g.
+    ``#if ARCHITECTURES amd64``, ``#nif``, ``#endif`` or ``#include``, and are not returned. Only ``ARCHITECTURES``
+    conditions can be evaluated, others depend on the live-build configuration.
+
+    :param Iterable[str] packages: Entries of :attr:`lbutils.targets.UpstreamPackages.packages`.
+    :param str architecture: Architecture of the image.
+    :return: Packages with ``True`` if they are installed, ``False`` if they are not and ``None`` if it's unknown.
+    :rtype: Iterator[Tuple[str, Optional[bool]]]
+    """
+    conditions = []
+
+    for package in packages:
+        if package.startswith(("#if ", "#nif ")):
+            directive, *arguments = package.split()
+            condition = architecture in arguments[1:] if arguments[:1] == ["ARCHITECTURES"] else None
+            conditions.append(condition if condition is None or directive == "#if" else not condition)
+        elif package.startswith("#endif"):
+            if conditions:
+                conditions.pop()
+        elif not package.startswith("#"):
+            if False in conditions:
+                yield package, False
+            elif None in conditions:
+                yield package, None
+            else:
+                yield package, True
+
+
+def parse_dependencies(value: str) -> List[List[Dependency]]:
+    """
+    Parse a relation field like ``Depends`` or ``Provides``. Architecture and build profile restrictions are
+    ignored.
+
+    :param str value: Field value, e.g. ``libc6 (>= 2.36), default-mta | mail-transport-agent``.
+    :return: Groups of alternatives. A group is satisfied if any of its dependencies is.
+    :rtype: List[List[Dependency]]
+    """
+    groups = []
+
+    for group in value.split(","):
+        dependencies = []
+        for alternative in group.split("|"):
+            alternative = " ".join(alternative.split())
+            if not alternative:
+                continue
+
+            matched = DEPENDENCY_PATTERN.match(alternative)
+            if matched is None:
+                raise Exception(f"Invalid package relation {alternative}")
+
+            relation = {"<": "<=", ">": ">="}.get(matched["relation"], matched["relation"])
+            dependencies.append(Dependency(name=matched["name"], relation=relation, version=matched["version"]))
+
+        if dependencies:
+            groups.append(dependencies)
+
+    return groups
+
+
+def version_satisfies(version: str, dependency: Dependency) -> bool:
+    """
+    :param str version: Version to check.
+    :param Dependency dependency: Versioned dependency.
+    :return: ``True`` if ``version`` satisfies the relation of ``dependency``.
+    :rtype: bool
+    """
+    result = compare_versions(version, dependency.version)
+
+    return {
+        "<<": result < 0,
+        "<=": result <= 0,
+        "=": result == 0,
+        ">=": result >= 0,
+        ">>": result > 0,
+    }[dependency.relation]
+
+
+def compare_versions(a: str, b: str) -> int:
+    """
+    Compare Debian package versions like ``dpkg --compare-versions``.
+
+    :param str a: A version.
+    :param str b: Another version.
+    :return: Negative if ``a`` is older than ``b``, positive if newer, ``0`` if equal.
+    :rtype: int
+    """
+    for part_a, part_b in zip(_split_version(a), _split_version(b)):
+        result = _compare_version_part(part_a, part_b)
+        if result != 0:
+            return result
+
+    return 0
+
+
+def _split_version(version: str) -> Tuple[str, str, str]:
+    epoch, _, rest = version.partition(":") if ":" in version else ("0", "", version)
+    upstream, _, revision = rest.rpartition("-") if "-" in rest else (rest, "", "0")
+    return epoch or "0", upstream, revision
+
+
+def _compare_version_part(a: str, b: str) -> int:
+    while a or b:
+        non_digits_a, a = _take(a, digits=False)
+        non_digits_b, b = _take(b, digits=False)
+        result = _compare_non_digits(non_digits_a, non_digits_b)
+        if result != 0:
+            return result
+
+        digits_a, a = _take(a, digits=True)
+        digits_b, b = _take(b, digits=True)
+        result = int(digits_a or 0) - int(digits_b or 0)
+        if result != 0:
+            return result
+
+    return 0
+
+
+def _take(value: str, digits: bool) -> Tuple[str, str]:
+    end = 0
+    while end < len(value) and value[end].isdigit() == digits:
+        end += 1
+    return value[:end], value[end:]
+
+
+def _compare_non_digits(a: str, b: str) -> int:
+    for i in range(max(len(a), len(b))):
+        result = _char_order(a[i] if i < len(a) else "") - _char_order(b[i] if i < len(b) else "")
+        if result != 0:
+            return result
+
+    return 0
+
+
+def _char_order(char: str) -> int:
+    # "~" sorts before everything, even the end of a part, and letters sort before other characters
+    if char == "~":
+        return -1
+    if not char:
+        return 0
+    if char.isalpha():
+        return ord(char)
+    return ord(char) + 256
+
+
+def _find_index_files(path: Path) -> Iterator[Path]:
+    index_dirs = sorted({index_file.parent for name in PACKAGES_INDEX_NAMES for index_file in path.rglob(name)})
+
+    for index_dir in index_dirs:
+        yield next(index_dir / name for name in PACKAGES_INDEX_NAMES if (index_dir / name).is_file())
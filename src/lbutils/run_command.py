@@ -1,3 +1,6 @@
+import asyncio
+import os
+import signal
 import subprocess
 from pathlib import Path
 from typing import List
@@ -34,3 +37,52 @@ def write_command_to_logger(process: subprocess.Popen):
             DEFAULT_LOGGER.info(output)
         else:
             break
+
+
+async def run_command_async(command: List[str], cwd: Path = None, terminate_timeout: float = 30):
+    """
+    Run ``command`` as an asyncio subprocess and write its output to :const:`defaults.DEFAULT_LOGGER`. If the calling
+    task is cancelled, the whole process group of the command is terminated, and killed if it's still alive after
+    ``terminate_timeout`` seconds, before the cancellation propagates.
+
+    :param List[str] command: Command and its arguments. Not interpreted by a shell.
+    :param pathlib.Path,Optional cwd: Working directory.
+    :param float terminate_timeout: Seconds to wait for the command to exit after ``SIGTERM`` on cancellation.
+    """
+    str_command = " ".join(c for c in command)
+
+    DEFAULT_LOGGER.info(f"Executing command: \"{str_command}\"")
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        # Own process group, so children of the command are terminated on cancellation as well
+        start_new_session=True,
+    )
+
+    try:
+        async for line in process.stdout:
+            DEFAULT_LOGGER.info(line.decode().rstrip("\n"))
+        return_code = await process.wait()
+    except asyncio.CancelledError:
+        DEFAULT_LOGGER.info(f"Terminating command \"{str_command}\" ...")
+        await _terminate_process_group(process, terminate_timeout)
+        raise
+
+    DEFAULT_LOGGER.info(f"Command \"{str_command}\" exit with return code {return_code}")
+
+    if return_code != 0:
+        raise subprocess.CalledProcessError(returncode=return_code, cmd=str_command)
+
+
+async def _terminate_process_group(process: asyncio.subprocess.Process, terminate_timeout: float):
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+        try:
+            await asyncio.wait_for(asyncio.shield(process.wait()), timeout=terminate_timeout)
+            return
+        except TimeoutError:
+            DEFAULT_LOGGER.warning(f"Process {process.pid} is still running after {terminate_timeout} seconds.")
@@ -1,15 +1,32 @@
+import contextvars
+import dataclasses
 import shutil
 from abc import abstractmethod, ABCMeta
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Iterable, Optional, Tuple
 
 import lbutils.defaults as defaults
 from . import AptPreferenceType
+from .copy_engine import CopyEngine
+from .deb import is_ar_archive, read_deb_metadata
+from .deb_store import DebStore
+from .fingerprint import digest_targets
+from .manifest import BuildManifest, changed_paths, snapshot_paths
+from .plan import BuildPlan, FileOperation, FileOperationType, plan_copy
 from .run_command import run_command
+from .trace import Tracer, NULL_TRACER
+from .validation import ValidationReport, validate_targets
 from .targets import Target, UpstreamPackages, PackagePriority, CustomDeb, HookScript, \
     StaticFile, AptPreference, DirectConfig
 
 
+_END_OF_TARGETS = object()
+"""
+Sentinel returned by exhausted target iterators.
+"""
+
 class TargetHandler(metaclass=ABCMeta):
     """
     Abstract class for target handlers.
@@ -25,90 +42,596 @@ class TargetHandler(metaclass=ABCMeta):
         """
         pass
 
+    def __call__(self, targets: List[Target]):
+        self.execute(targets)
+
+    def output_paths(self, targets: List[Target]) -> Optional[List[Path]]:
+        """
+        Files and directories which :meth:`execute` creates or modifies for given targets. A directory covers
+        everything under it. ``None`` by default, meaning outputs are unknown: the handler never runs at the same
+        time as other handlers, is always executed in full while writing incrementally and is not validated.
+
+        :param List[Target] targets: List of target to process.
+        :return: Output paths, or ``None`` if unknown.
+        :rtype: List[pathlib.Path],Optional
+        """
+        return None
+
+    def plan(self, targets: List[Target]) -> List[FileOperation]:
+        """
+        Operations which :meth:`execute` would perform for given targets, without performing them.
+        Callbacks of targets should already be resolved.
+
+        :param List[Target] targets: List of target to process.
+        By default, nothing is planned and a warning is logged.
+
+        :return: Planned operations.
+        :rtype: List[FileOperation]
+        """
+        defaults.DEFAULT_LOGGER.warning(f"Handler {type(self).__name__} does not support planning. Skip it.")
+        return []
+
+    def unit_key(self, target: Target) -> str:
+        """
+        Key of the unit which given target belongs to while writing incrementally. Targets in the same unit
+        are always written together. By default, all targets of a handler belong to the same unit.
+
+        :param Target target: Target to process.
+        :return: Unit key.
+        :rtype: str
+        """
+        return type(self).__name__
+
 
 class TargetWriter:
     """
     Process given targets based on corresponding handler.
 
     :param Dict[type(Target)] target_handlers: Map of target type to target handlers.
-    :param List targets: Targets to process. Elements can be :class:`Target` or List[:class:`Target`].
+    :param Iterable targets: Targets to process. Elements can be :class:`Target` or iterables of them, nested
+       arbitrarily, except ``str`` and ``bytes``. Iterables, e.g. generators, are consumed lazily and flattened
+       without recursion. Targets are handled by the handler of their type or of their closest base class.
+    :param BuildManifest,Optional manifest: If given, write targets incrementally. Only targets whose inputs
+       changed since the manifest was recorded are written, and outputs of targets which no longer exist are removed.
+       Handlers must be :class:`TargetHandler` reporting their :meth:`TargetHandler.output_paths` to be written
+       incrementally, others are always executed.
+    :param int,Optional resolve_workers: Number of threads calling target callbacks (e.g. :attr:`StaticFile.get_source_file`)
+       before handlers run. Callbacks must be thread-safe if it's greater than ``1``, otherwise they are called one
+       by one in the calling thread. Default to :const:`lbutils.defaults.DEFAULT_RESOLVE_WORKERS`.
+    :param int,Optional handler_workers: Number of handlers running at the same time. Handlers whose output paths
+       overlap (see :meth:`TargetHandler.output_paths`) still run one after another in the order of
+       ``target_handlers``, as well as handlers which are not :class:`TargetHandler`. ``1`` by default.
+       Incremental writing always runs handlers one by one.
+    :param Tracer,Optional tracer: Records spans of collecting and resolving targets and of every handler.
     """
-    def __init__(self, target_handlers: Dict[type(Target), TargetHandler.execute], targets: List):
+    def __init__(
+        self, target_handlers: Dict[type(Target), TargetHandler.execute], targets: Iterable,
+        manifest: BuildManifest = None,
+        resolve_workers: int = defaults.DEFAULT_RESOLVE_WORKERS,
+        handler_workers: int = 1,
+        tracer: Tracer = NULL_TRACER,
+    ):
         self.__targets = targets
         self.__target_handlers = target_handlers
+        self.__manifest = manifest
+        self.__resolve_workers = resolve_workers
+        self.__handler_workers = handler_workers
+        self.__tracer = tracer
 
         self.__collected_targets = {target_type: [] for target_type in target_handlers.keys()}
+        self.__handled_types: Dict[type, Optional[type(Target)]] = {}
+        self.__resolved = False
+
+    def resolve(self) -> str:
+        """
+        Collect targets and call their callbacks without writing anything. :meth:`execute` writes the resolved
+        targets without resolving them again.
+
+        :return: Digest of resolved targets. See :func:`lbutils.fingerprint.digest_targets`.
+        :rtype: str
+        """
+        self.__collect_and_resolve_targets()
+
+        return digest_targets(
+            target for target_type in self.__target_handlers.keys() for target in self.__collected_targets[target_type]
+        )
+
+    def resolved_targets(self) -> List[Target]:
+        """
+        Collect targets and call their callbacks without writing anything, like :meth:`resolve`.
+
+        :return: Resolved targets, whose callbacks return resolved values directly.
+        :rtype: List[Target]
+        """
+        self.__collect_and_resolve_targets()
+
+        return [
+            target for target_type in self.__target_handlers.keys() for target in self.__collected_targets[target_type]
+        ]
+
+    def validate(self) -> ValidationReport:
+        """
+        Collect and resolve targets, then find conflicting targets before anything is written, e.g. static files
+        writing the same path. See :func:`lbutils.validation.validate_targets`.
+
+        :return: Validation result.
+        :rtype: ValidationReport
+        """
+        self.__collect_and_resolve_targets()
+
+        with self.__tracer.span("validate targets"):
+            return validate_targets(
+                self.__collected_targets,
+                {
+                    target_type: handler for target_type, handler in self.__target_handlers.items()
+                    if isinstance(handler, TargetHandler)
+                },
+            )
 
     def execute(self):
         """
         Process given targets based on corresponding handler.
         """
         defaults.DEFAULT_LOGGER.info("Write targets ... ")
-        self.__collect_targets(self.__targets)
-        self.__write_targets()
+        self.__collect_and_resolve_targets()
+
+        if self.__manifest is None:
+            self.__write_targets()
+        else:
+            self.__write_targets_incrementally()
+
+    def __collect_and_resolve_targets(self):
+        if self.__resolved:
+            return
+
+        with self.__tracer.span("collect targets"):
+            self.__collect_targets(self.__targets)
+        with self.__tracer.span("resolve targets", workers=self.__resolve_workers):
+            self.__resolve_targets()
+        self.__resolved = True
+
+    def plan(self) -> BuildPlan:
+        """
+        Collect targets and compute operations handlers would perform, without writing anything.
+        Target callbacks are still called to inspect their sources.
+
+        :return: Planned operations.
+        :rtype: BuildPlan
+        """
+        defaults.DEFAULT_LOGGER.info("Plan targets ... ")
+        self.__collect_and_resolve_targets()
+
+        build_plan = BuildPlan()
+        for target_type, handler in self.__target_handlers.items():
+            if isinstance(handler, TargetHandler):
+                build_plan.operations.extend(handler.plan(self.__collected_targets[target_type]))
+            else:
+                defaults.DEFAULT_LOGGER.warning(f"Handler {handler} does not support planning. Skip it.")
+
+        return build_plan
 
-    def __collect_targets(self, targets: List):
+    def __collect_targets(self, targets: Iterable):
         defaults.DEFAULT_LOGGER.info("Collecting targets ...")
 
-        for target in targets:
-            target_type = type(target)
-            if target_type in self.__collected_targets.keys():
-                self.__collected_targets[target_type].append(target)
+        # Flatten nested iterables with a stack of iterators instead of recursion, so nesting depth is unlimited
+        # and generators are consumed one element at a time
+        iterators = [iter(targets)]
+        collected = 0
+        while iterators:
+            target = next(iterators[-1], _END_OF_TARGETS)
+            if target is _END_OF_TARGETS:
+                iterators.pop()
+                continue
 
-            # if target is a list, then call self.__collect_target to collect targets in it
-            elif target_type == list:
-                self.__collect_targets(target)
+            handled_type = self.__handled_type(type(target))
+            if handled_type is not None:
+                self.__collected_targets[handled_type].append(target)
+                collected += 1
+            elif isinstance(target, Iterable) and not isinstance(target, (str, bytes, bytearray)):
+                iterators.append(iter(target))
             else:
-                raise Exception(f"Unknown target type of target {target}: {target_type}")
+                raise Exception(f"Unknown target type of target {target}: {type(target)}")
+
+        defaults.DEFAULT_LOGGER.info(f"All {collected} targets are collected.")
+
+    def __handled_type(self, target_type: type) -> Optional[type(Target)]:
+        """
+        Closest type in the MRO of ``target_type`` which has a handler, otherwise a handled type ``target_type`` is
+        a virtual subclass of (e.g. frozen targets, see :func:`lbutils.targets.frozen_target_type`), or ``None``.
+        Cached per type, since targets of a build share a few types.
+        """
+        if target_type not in self.__handled_types:
+            self.__handled_types[target_type] = next(
+                (base for base in target_type.__mro__ if base in self.__target_handlers),
+                next((
+                    handled_type for handled_type in self.__target_handlers
+                    if isinstance(handled_type, type) and issubclass(target_type, handled_type)
+                ), None),
+            )
+
+        return self.__handled_types[target_type]
+
+    def __resolve_targets(self):
+        defaults.DEFAULT_LOGGER.info(f"Resolving targets with {self.__resolve_workers} workers ...")
+
+        if self.__resolve_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.__resolve_workers, thread_name_prefix="lbutils-resolve") as executor:
+                # Copy context per task so logs of callbacks follow the caller's build context
+                futures = {
+                    target_type: [
+                        executor.submit(contextvars.copy_context().run, self.__resolve_target, target)
+                        for target in targets
+                    ]
+                    for target_type, targets in self.__collected_targets.items()
+                }
+        else:
+            # Resolve in the calling thread, so callbacks don't have to be thread-safe
+            futures = {
+                target_type: [_call(self.__resolve_target, target) for target in targets]
+                for target_type, targets in self.__collected_targets.items()
+            }
+
+        errors = []
+        for target_type, target_futures in futures.items():
+            resolved_targets = []
+            for target, future in zip(self.__collected_targets[target_type], target_futures):
+                error = future.exception()
+                if error is None:
+                    resolved_targets.append(future.result())
+                else:
+                    error.add_note(f"Failed to resolve target {target}")
+                    errors.append(error)
+
+            self.__collected_targets[target_type] = resolved_targets
+
+        if errors:
+            raise ExceptionGroup(f"Failed to resolve {len(errors)} targets", errors)
+
+        defaults.DEFAULT_LOGGER.info("All targets are resolved.")
+
+    def __resolve_target(self, target: Target) -> Target:
+        with self.__tracer.span(f"resolve {type(target).__name__}", target=target):
+            return resolve_target(target)
 
-        defaults.DEFAULT_LOGGER.info("All targets are collected.")
+    def __run_handler(self, target_type: type(Target), targets: List[Target]):
+        handler = self.__target_handlers[target_type]
+        with self.__tracer.span(f"write {target_type.__name__}", targets=len(targets)):
+            handler(targets)
 
     def __write_targets(self):
         defaults.DEFAULT_LOGGER.info("Writing collected targets ...")
+        if self.__handler_workers > 1:
+            self.__write_targets_concurrently()
+        else:
+            for target_type in self.__target_handlers.keys():
+                self.__run_handler(target_type, self.__collected_targets[target_type])
+        defaults.DEFAULT_LOGGER.info("All collected targets are saved.")
+
+    def __write_targets_concurrently(self):
+        target_types = list(self.__target_handlers.keys())
+        dependencies = self.__handler_dependencies(target_types)
+
+        pending = list(target_types)
+        running = {}
+        finished = set()
+        errors = []
+
+        with ThreadPoolExecutor(max_workers=self.__handler_workers, thread_name_prefix="lbutils-handler") as executor:
+            while pending or running:
+                if not errors:
+                    for target_type in [t for t in pending if dependencies[t] <= finished]:
+                        defaults.DEFAULT_LOGGER.info(f"Start writing {target_type.__name__} targets ...")
+                        future = executor.submit(
+                            contextvars.copy_context().run,
+                            self.__run_handler, target_type, self.__collected_targets[target_type])
+                        running[future] = target_type
+                        pending.remove(target_type)
+                elif not running:
+                    break
+
+                done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    target_type = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        finished.add(target_type)
+                    else:
+                        error.add_note(f"Failed to write {target_type.__name__} targets")
+                        errors.append(error)
+
+        if errors:
+            raise ExceptionGroup(f"Failed to write {len(errors)} target types", errors)
+
+    def __handler_dependencies(self, target_types: List[type(Target)]) -> Dict[type(Target), set]:
+        """
+        Handlers depend on every previous handler whose outputs overlap with theirs. Handlers without known outputs
+        depend on all previous handlers, and all following handlers depend on them.
+        """
+        output_paths = {}
+        for target_type in target_types:
+            handler = self.__target_handlers[target_type]
+            output_paths[target_type] = handler.output_paths(self.__collected_targets[target_type]) \
+                if isinstance(handler, TargetHandler) else None
+
+        dependencies = {}
+        for i, target_type in enumerate(target_types):
+            dependencies[target_type] = set()
+            for previous_target_type in target_types[:i]:
+                if output_paths[target_type] is None or output_paths[previous_target_type] is None or \
+                        paths_overlap(output_paths[target_type], output_paths[previous_target_type]):
+                    defaults.DEFAULT_LOGGER.info(
+                        f"{target_type.__name__} targets wait for {previous_target_type.__name__} targets.")
+                    dependencies[target_type].add(previous_target_type)
+
+        return dependencies
+
+    def __write_targets_incrementally(self):
+        defaults.DEFAULT_LOGGER.info("Writing collected targets incrementally ...")
+        manifest = self.__manifest
+
+        pending_units = []
+        full_handlers = []
         for target_type, handler in self.__target_handlers.items():
-            handler(self.__collected_targets[target_type])
+            targets = self.__collected_targets[target_type]
+
+            if not isinstance(handler, TargetHandler) or handler.output_paths(targets) is None:
+                full_handlers.append(target_type)
+                continue
+
+            units = {}
+            for target in targets:
+                units.setdefault(handler.unit_key(target), []).append(target)
+
+            with self.__tracer.span(f"digest {target_type.__name__}", units=len(units)):
+                for unit_key, unit_targets in units.items():
+                    pending_units.append((unit_key, digest_targets(unit_targets), target_type, unit_targets))
+
+        try:
+            # Remove outputs of targets which are gone before writing anything.
+            current_unit_keys = {unit_key for unit_key, _, _, _ in pending_units}
+            for unit_key in list(manifest.units.keys()):
+                if unit_key not in current_unit_keys:
+                    defaults.DEFAULT_LOGGER.info(f"Removing outputs of deleted unit {unit_key} ...")
+                    manifest.remove_unit(unit_key)
+
+            for unit_key, digest, target_type, unit_targets in pending_units:
+                if manifest.is_up_to_date(unit_key, digest):
+                    defaults.DEFAULT_LOGGER.info(f"Skip unchanged unit {unit_key}.")
+                    continue
+
+                manifest.remove_unit(unit_key)
+
+                output_paths = self.__target_handlers[target_type].output_paths(unit_targets)
+                before = snapshot_paths(output_paths)
+                written = False
+                try:
+                    self.__run_handler(target_type, unit_targets)
+                    written = True
+                finally:
+                    # Record partial outputs of a failed unit with no digest, so the next write replaces them
+                    after = snapshot_paths(output_paths)
+                    manifest.record_unit(unit_key, digest if written else "", changed_paths(before, after))
+                defaults.DEFAULT_LOGGER.info(f"Unit {unit_key} written.")
+
+            for target_type in full_handlers:
+                defaults.DEFAULT_LOGGER.info(
+                    f"Handler of {target_type.__name__} does not support incremental writing. Write all targets.")
+                self.__run_handler(target_type, self.__collected_targets[target_type])
+        finally:
+            manifest.save()
+
         defaults.DEFAULT_LOGGER.info("All collected targets are saved.")
 
 
+def _call(function: Callable, *args) -> Future:
+    """
+    Call ``function`` in the calling thread, returning its result or exception as a completed future.
+    """
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def paths_overlap(paths: Iterable[Path], other_paths: Iterable[Path]) -> bool:
+    """
+    Check whether any path of ``paths`` is the same as, under or above any path of ``other_paths``.
+
+    :param Iterable[pathlib.Path] paths: Paths to check.
+    :param Iterable[pathlib.Path] other_paths: Paths to check against.
+    :return: ``True`` if paths overlap.
+    :rtype: bool
+    """
+    paths = set(paths)
+    other_paths = set(other_paths)
+
+    for path in paths:
+        if path in other_paths or not other_paths.isdisjoint(path.parents):
+            return True
+
+    for other_path in other_paths:
+        if not paths.isdisjoint(other_path.parents):
+            return True
+
+    return False
+
+
+def resolve_target(target: Target) -> Target:
+    """
+    Call every callback of given target and return a copy whose callbacks return the resolved values directly.
+
+    :param Target target: Target to resolve.
+    :return: Resolved target.
+    :rtype: Target
+    """
+    if not dataclasses.is_dataclass(target):
+        return target
+
+    resolved_callbacks = {}
+    for target_field in dataclasses.fields(target):
+        value = getattr(target, target_field.name)
+        if callable(value):
+            resolved_value = value()
+            resolved_callbacks[target_field.name] = lambda resolved_value=resolved_value: resolved_value
+
+    return dataclasses.replace(target, **resolved_callbacks)
+
+
+@dataclass
+class DuplicatePackage:
+    """
+    A package dropped by :class:`UpstreamPackagesWriter` because an earlier package set already lists it.
+
+    :param str package: Package name.
+    :param str package_set_code: Package set the package is dropped from.
+    :param str first_package_set_code: Package set which listed the package first.
+    """
+    package: str
+    package_set_code: str
+    first_package_set_code: str
+
+
 class UpstreamPackagesWriter(TargetHandler):
     """
-    Write upstream packages to :const:`lbutils.defaults.PACKAGE_LIST_DIR`.
-    
+    Write upstream packages to :const:`lbutils.defaults.PACKAGE_LIST_DIR`. Targets are grouped by list file, and each
+    file is written once.
+
+    Packages listed more than once are only written at their first occurrence, within a set or across sets, whatever
+    their priorities. Packages of sets installed in both live and installed systems are also dropped from live only
+    sets, but not the other way around. Lines starting with ``#`` (live-build directives like ``#if`` and
+    ``#endif``) and packages inside ``#if`` or ``#nif`` blocks are never dropped. Dropped packages are reported in
+    :attr:`duplicates`.
+
     :param pathlib.Path,Optional iso_build_dir: Image build directory.
     """
     def __init__(self, iso_build_dir: Path):
         self.__package_list_dir = iso_build_dir.joinpath(defaults.PACKAGE_LIST_DIR)
+        self.__duplicates: List[DuplicatePackage] = []
+
+    @property
+    def duplicates(self) -> List[DuplicatePackage]:
+        """
+        Duplicated packages dropped by the last :meth:`execute`.
+        """
+        return list(self.__duplicates)
 
     def execute(self, targets: List[UpstreamPackages]):
         defaults.DEFAULT_LOGGER.info("Writing upstream packages ...")
 
-        for target in targets:
+        package_lists, self.__duplicates = self.__render_package_lists(targets)
+        if package_lists:
             self.__package_list_dir.mkdir(parents=True, exist_ok=True)
-            filename = f"{target.package_set_code}.list.chroot" if not target.live_only else f"{target.package_set_code}.list.chroot_live"
-            file_path = self.__package_list_dir / filename
 
-            defaults.DEFAULT_LOGGER.info(f"Writing upstream packages {target.package_set_code} to {file_path}...")
+        for file_path, content in package_lists.items():
+            defaults.DEFAULT_LOGGER.info(f"Writing upstream packages to {file_path}...")
             with open(file_path, "a") as f:
-                if target.priority != PackagePriority.NOTSET:
-                    f.write(f"! Packages Priority {target.priority}\n\n")
-
-                for package in target.packages:
-                    f.write(f"{package}\n")
+                f.write(content)
             defaults.DEFAULT_LOGGER.info(f"Upstream packages {file_path} saved.")
 
+        for duplicate in self.__duplicates:
+            defaults.DEFAULT_LOGGER.warning(
+                f"Package {duplicate.package} of set {duplicate.package_set_code} is already listed by set "
+                f"{duplicate.first_package_set_code}. Skip it."
+            )
+
         defaults.DEFAULT_LOGGER.info("All upstream packages saved.")
 
+    def output_paths(self, targets: List[UpstreamPackages]) -> List[Path]:
+        return list(dict.fromkeys(self.__package_list_file(target) for target in targets))
+
+    def plan(self, targets: List[UpstreamPackages]) -> List[FileOperation]:
+        handler = type(self).__name__
+        package_lists, _ = self.__render_package_lists(targets)
+
+        operations = [FileOperation(
+            operation_type=FileOperationType.MKDIR, handler=handler, destination=self.__package_list_dir)] \
+            if package_lists else []
+
+        for file_path, content in package_lists.items():
+            operations.append(FileOperation(
+                operation_type=FileOperationType.APPEND, handler=handler, target=file_path.name,
+                destination=file_path, size=len(content.encode()),
+            ))
+
+        return operations
+
+    def __render_package_lists(
+        self, targets: List[UpstreamPackages],
+    ) -> Tuple[Dict[Path, str], List[DuplicatePackage]]:
+        """
+        Content of every list file, in order of the first target writing to it, and dropped duplicates.
+        Sets installed in both systems are deduplicated first, so they take precedence over live only sets.
+        """
+        # package -> set code listing it first, for sets installed in both systems and live only sets
+        listed = {False: {}, True: {}}
+        contents = {target_index: [] for target_index in range(len(targets))}
+        duplicates = []
+
+        for live_only in (False, True):
+            for target_index, target in enumerate(targets):
+                if target.live_only != live_only:
+                    continue
+
+                conditional_depth = 0
+                for package in target.packages:
+                    # live-build directives (e.g. "#if ARCHITECTURES amd64", "#endif") and packages listed
+                    # conditionally are kept as is, so conditional blocks stay balanced and unconditional packages
+                    # are never dropped in favor of conditional ones
+                    if package.startswith("#"):
+                        if package.startswith(("#if", "#nif")):
+                            conditional_depth += 1
+                        elif package.startswith("#endif"):
+                            conditional_depth = max(conditional_depth - 1, 0)
+                        contents[target_index].append(f"{package}\n")
+                        continue
+                    if conditional_depth:
+                        contents[target_index].append(f"{package}\n")
+                        continue
+
+                    first_package_set_code = listed[False].get(package, listed[True].get(package))
+                    if first_package_set_code is not None:
+                        duplicates.append(DuplicatePackage(
+                            package=package, package_set_code=target.package_set_code,
+                            first_package_set_code=first_package_set_code,
+                        ))
+                        continue
+
+                    listed[live_only][package] = target.package_set_code
+                    contents[target_index].append(f"{package}\n")
+
+        package_lists = {}
+        for target_index, target in enumerate(targets):
+            lines = package_lists.setdefault(self.__package_list_file(target), [])
+            if target.priority != PackagePriority.NOTSET:
+                lines.append(f"! Packages Priority {target.priority}\n\n")
+            lines.extend(contents[target_index])
+
+        return {file_path: "".join(lines) for file_path, lines in package_lists.items()}, duplicates
+
+    def __package_list_file(self, target: UpstreamPackages) -> Path:
+        filename = f"{target.package_set_code}.list.chroot" if not target.live_only else f"{target.package_set_code}.list.chroot_live"
+        return self.__package_list_dir / filename
+
 
 class CustomDebWriter(TargetHandler):
     """
-    Save custom debs to :const:`lbutils.defaults.CHROOT_DEB_DIR`.
-    
+    Save custom debs to :const:`lbutils.defaults.CHROOT_DEB_DIR`. Debs are saved under the name ``dpkg-name`` would
+    give them, read by :func:`lbutils.deb.read_deb_metadata`. Files which are not ``ar`` archives keep their names.
+
     :param pathlib.Path,Optional iso_build_dir: Image build directory.
-    :param pathlib.Path,Optional dpkg_name_binary: dpkg-name binary path. Used to correct ``.deb`` file name.
+    :param pathlib.Path,Optional dpkg_name_binary: dpkg-name binary path. Used to correct ``.deb`` file name if
+        metadata can't be read in process, e.g. ``control.tar.zst`` without the ``zstandard`` package.
+    :param DebStore,Optional deb_store: Store debs are hardlinked from instead of being copied. Not used by default.
     """
-    def __init__(self, iso_build_dir: Path, dpkg_name_binary: Path = defaults.DEFAULT_DPKG_NAME_BINARY):
+    def __init__(
+        self, iso_build_dir: Path, dpkg_name_binary: Path = defaults.DEFAULT_DPKG_NAME_BINARY,
+        deb_store: DebStore = None,
+    ):
         self.__chroot_deb_dir = iso_build_dir.joinpath(defaults.CHROOT_DEB_DIR)
         self.__dpkg_name_binary = dpkg_name_binary
+        self.__deb_store = deb_store
 
     def execute(self, targets: List[CustomDeb]):
         defaults.DEFAULT_LOGGER.info("Writing custom deb ...")
@@ -116,13 +639,77 @@ class CustomDebWriter(TargetHandler):
         for target in targets:
             self.__chroot_deb_dir.mkdir(parents=True, exist_ok=True)
             source_deb = target.get_deb()
-            temp_deb_path = self.__chroot_deb_dir / source_deb.name
-            defaults.DEFAULT_LOGGER.info(f"Copying custom deb {source_deb} to {temp_deb_path}")
-            shutil.copy(source_deb, temp_deb_path)
-            run_command([str(self.__dpkg_name_binary), str(temp_deb_path)])
+            deb_name = self.__deb_name(source_deb)
+
+            if deb_name is not None and self.__deb_store is not None:
+                deb_path = self.__chroot_deb_dir / deb_name
+                defaults.DEFAULT_LOGGER.info(f"Linking custom deb {source_deb} to {deb_path} from deb store")
+                self.__deb_store.link(source_deb, deb_path)
+            elif deb_name is not None:
+                deb_path = self.__chroot_deb_dir / deb_name
+                defaults.DEFAULT_LOGGER.info(f"Copying custom deb {source_deb} to {deb_path}")
+                shutil.copy(source_deb, deb_path)
+            else:
+                temp_deb_path = self.__chroot_deb_dir / source_deb.name
+                defaults.DEFAULT_LOGGER.info(f"Copying custom deb {source_deb} to {temp_deb_path}")
+                shutil.copy(source_deb, temp_deb_path)
+                run_command([str(self.__dpkg_name_binary), str(temp_deb_path)])
 
         defaults.DEFAULT_LOGGER.info("All custom deb saved.")
 
+    def output_paths(self, targets: List[CustomDeb]) -> List[Path]:
+        deb_names = [self.__deb_name(target.get_deb()) for target in targets]
+        if None in deb_names:
+            # Final names are decided by dpkg-name
+            return [self.__chroot_deb_dir]
+
+        return [self.__chroot_deb_dir / deb_name for deb_name in deb_names]
+
+    def plan(self, targets: List[CustomDeb]) -> List[FileOperation]:
+        handler = type(self).__name__
+        operations = [FileOperation(
+            operation_type=FileOperationType.MKDIR, handler=handler, destination=self.__chroot_deb_dir)] \
+            if targets else []
+
+        for target in targets:
+            source_deb = target.get_deb()
+            deb_name = self.__deb_name(source_deb)
+
+            if deb_name is not None:
+                operations.extend(plan_copy(handler, source_deb.name, source_deb, self.__chroot_deb_dir / deb_name))
+                continue
+
+            temp_deb_path = self.__chroot_deb_dir / source_deb.name
+            operations.extend(plan_copy(handler, source_deb.name, source_deb, temp_deb_path))
+            operations.append(FileOperation(
+                operation_type=FileOperationType.RUN, handler=handler, target=source_deb.name,
+                command=[str(self.__dpkg_name_binary), str(temp_deb_path)],
+            ))
+            operations.append(FileOperation(
+                operation_type=FileOperationType.RENAME, handler=handler, target=source_deb.name,
+                source=temp_deb_path,
+            ))
+
+        return operations
+
+    @staticmethod
+    def __deb_name(source_deb: Path) -> Optional[str]:
+        """
+        Final file name of ``source_deb``, or ``None`` if it must be decided by ``dpkg-name``.
+        """
+        if not is_ar_archive(source_deb):
+            defaults.DEFAULT_LOGGER.warning(f"{source_deb} is not a deb archive, keep its name.")
+            return source_deb.name
+
+        try:
+            return read_deb_metadata(source_deb).canonical_name
+        except Exception as e:
+            defaults.DEFAULT_LOGGER.warning(f"Failed to read metadata of {source_deb}, fall back to dpkg-name: {e}")
+            return None
+
+    def unit_key(self, target: CustomDeb) -> str:
+        return f"{type(self).__name__}:{target.get_deb().name}"
+
 
 class AptPreferencesWriter(TargetHandler):
     """
@@ -141,30 +728,76 @@ class AptPreferencesWriter(TargetHandler):
         defaults.DEFAULT_LOGGER.info("All build time apt preferences saved.")
 
     def _write_apt_preferences(self, targets: List[AptPreference]):
-        for target in targets:
-            self.__write_single_target(target)
+        for preference_file, preferences in self.__index_preferences(targets).items():
+            preference_file.parent.mkdir(parents=True, exist_ok=True)
+
+            defaults.DEFAULT_LOGGER.info(f"Writing {len(preferences)} apt preferences to {preference_file}.")
+            with open(preference_file, "a") as f:
+                f.write(self.__render_preferences(preferences))
+            defaults.DEFAULT_LOGGER.info(f"Apt preferences {preference_file} saved.")
+
+    def output_paths(self, targets: List[AptPreference]) -> List[Path]:
+        return list(dict.fromkeys(self.__preference_file(target) for target in targets))
 
-    def __write_single_target(self, target: AptPreference):
-        defaults.DEFAULT_LOGGER.info(f"Preference Type: {target.preference_type}")
+    def plan(self, targets: List[AptPreference]) -> List[FileOperation]:
+        handler = type(self).__name__
+        operations = []
 
-        preference_file = self.__build_time_apt_preference_file \
+        for preference_file, preferences in self.__index_preferences(targets).items():
+            content = self.__render_preferences(preferences)
+            operations.append(FileOperation(
+                operation_type=FileOperationType.MKDIR, handler=handler, target=preference_file.name,
+                destination=preference_file.parent,
+            ))
+            operations.append(FileOperation(
+                operation_type=FileOperationType.APPEND, handler=handler, target=preference_file.name,
+                destination=preference_file, size=len(content.encode()),
+            ))
+
+        return operations
+
+    def __preference_file(self, target: AptPreference) -> Path:
+        return self.__build_time_apt_preference_file \
             if target.preference_type is AptPreferenceType.BUILD_TIME \
             else self.__run_time_apt_preference_file
 
-        preference_file.parent.mkdir(parents=True, exist_ok=True)
-
-        defaults.DEFAULT_LOGGER.info(
-            f"Writing apt preferences of {target.package} to {preference_file}.")
-        with open(preference_file, "a") as f:
-            f.writelines(
-                [
-                    f"Package: {target.package}\n",
-                    f"Pin: {target.pin}\n",
-                    f"Pin-Priority: {target.pin_priority}\n",
-                    "\n",
-                ]
-            )
-        defaults.DEFAULT_LOGGER.info(f"Apt preferences of {target.package} saved.")
+    def __index_preferences(
+        self, targets: List[AptPreference],
+    ) -> Dict[Path, Dict[Tuple[str, str], AptPreference]]:
+        """
+        Preferences per file, keyed by package and pin, in order of first occurrence. Identical preferences are
+        merged, and preferences pinning the same package and pin with different priorities are rejected.
+        """
+        index = {}
+        conflicts = []
+
+        for target in targets:
+            preferences = index.setdefault(self.__preference_file(target), {})
+            key = (target.package, target.pin)
+
+            existing = preferences.get(key)
+            if existing is None:
+                preferences[key] = target
+            elif existing.pin_priority == target.pin_priority:
+                defaults.DEFAULT_LOGGER.info(
+                    f"Merge duplicated apt preference of {target.package} pinned to {target.pin}.")
+            else:
+                conflicts.append(
+                    f"{target.package} pinned to {target.pin} in {target.preference_type} preferences has priorities "
+                    f"{existing.pin_priority} and {target.pin_priority}"
+                )
+
+        if conflicts:
+            raise Exception(f"Conflicting apt preferences: {'; '.join(conflicts)}")
+
+        return index
+
+    @staticmethod
+    def __render_preferences(preferences: Dict[Tuple[str, str], AptPreference]) -> str:
+        return "".join(
+            f"Package: {preference.package}\nPin: {preference.pin}\nPin-Priority: {preference.pin_priority}\n\n"
+            for preference in preferences.values()
+        )
 
 
 class HookScriptWriter(TargetHandler):
@@ -173,8 +806,42 @@ class HookScriptWriter(TargetHandler):
     and :const:`lbutils.defaults.NORMAL_HOOKS_DIR` (for live/installed system).
 
     :param pathlib.Path,Optional iso_build_dir: Image build directory.
+    :param int,Optional live_hook_order_start: Order of the first live hook. Used to append hooks after hooks written
+       by another writer. ``1`` by default.
+    :param int,Optional normal_hook_order_start: Order of the first normal hook. ``1`` by default.
+    :param bool,Optional bundle: If ``True``, consecutive hooks in the same directory are concatenated into one
+       hook, so live-build enters chroot once for all of them. Each bundled hook still runs as its own script in
+       order, and the bundle stops with the name of the failing hook. Bundles never span a builtin hook order, so
+       hooks keep running in the same order relative to builtin hooks. Only scripts with a shebang are bundled.
+       ``False`` by default.
     """
-    def __init__(self, iso_build_dir: Path):
+    BUNDLE_HEADER = """#!/bin/sh
+# Hooks bundled by lbutils. Each section runs as a separate script, in order.
+lbutils_run_hook() {
+    hook_name="$1"
+    hook_file="$(mktemp)"
+    cat > "$hook_file"
+    chmod +x "$hook_file"
+    "$hook_file"
+    status=$?
+    rm -f "$hook_file"
+    if [ "$status" -ne 0 ]; then
+        echo "E: Bundled hook $hook_name failed with exit code $status" >&2
+        exit "$status"
+    fi
+    echo "I: Bundled hook $hook_name finished"
+}
+"""
+    """
+    Header of bundled hooks. Sections are passed to ``lbutils_run_hook`` as here-documents.
+    """
+
+    def __init__(
+        self, iso_build_dir: Path,
+        live_hook_order_start: int = 1, normal_hook_order_start: int = 1,
+        bundle: bool = False,
+    ):
+        self.__bundle = bundle
         self.__live_hooks_dir = iso_build_dir.joinpath(defaults.LIVE_HOOKS_DIR)
         self.__normal_hooks_dir = iso_build_dir.joinpath(defaults.NORMAL_HOOKS_DIR)
         
@@ -187,32 +854,163 @@ class HookScriptWriter(TargetHandler):
             9000, 9010, 9020
         ]
 
-        self.__current_live_hook_order = 1
-        self.__current_normal_hook_order = 1
+        self.__current_live_hook_order = live_hook_order_start
+        self.__current_normal_hook_order = normal_hook_order_start
+
+    @property
+    def next_live_hook_order(self) -> int:
+        """
+        Order of the next live hook to write.
+        """
+        return self.__current_live_hook_order
+
+    @property
+    def next_normal_hook_order(self) -> int:
+        """
+        Order of the next normal hook to write.
+        """
+        return self.__current_normal_hook_order
 
     def execute(self, targets: List[HookScript]):
         defaults.DEFAULT_LOGGER.info(f"Writing hook scripts ...")
 
+        hook_paths = self.__assign_hook_paths(targets, update_orders=True)
+        if not self.__bundle:
+            for target, target_path in hook_paths:
+                self.__write_single_target(target=target, target_path=target_path)
+        else:
+            for bundle in self.__group_bundles(hook_paths):
+                if len(bundle) == 1:
+                    self.__write_single_target(target=bundle[0][0], target_path=bundle[0][1])
+                else:
+                    self.__write_bundle(bundle)
+
+        defaults.DEFAULT_LOGGER.info(f"All hook scripts saved.")
+
+    def output_paths(self, targets: List[HookScript]) -> List[Path]:
+        return [self.__live_hooks_dir, self.__normal_hooks_dir]
+
+    def plan(self, targets: List[HookScript]) -> List[FileOperation]:
+        handler = type(self).__name__
+        operations = []
+
+        hook_paths = self.__assign_hook_paths(targets, update_orders=False)
+        bundles = self.__group_bundles(hook_paths) if self.__bundle else [[hook_path] for hook_path in hook_paths]
+
+        for bundle in bundles:
+            target, target_path = bundle[0]
+            operations.append(FileOperation(
+                operation_type=FileOperationType.MKDIR, handler=handler, target=target.hook_name,
+                destination=target_path.parent,
+            ))
+            if len(bundle) == 1:
+                operations.extend(plan_copy(handler, target.hook_name, target.get_script_file(), target_path))
+            else:
+                operations.append(FileOperation(
+                    operation_type=FileOperationType.WRITE, handler=handler,
+                    target=", ".join(bundled_target.hook_name for bundled_target, _ in bundle),
+                    destination=self.__bundle_path(bundle), size=len(self.__render_bundle(bundle).encode()),
+                ))
+
+        return operations
+
+    def __assign_hook_paths(self, targets: List[HookScript], update_orders: bool) -> List[Tuple[HookScript, Path]]:
+        current_live_hook_order = self.__current_live_hook_order
+        current_normal_hook_order = self.__current_normal_hook_order
+        hook_paths = []
+
         for target in targets:
             if target.live_only:
-                self.__write_single_target(target=target, hook_dir=self.__live_hooks_dir, current_order=self.__current_live_hook_order)
-                self.__current_live_hook_order +=1
-                if self.__current_live_hook_order in self.__builtin_live_hooks_orders:
-                    self.__current_live_hook_order += 1
+                hook_paths.append((target, self.__live_hooks_dir / self.__hook_filename(target, current_live_hook_order)))
+                current_live_hook_order += 1
+                if current_live_hook_order in self.__builtin_live_hooks_orders:
+                    current_live_hook_order += 1
             else:
-                self.__write_single_target(target=target, hook_dir=self.__normal_hooks_dir, current_order=self.__current_normal_hook_order)
-                self.__current_normal_hook_order += 1
-                if self.__current_normal_hook_order in self.__builtin_normal_hooks_orders:
-                    self.__current_normal_hook_order += 1
+                hook_paths.append((target, self.__normal_hooks_dir / self.__hook_filename(target, current_normal_hook_order)))
+                current_normal_hook_order += 1
+                if current_normal_hook_order in self.__builtin_normal_hooks_orders:
+                    current_normal_hook_order += 1
 
-        defaults.DEFAULT_LOGGER.info(f"All hook scripts saved.")
+        if update_orders:
+            self.__current_live_hook_order = current_live_hook_order
+            self.__current_normal_hook_order = current_normal_hook_order
+
+        return hook_paths
+
+    @staticmethod
+    def __hook_filename(target: HookScript, order: int) -> str:
+        return f"{order:04}-{target.hook_name}.hook.chroot"
+
+    def __group_bundles(self, hook_paths: List[Tuple[HookScript, Path]]) -> List[List[Tuple[HookScript, Path]]]:
+        """
+        Group consecutive hooks in the same directory with consecutive orders, i.e. without builtin hooks between
+        them. Hooks which are not scripts are never bundled.
+        """
+        bundles = []
+        previous_order = None
+
+        for target, target_path in hook_paths:
+            order = int(target_path.name.split("-", 1)[0])
+            bundleable = self.__read_script(target) is not None
+
+            if bundleable and bundles and previous_order is not None and order == previous_order + 1 \
+                    and bundles[-1][-1][1].parent == target_path.parent:
+                bundles[-1].append((target, target_path))
+            else:
+                bundles.append([(target, target_path)])
+
+            previous_order = order if bundleable else None
+
+        return bundles
+
+    @staticmethod
+    def __read_script(target: HookScript) -> str | None:
+        content = Path(target.get_script_file()).read_bytes()
+        if not content.startswith(b"#!"):
+            return None
+
+        try:
+            return content.decode()
+        except UnicodeDecodeError:
+            return None
+
+    @staticmethod
+    def __bundle_path(bundle: List[Tuple[HookScript, Path]]) -> Path:
+        first_path = bundle[0][1]
+        order = first_path.name.split("-", 1)[0]
+        return first_path.with_name(f"{order}-bundle-{bundle[0][0].hook_name}.hook.chroot")
+
+    def __render_bundle(self, bundle: List[Tuple[HookScript, Path]]) -> str:
+        sections = [self.BUNDLE_HEADER]
+
+        for target, target_path in bundle:
+            script = self.__read_script(target)
+            if not script.endswith("\n"):
+                script += "\n"
+
+            delimiter = "LBUTILS_HOOK_EOF"
+            while f"\n{delimiter}\n" in f"\n{script}":
+                delimiter += "_"
+
+            hook_name = target_path.name.removesuffix(".hook.chroot")
+            sections.append(f"\nlbutils_run_hook {hook_name} <<'{delimiter}'\n{script}{delimiter}\n")
+
+        return "".join(sections)
+
+    def __write_bundle(self, bundle: List[Tuple[HookScript, Path]]):
+        bundle_path = self.__bundle_path(bundle)
+        bundle_path.parent.mkdir(parents=True, exist_ok=True)
+
+        defaults.DEFAULT_LOGGER.info(f"Bundling {len(bundle)} hooks to {bundle_path}")
+        with open(bundle_path, "w") as f:
+            f.write(self.__render_bundle(bundle))
+        bundle_path.chmod(0o755)
+        defaults.DEFAULT_LOGGER.info(f"Hook {bundle_path} saved")
 
     @staticmethod
-    def __write_single_target(target: HookScript, hook_dir: Path, current_order: int):
-        hook_dir.mkdir(parents=True, exist_ok=True)
-        hook_filename = f"{current_order:04}-{target.hook_name}.hook.chroot"
+    def __write_single_target(target: HookScript, target_path: Path):
+        target_path.parent.mkdir(parents=True, exist_ok=True)
         source_path = target.get_script_file()
-        target_path = hook_dir / hook_filename
 
         defaults.DEFAULT_LOGGER.info(f"Writing {source_path} to {target_path}")
         shutil.copy(source_path, target_path)
@@ -225,17 +1023,18 @@ class StaticFileWriter(TargetHandler):
     and :const:`lbutils.defaults.BINARY_INCLUDE_DIR` (as part of iso).
     
     :param pathlib.Path,Optional iso_build_dir: Image build directory.
+    :param CopyEngine,Optional copy_engine: Engine copying sources. An engine with :attr:`CopyStrategy.COPY` by default.
     """
-    def __init__(self, iso_build_dir: Path):
+    def __init__(self, iso_build_dir: Path, copy_engine: CopyEngine = None):
         self.__chroot_include_dir = iso_build_dir.joinpath(defaults.CHROOT_INCLUDE_DIR)
         self.__binary_include_dir = iso_build_dir.joinpath(defaults.BINARY_INCLUDE_DIR)
+        self.__copy_engine = CopyEngine() if copy_engine is None else copy_engine
 
     def execute(self, targets: List[StaticFile]):
         defaults.DEFAULT_LOGGER.info("Writing static files ...")
 
         for target in targets:
-            include_dir = self.__binary_include_dir if target.binary_file else self.__chroot_include_dir
-            target_file_path = include_dir.joinpath(target.target_filepath.relative_to(target.target_filepath.anchor))
+            target_file_path = self.__target_file_path(target)
             source_file = target.get_source_file()
 
             defaults.DEFAULT_LOGGER.info(f"Ensuring parent path of {target_file_path} ... ")
@@ -243,37 +1042,124 @@ class StaticFileWriter(TargetHandler):
             defaults.DEFAULT_LOGGER.info(f"Parent path {target_file_path.parent} created.")
 
             defaults.DEFAULT_LOGGER.info(f"Writing {source_file} to {target_file_path}")
-            if source_file.is_file():
-                shutil.copy(source_file, target_file_path)
+            if target.sync is None:
+                self.__copy_engine.copy(source_file, target_file_path, strategy=target.copy_strategy)
             else:
-                shutil.copytree(source_file, target_file_path, dirs_exist_ok=True, symlinks=True)
+                sync_report = self.__copy_engine.sync(
+                    source_file, target_file_path, strategy=target.copy_strategy,
+                    checksum=target.sync.checksum, delete=target.sync.delete,
+                )
+                defaults.DEFAULT_LOGGER.info(f"Synced {target_file_path}: {sync_report.summary()}")
             defaults.DEFAULT_LOGGER.info(f"Static file {target_file_path} saved.")
 
         defaults.DEFAULT_LOGGER.info(f"All static files saved.")
 
+    def output_paths(self, targets: List[StaticFile]) -> List[Path]:
+        return [self.__target_file_path(target) for target in targets]
+
+    def plan(self, targets: List[StaticFile]) -> List[FileOperation]:
+        handler = type(self).__name__
+        operations = []
+
+        for target in targets:
+            target_file_path = self.__target_file_path(target)
+            operations.append(FileOperation(
+                operation_type=FileOperationType.MKDIR, handler=handler, target=str(target.target_filepath),
+                destination=target_file_path.parent,
+            ))
+            operations.extend(plan_copy(handler, str(target.target_filepath), target.get_source_file(), target_file_path))
+
+        return operations
+
+    def unit_key(self, target: StaticFile) -> str:
+        return f"{type(self).__name__}:{self.__target_file_path(target)}"
+
+    def __target_file_path(self, target: StaticFile) -> Path:
+        include_dir = self.__binary_include_dir if target.binary_file else self.__chroot_include_dir
+        return include_dir.joinpath(target.target_filepath.relative_to(target.target_filepath.anchor))
+
 
 class DirectConfigWriter(TargetHandler):
     """
     Add files to image build directory.
 
     :param pathlib.Path,Optional iso_build_dir: Image build directory.
+    :param CopyEngine,Optional copy_engine: Engine copying sources. An engine with :attr:`CopyStrategy.COPY` by default.
     """
-    def __init__(self, iso_build_dir: Path):
+    def __init__(self, iso_build_dir: Path, copy_engine: CopyEngine = None):
         self.__iso_build_dir = iso_build_dir
+        self.__copy_engine = CopyEngine() if copy_engine is None else copy_engine
 
     def execute(self, targets: List[DirectConfig]):
         for target in targets:
             source_file = target.get_source_file()
-            target_file_path = self.__iso_build_dir.joinpath(target.target_filepath.relative_to(target.target_filepath.anchor))
+            target_file_path = self.__target_file_path(target)
 
             defaults.DEFAULT_LOGGER.info(f"Ensuring parent path of {target_file_path} ... ")
             target_file_path.parent.mkdir(parents=True, exist_ok=True)
 
             defaults.DEFAULT_LOGGER.info(f"Writing {source_file} to {target_file_path}")
-            if source_file.is_file():
-                shutil.copy(source_file, target_file_path)
+            if target.sync is None:
+                self.__copy_engine.copy(source_file, target_file_path, strategy=target.copy_strategy)
             else:
-                shutil.copytree(source_file, target_file_path, dirs_exist_ok=True, symlinks=True)
+                sync_report = self.__copy_engine.sync(
+                    source_file, target_file_path, strategy=target.copy_strategy,
+                    checksum=target.sync.checksum, delete=target.sync.delete,
+                )
+                defaults.DEFAULT_LOGGER.info(f"Synced {target_file_path}: {sync_report.summary()}")
             defaults.DEFAULT_LOGGER.info(f"Direct config {target_file_path} saved.")
 
         defaults.DEFAULT_LOGGER.info(f"All direct configs saved.")
+
+    def output_paths(self, targets: List[DirectConfig]) -> List[Path]:
+        return [self.__target_file_path(target) for target in targets]
+
+    def plan(self, targets: List[DirectConfig]) -> List[FileOperation]:
+        handler = type(self).__name__
+        operations = []
+
+        for target in targets:
+            target_file_path = self.__target_file_path(target)
+            operations.append(FileOperation(
+                operation_type=FileOperationType.MKDIR, handler=handler, target=str(target.target_filepath),
+                destination=target_file_path.parent,
+            ))
+            operations.extend(plan_copy(handler, str(target.target_filepath), target.get_source_file(), target_file_path))
+
+        return operations
+
+    def unit_key(self, target: DirectConfig) -> str:
+        return f"{type(self).__name__}:{self.__target_file_path(target)}"
+
+    def __target_file_path(self, target: DirectConfig) -> Path:
+        return self.__iso_build_dir.joinpath(target.target_filepath.relative_to(target.target_filepath.anchor))
+
+
+def create_target_handlers(
+    iso_build_dir: Path,
+    dpkg_name_binary: Path = defaults.DEFAULT_DPKG_NAME_BINARY,
+    bundle_hooks: bool = False,
+    copy_engine: CopyEngine = None,
+    deb_store: DebStore = None,
+) -> Dict[type(Target), TargetHandler]:
+    """
+    Builtin target handlers writing to ``iso_build_dir``, in the order :func:`lbutils.build_image` runs them.
+
+    :param pathlib.Path iso_build_dir: Image build directory.
+    :param pathlib.Path,Optional dpkg_name_binary: dpkg-name binary path. See :class:`CustomDebWriter`.
+    :param bool,Optional bundle_hooks: Bundle consecutive hooks. See :class:`HookScriptWriter`.
+    :param CopyEngine,Optional copy_engine: Engine copying static files and direct configs. Shared by both writers.
+    :param DebStore,Optional deb_store: Store custom debs are linked from. See :class:`CustomDebWriter`.
+    :return: Map of target type to target handler.
+    :rtype: Dict[type(Target), TargetHandler]
+    """
+    copy_engine = CopyEngine() if copy_engine is None else copy_engine
+
+    return {
+        UpstreamPackages: UpstreamPackagesWriter(iso_build_dir=iso_build_dir),
+        CustomDeb: CustomDebWriter(iso_build_dir=iso_build_dir, dpkg_name_binary=dpkg_name_binary, deb_store=deb_store),
+        HookScript: HookScriptWriter(iso_build_dir=iso_build_dir, bundle=bundle_hooks),
+        StaticFile: StaticFileWriter(iso_build_dir=iso_build_dir, copy_engine=copy_engine),
+        AptPreference: AptPreferencesWriter(iso_build_dir=iso_build_dir),
+        DirectConfig: DirectConfigWriter(iso_build_dir=iso_build_dir, copy_engine=copy_engine),
+    }
@@ -1,7 +1,10 @@
+import dataclasses
+import functools
+import typing
 from dataclasses import dataclass
 from enum import StrEnum
 from pathlib import Path
-from typing import List, Callable
+from typing import List, Callable, Optional
 from abc import ABCMeta
 
 
@@ -68,6 +71,48 @@ class HookScript(Target):
     live_only: bool = False
 
 
+class CopyStrategy(StrEnum):
+    """
+    How files are copied to the image build directory. Used as value of :attr:`StaticFile.copy_strategy` and
+    :attr:`DirectConfig.copy_strategy`. See :class:`lbutils.copy_engine.CopyEngine`.
+    """
+    AUTO = "auto"
+    """
+    Reflink if supported, otherwise ``COPY_FILE_RANGE``.
+    """
+    REFLINK = "reflink"
+    """
+    Clone files sharing data with the source. Supported by filesystems like btrfs and xfs.
+    """
+    HARDLINK = "hardlink"
+    """
+    Link the source if it's on the same filesystem. Only used when asked for explicitly, since the source and the
+    copy share content: neither may be modified afterwards.
+    """
+    COPY_FILE_RANGE = "copy_file_range"
+    """
+    Copy in kernel, keeping sparse files sparse.
+    """
+    COPY = "copy"
+    """
+    Copy through userspace.
+    """
+
+
+@dataclass(frozen=True)
+class SyncOptions:
+    """
+    Sync a source to its destination instead of copying it, like ``rsync``. Files whose size and modification time
+    match the source are skipped. Used as value of :attr:`StaticFile.sync` and :attr:`DirectConfig.sync`.
+    See :meth:`lbutils.copy_engine.CopyEngine.sync`.
+
+    :param bool,Optional checksum: Compare content hashes instead of modification times. `False` by default.
+    :param bool,Optional delete: Delete destination files not in the source. `False` by default.
+    """
+    checksum: bool = False
+    delete: bool = False
+
+
 @dataclass
 class StaticFile(Target):
     """
@@ -77,10 +122,15 @@ class StaticFile(Target):
     :param Callable[[], pathlib.Path] get_source_file: Callback function to get source file.
     :param bool,Optional binary_file: Save file in chroot (`False`) to access via live/installed system.
         or as binary (`True`) to access in iso without booting system. `False` by default.
+    :param CopyStrategy,Optional copy_strategy: How to copy the source. Strategy of the writer is used by default.
+    :param SyncOptions,Optional sync: Sync the source to skip unchanged files, e.g. when rebuilding into an existing
+        build directory. Always copied by default.
     """
     target_filepath: Path
     get_source_file: Callable[[], Path]
     binary_file: bool = False
+    copy_strategy: Optional[CopyStrategy] = None
+    sync: Optional[SyncOptions] = None
 
 
 @dataclass
@@ -120,6 +170,86 @@ class DirectConfig(Target):
 
     :param pathlib.Path target_filepath: Expected path under the image build directory.
     :param Callable[[], pathlib.Path] get_source_file: Callback function to get source file.
+    :param CopyStrategy,Optional copy_strategy: How to copy the source. Strategy of the writer is used by default.
+    :param SyncOptions,Optional sync: Sync the source to skip unchanged files, e.g. when rebuilding into an existing
+        build directory. Always copied by default.
     """
     target_filepath: Path
     get_source_file: Callable[[], Path]
+    copy_strategy: Optional[CopyStrategy] = None
+    sync: Optional[SyncOptions] = None
+
+
+@functools.cache
+def frozen_target_type(target_type: type) -> type:
+    """
+    Frozen and slotted variant of a target type, e.g. :class:`FrozenStaticFile` of :class:`StaticFile`, with the same
+    fields. Instances are immutable, smaller than instances of ``target_type``, and hashable, so they can be used as
+    cache keys. Variants are registered as virtual subclasses of ``target_type``, so ``isinstance`` checks and target
+    writers accept them.
+
+    :param type target_type: Target dataclass.
+    :return: Frozen variant. ``target_type`` is available as its ``mutable_type`` attribute.
+    :rtype: type
+    """
+    fields = []
+    for target_field in dataclasses.fields(target_type):
+        if target_field.default is not dataclasses.MISSING:
+            fields.append((target_field.name, target_field.type, dataclasses.field(default=target_field.default)))
+        elif target_field.default_factory is not dataclasses.MISSING:
+            fields.append((
+                target_field.name, target_field.type, dataclasses.field(default_factory=target_field.default_factory)))
+        else:
+            fields.append((target_field.name, target_field.type))
+
+    frozen_type = dataclasses.make_dataclass(
+        f"Frozen{target_type.__name__}", fields,
+        namespace={"mutable_type": target_type}, frozen=True, slots=True, module=__name__,
+    )
+    target_type.register(frozen_type)
+    return frozen_type
+
+
+def freeze_target(target: Target) -> Target:
+    """
+    Frozen variant of a target, see :func:`frozen_target_type`. Lists are converted to tuples.
+
+    :param Target target: Target to freeze. Returned as is if it's frozen already.
+    :return: Frozen target.
+    :rtype: Target
+    """
+    if hasattr(type(target), "mutable_type"):
+        return target
+
+    return frozen_target_type(type(target))(**{
+        target_field.name: tuple(value) if isinstance(value, list) else value
+        for target_field in dataclasses.fields(target)
+        for value in [getattr(target, target_field.name)]
+    })
+
+
+def thaw_target(target: Target) -> Target:
+    """
+    Mutable target of a frozen target from :func:`freeze_target`. Tuples of list fields are converted back to lists.
+
+    :param Target target: Target to thaw. Returned as is if it's not frozen.
+    :return: Mutable target.
+    :rtype: Target
+    """
+    target_type = getattr(type(target), "mutable_type", None)
+    if target_type is None:
+        return target
+
+    return target_type(**{
+        target_field.name: list(value) if typing.get_origin(target_field.type) is list else value
+        for target_field in dataclasses.fields(target)
+        for value in [getattr(target, target_field.name)]
+    })
+
+
+FrozenUpstreamPackages = frozen_target_type(UpstreamPackages)
+FrozenCustomDeb = frozen_target_type(CustomDeb)
+FrozenHookScript = frozen_target_type(HookScript)
+FrozenStaticFile = frozen_target_type(StaticFile)
+FrozenAptPreference = frozen_target_type(AptPreference)
+FrozenDirectConfig = frozen_target_type(DirectConfig)
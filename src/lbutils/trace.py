@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict
+
+from lbutils import defaults
+
+
+class Tracer:
+    """
+    Records phases of a build as spans on a monotonic clock and exports them in Chrome trace event format,
+    which can be opened by ``chrome://tracing`` or https://ui.perfetto.dev .
+    See https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU .
+
+    :param bool enabled: If ``False``, spans are not recorded.
+    """
+    def __init__(self, enabled: bool = True):
+        self.__enabled = enabled
+        self.__events: List[Dict] = []
+        self.__thread_names: Dict[int, str] = {}
+        self.__lock = threading.Lock()
+        self.__origin_ns = time.monotonic_ns()
+        self.__pid = os.getpid()
+
+    @property
+    def enabled(self) -> bool:
+        return self.__enabled
+
+    @property
+    def events(self) -> List[Dict]:
+        """
+        Recorded trace events.
+        """
+        with self.__lock:
+            return list(self.__events)
+
+    @contextmanager
+    def span(self, name: str, category: str = "lbutils", **kwargs):
+        """
+        Record the wrapped block as a span.
+
+        :param str name: Span name.
+        :param str category: Span category.
+        :param kwargs: Additional arguments attached to the span. Converted to strings.
+        """
+        if not self.__enabled:
+            yield
+            return
+
+        start_ns = time.monotonic_ns()
+        try:
+            yield
+        finally:
+            end_ns = time.monotonic_ns()
+            thread = threading.current_thread()
+
+            with self.__lock:
+                self.__thread_names.setdefault(thread.ident, thread.name)
+                self.__events.append({
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": (start_ns - self.__origin_ns) / 1000,
+                    "dur": (end_ns - start_ns) / 1000,
+                    "pid": self.__pid,
+                    "tid": thread.ident,
+                    "args": {key: str(value) for key, value in kwargs.items()},
+                })
+
+    def export(self, trace_file: Path):
+        """
+        Write recorded spans to ``trace_file`` as Chrome trace event JSON.
+
+        :param pathlib.Path trace_file: Trace file path.
+        """
+        with self.__lock:
+            metadata_events = [
+                {"name": "thread_name", "ph": "M", "pid": self.__pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self.__thread_names.items()
+            ]
+            trace_events = metadata_events + list(self.__events)
+
+        trace_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(trace_file, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+        defaults.DEFAULT_LOGGER.info(f"Trace saved to {trace_file}.")
+
+
+NULL_TRACER = Tracer(enabled=False)
+"""
+Tracer which records nothing. Used when tracing is not requested.
+"""
@@ -0,0 +1,108 @@
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from lbutils import defaults
+
+TRASH_MARKER = ".trash-"
+"""
+Marker in names of trash directories. Trash of ``/tmp/iso`` is ``/tmp/.iso.trash-<random>``.
+"""
+
+
+def move_to_trash(path: Path, keep: Iterable[Path] = ()) -> Optional[Path]:
+    """
+    Rename ``path`` aside to a trash directory next to it, so ``path`` is free immediately. Renaming stays on the same
+    filesystem, so it doesn't depend on the size of ``path``.
+
+    :param pathlib.Path path: Directory to move.
+    :param Iterable[pathlib.Path] keep: Children of ``path`` to keep in place. If given, other children are moved
+       into the trash directory instead of ``path`` itself.
+    :return: Trash directory, or ``None`` if ``path`` doesn't exist.
+    :rtype: pathlib.Path
+    """
+    if not path.exists():
+        return None
+
+    trash_dir = path.parent / f".{path.name}{TRASH_MARKER}{uuid.uuid4().hex}"
+    keep = set(keep)
+
+    if not keep:
+        os.rename(path, trash_dir)
+    else:
+        trash_dir.mkdir()
+        for child in path.iterdir():
+            if child not in keep:
+                os.rename(child, trash_dir / child.name)
+
+    defaults.DEFAULT_LOGGER.info(f"Moved {path} to trash {trash_dir}.")
+    return trash_dir
+
+
+def stale_trash_dirs(path: Path) -> List[Path]:
+    """
+    Trash directories of ``path`` left by previous runs, e.g. runs crashed before their trash was removed.
+
+    :param pathlib.Path path: Directory whose trash to find.
+    :return: Trash directories.
+    :rtype: List[pathlib.Path]
+    """
+    return sorted(path.parent.glob(f".{path.name}{TRASH_MARKER}*"))
+
+
+def remove_tree(path: Path, workers: int = defaults.DEFAULT_REMOVE_WORKERS):
+    """
+    Remove directory tree ``path`` with several threads. Subtrees two levels below ``path``, e.g. ``chroot/usr``,
+    are removed in parallel, then the rest of the tree. Errors are ignored like ``shutil.rmtree(ignore_errors=True)``.
+
+    :param pathlib.Path path: Directory to remove.
+    :param int workers: Number of threads.
+    """
+    subtrees = [subtree for child in _sub_dirs(path) for subtree in _sub_dirs(child)]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lbutils-remove") as executor:
+        for subtree in subtrees:
+            executor.submit(shutil.rmtree, subtree, ignore_errors=True)
+
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_in_background(paths: List[Path], workers: int = defaults.DEFAULT_REMOVE_WORKERS) -> threading.Thread:
+    """
+    Remove directory trees in a background thread with :func:`remove_tree`. The thread is not a daemon, so the
+    interpreter waits for removal before exiting. Failures are logged, since nothing may join the thread.
+
+    :param List[pathlib.Path] paths: Directories to remove.
+    :param int workers: Number of threads removing each directory.
+    :return: Started thread.
+    :rtype: threading.Thread
+    """
+    def _remove():
+        for path in paths:
+            defaults.DEFAULT_LOGGER.info(f"Removing {path} in background ...")
+            try:
+                remove_tree(path, workers=workers)
+            except Exception as e:
+                defaults.DEFAULT_LOGGER.error(f"Failed to remove {path} in background: {e}")
+                continue
+
+            if os.path.lexists(path):
+                defaults.DEFAULT_LOGGER.error(f"Failed to remove {path} in background, remove it manually.")
+            else:
+                defaults.DEFAULT_LOGGER.info(f"{path} removed.")
+
+    thread = threading.Thread(target=_remove, name="lbutils-trash")
+    thread.start()
+    return thread
+
+
+def _sub_dirs(path: Path) -> List[Path]:
+    try:
+        with os.scandir(path) as entries:
+            return [Path(entry.path) for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except OSError:
+        return []
@@ -0,0 +1,213 @@
+from dataclasses import dataclass, field
+from enum import StrEnum
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from lbutils import defaults
+from lbutils.targets import Target, UpstreamPackages, HookScript, StaticFile, DirectConfig, CustomDeb
+
+EXCLUSIVE_TARGET_TYPES = (StaticFile, DirectConfig)
+"""
+Target types whose outputs belong to a single target. Other handlers merge their targets into shared outputs, e.g.
+package lists and hook directories.
+"""
+
+
+class IssueType(StrEnum):
+    """
+    Type of :class:`ValidationIssue`.
+    """
+    OVERLAPPING_OUTPUT = "overlapping_output"
+    """
+    Targets write the same path, or a target writes into a path owned by another handler.
+    """
+    SHADOWED_FILE = "shadowed_file"
+    """
+    A static file or direct config is written inside the directory of another one, so one overwrites the other
+    depending on writing order.
+    """
+    DUPLICATE_PACKAGE_SET = "duplicate_package_set"
+    """
+    :class:`UpstreamPackages` targets share a package set code.
+    """
+    DUPLICATE_DEB = "duplicate_deb"
+    """
+    :class:`CustomDeb` targets are saved under the same file name.
+    """
+    DUPLICATE_HOOK = "duplicate_hook"
+    """
+    :class:`HookScript` targets share a hook name or a script file.
+    """
+
+
+@dataclass
+class ValidationIssue:
+    """
+    A conflict between targets found by :func:`validate_targets`.
+
+    :param IssueType issue_type: Issue type.
+    :param str message: Description of the conflict.
+    """
+    issue_type: IssueType
+    message: str
+
+
+@dataclass
+class ValidationReport:
+    """
+    Result of :func:`validate_targets`.
+
+    :param List[ValidationIssue] issues: Conflicts found.
+    """
+    issues: List[ValidationIssue] = field(default_factory=list)
+
+    def raise_for_issues(self):
+        """
+        Raise an :class:`ExceptionGroup` of :attr:`issues` if there are any.
+        """
+        if self.issues:
+            raise ExceptionGroup(
+                f"Validation found {len(self.issues)} conflicting targets",
+                [Exception(f"{issue.issue_type.value}: {issue.message}") for issue in self.issues],
+            )
+
+
+class PathIndex:
+    """
+    Index of output paths to the targets writing them. Finds targets writing the same path, and targets writing
+    inside a directory another target writes, by looking up ancestors of each path, so it's linear in the number
+    of paths.
+    """
+    def __init__(self):
+        self.__owners: Dict[Path, List[Tuple[str, Target]]] = {}
+
+    def add(self, path: Path, owner: str, target: Target):
+        """
+        :param pathlib.Path path: Output path.
+        :param str owner: Description of the writer, e.g. the handler's unit key of ``target``.
+        :param Target target: Target writing ``path``.
+        """
+        self.__owners.setdefault(path, []).append((owner, target))
+
+    def owners(self, path: Path) -> List[Tuple[str, Target]]:
+        """
+        :param pathlib.Path path: Output path.
+        :return: Owners and targets writing exactly ``path``.
+        :rtype: List[Tuple[str, Target]]
+        """
+        return self.__owners.get(path, [])
+
+    def paths(self) -> List[Path]:
+        return list(self.__owners.keys())
+
+    def closest_owned_ancestor(self, path: Path) -> Path | None:
+        """
+        :param pathlib.Path path: Output path.
+        :return: Closest ancestor of ``path`` which is an output path itself, or ``None``.
+        :rtype: pathlib.Path
+        """
+        return next((parent for parent in path.parents if parent in self.__owners), None)
+
+
+def validate_targets(
+    targets: Dict[type(Target), List[Target]], target_handlers: Dict[type(Target), object],
+) -> ValidationReport:
+    """
+    Find conflicting targets without writing anything. Outputs come from
+    :meth:`lbutils.target_writer.TargetHandler.output_paths` of each target, so callbacks must be resolved already.
+
+    :param Dict[type(Target), List[Target]] targets: Collected targets by handled type.
+    :param Dict[type(Target), TargetHandler] target_handlers: Handlers supporting
+       :meth:`lbutils.target_writer.TargetHandler.output_paths`. Targets of other types, or whose outputs are
+       unknown, are not validated.
+    :return: Validation result.
+    :rtype: ValidationReport
+    """
+    report = ValidationReport()
+    path_index = PathIndex()
+
+    for target_type, handler in target_handlers.items():
+        for target in targets.get(target_type, []):
+            for path in handler.output_paths([target]) or []:
+                path_index.add(path, handler.unit_key(target), target)
+
+    _check_overlapping_outputs(path_index, report)
+    _check_package_sets(targets.get(UpstreamPackages, []), report)
+    _check_debs(path_index, report)
+    _check_hooks(targets.get(HookScript, []), report)
+
+    defaults.DEFAULT_LOGGER.info(f"Validated {len(path_index.paths())} output paths, found {len(report.issues)} issues.")
+    return report
+
+
+def _check_overlapping_outputs(path_index: PathIndex, report: ValidationReport):
+    for path in path_index.paths():
+        owners = path_index.owners(path)
+        owner_types = {type(target) for _, target in owners}
+
+        # Other handlers merge targets of the same type into shared outputs
+        if len(owner_types) > 1 or (len(owners) > 1 and isinstance(owners[0][1], EXCLUSIVE_TARGET_TYPES)):
+            report.issues.append(ValidationIssue(
+                issue_type=IssueType.OVERLAPPING_OUTPUT,
+                message=f"{path} is written by {', '.join(owner for owner, _ in owners)}",
+            ))
+
+        ancestor = path_index.closest_owned_ancestor(path)
+        if ancestor is None:
+            continue
+
+        ancestor_owners = path_index.owners(ancestor)
+        exclusive = all(isinstance(target, EXCLUSIVE_TARGET_TYPES) for _, target in owners + ancestor_owners)
+        if not exclusive and len({type(target) for _, target in owners + ancestor_owners}) == 1:
+            continue
+        report.issues.append(ValidationIssue(
+            issue_type=IssueType.SHADOWED_FILE if exclusive else IssueType.OVERLAPPING_OUTPUT,
+            message=f"{path} written by {', '.join(owner for owner, _ in owners)} is inside {ancestor} "
+                    f"written by {', '.join(owner for owner, _ in ancestor_owners)}",
+        ))
+
+
+def _check_package_sets(targets: List[UpstreamPackages], report: ValidationReport):
+    package_set_codes = {}
+    for target in targets:
+        package_set_codes[target.package_set_code] = package_set_codes.get(target.package_set_code, 0) + 1
+
+    for package_set_code, count in package_set_codes.items():
+        if count > 1:
+            report.issues.append(ValidationIssue(
+                issue_type=IssueType.DUPLICATE_PACKAGE_SET,
+                message=f"Package set {package_set_code} is defined by {count} targets",
+            ))
+
+
+def _check_debs(path_index: PathIndex, report: ValidationReport):
+    for path in path_index.paths():
+        deb_owners = [owner for owner, target in path_index.owners(path) if isinstance(target, CustomDeb)]
+        # Debs renamed by dpkg-name report their directory
+        if path.suffix == ".deb" and len(deb_owners) > 1:
+            report.issues.append(ValidationIssue(
+                issue_type=IssueType.DUPLICATE_DEB,
+                message=f"{path} is written by {', '.join(deb_owners)}",
+            ))
+
+
+def _check_hooks(targets: List[HookScript], report: ValidationReport):
+    # Hooks sharing a hook name or a script file, directly or through other hooks, are reported as one conflict
+    conflicting_hooks = {index: {index} for index in range(len(targets))}
+    for key in (lambda hook: (hook.hook_name, hook.live_only), lambda hook: hook.get_script_file()):
+        first_hooks = {}
+        for index, target in enumerate(targets):
+            first_index = first_hooks.setdefault(key(target), index)
+            if conflicting_hooks[first_index] is not conflicting_hooks[index]:
+                merged = conflicting_hooks[first_index] | conflicting_hooks[index]
+                for merged_index in merged:
+                    conflicting_hooks[merged_index] = merged
+
+    groups = {id(group): group for group in conflicting_hooks.values() if len(group) > 1}
+    for group in groups.values():
+        hooks = [targets[index] for index in sorted(group)]
+        report.issues.append(ValidationIssue(
+            issue_type=IssueType.DUPLICATE_HOOK,
+            message=f"Hooks {', '.join(hook.hook_name for hook in hooks)} share hook names or script files "
+                    f"{', '.join(sorted({str(hook.get_script_file()) for hook in hooks}))}",
+        ))
@@ -0,0 +1,221 @@
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Iterable, Optional
+
+from lbutils import defaults
+from lbutils.auto_scripts.auto_scripts import AutoScriptType, write_auto_script
+from lbutils.copy_engine import reflink, hardlink, copy_file_range
+from lbutils.extensions import copy_bootloaders
+from lbutils.live_build import LBOperation, remove_build_dir, run_lb_operation
+from lbutils.plan import FileOperation
+from lbutils.target_writer import TargetHandler, TargetWriter, HookScriptWriter, create_target_handlers
+from lbutils.targets import Target, HookScript
+
+BASE_VARIANT_NAME = "base"
+"""
+Sub directory of the shared config tree under the variants build directory.
+"""
+
+@dataclass
+class ImageVariant:
+    """
+    An image variant built on top of targets shared by all variants.
+
+    :param str name: Variant name. Used as name of the variant's image build directory, so it must be a single path
+       component not starting with ``.``, and not be :const:`BASE_VARIANT_NAME`.
+    :param List targets: Targets only this variant has. Elements can be :class:`Target` or List[:class:`Target`].
+    """
+    name: str
+    targets: list = field(default_factory=list)
+
+
+def build_variants(
+    common_targets: list,
+    variants: List[ImageVariant],
+    variants_build_dir: Path = defaults.DEFAULT_ISO_BUILD_DIR,
+    distribution: str = defaults.DEFAULT_DISTRIBUTION,
+    image_name: str = defaults.DEFAULT_IMAGE_NAME,
+    skip_build: bool = False,
+    resolve_workers: int = defaults.DEFAULT_RESOLVE_WORKERS,
+    handler_workers: int = 1,
+) -> Dict[str, Path]:
+    """
+    Build several images sharing most of their targets. The shared config tree, i.e. auto scripts, ``lb config``
+    results and ``common_targets``, is written once to :const:`BASE_VARIANT_NAME` under ``variants_build_dir``.
+    It's then cloned to a build directory per variant with reflinks or hardlinks, and only targets of the variant
+    are written on top of it. Files a variant target writes to are unshared from the base before writing, so
+    variants never modify each other.
+
+    :param List common_targets: Targets of all variants. Elements can be :class:`Target` or List[:class:`Target`].
+    :param List[ImageVariant] variants: Variants to build.
+    :param pathlib.Path,Optional variants_build_dir: Directory containing build directories of the base and variants.
+    :param str distribution: Base Debian distribution for images. ``trixie`` by default.
+    :param str image_name: Name of images. ``myos`` by default.
+    :param bool skip_build: If ``True``, ``lb build`` won't run.
+    :param int resolve_workers: Number of threads resolving target callbacks. See :class:`TargetWriter`.
+    :param int handler_workers: Number of target handlers running at the same time. See :class:`TargetWriter`.
+    :return: Map of variant name to its image build directory.
+    :rtype: Dict[str, pathlib.Path]
+    """
+    variant_names = [variant.name for variant in variants]
+    for name in variant_names:
+        # Names are joined to variants_build_dir, whose sub directories are removed before writing
+        if not name or name.startswith(".") or "/" in name or "\0" in name:
+            raise Exception(f"Variant name {name!r} must be a single path component not starting with '.'")
+    if len(set(variant_names)) != len(variant_names) or BASE_VARIANT_NAME in variant_names:
+        raise Exception(f"Variant names must be unique and not be '{BASE_VARIANT_NAME}': {variant_names}")
+
+    base_build_dir = variants_build_dir / BASE_VARIANT_NAME
+
+    defaults.DEFAULT_LOGGER.info(f"Write base config tree to {base_build_dir}")
+    remove_build_dir(iso_build_dir=base_build_dir)
+    write_auto_script(
+        iso_build_dir=base_build_dir,
+        script_type=AutoScriptType.CONFIG,
+        distribution=distribution, image_name=image_name)
+    write_auto_script(iso_build_dir=base_build_dir, script_type=AutoScriptType.BUILD)
+    write_auto_script(iso_build_dir=base_build_dir, script_type=AutoScriptType.CLEAN)
+    run_lb_operation(operation=LBOperation.CONFIG, iso_build_dir=base_build_dir)
+
+    base_handlers = create_target_handlers(base_build_dir)
+    TargetWriter(
+        target_handlers=base_handlers,
+        targets=[common_targets, copy_bootloaders(iso_build_dir=base_build_dir)],
+        resolve_workers=resolve_workers,
+        handler_workers=handler_workers,
+    ).execute()
+    base_hook_writer: HookScriptWriter = base_handlers[HookScript]
+
+    variant_build_dirs = {}
+    for variant in variants:
+        variant_build_dir = variants_build_dir / variant.name
+
+        defaults.DEFAULT_LOGGER.info(f"Clone base config tree to {variant_build_dir}")
+        remove_build_dir(iso_build_dir=variant_build_dir)
+        clone_tree(base_build_dir, variant_build_dir)
+
+        # Hooks of the variant run after common hooks
+        variant_handlers = create_target_handlers(variant_build_dir)
+        variant_handlers[HookScript] = HookScriptWriter(
+            iso_build_dir=variant_build_dir,
+            live_hook_order_start=base_hook_writer.next_live_hook_order,
+            normal_hook_order_start=base_hook_writer.next_normal_hook_order,
+        )
+
+        defaults.DEFAULT_LOGGER.info(f"Write targets of variant {variant.name}")
+        TargetWriter(
+            target_handlers={
+                target_type: UnsharingTargetHandler(handler) for target_type, handler in variant_handlers.items()
+            },
+            targets=variant.targets,
+            resolve_workers=resolve_workers,
+            handler_workers=handler_workers,
+        ).execute()
+
+        variant_build_dirs[variant.name] = variant_build_dir
+
+    for variant_name, variant_build_dir in variant_build_dirs.items():
+        if not skip_build:
+            defaults.DEFAULT_LOGGER.info(f"Build variant {variant_name}")
+            run_lb_operation(operation=LBOperation.BUILD, iso_build_dir=variant_build_dir)
+        else:
+            defaults.DEFAULT_LOGGER.info(f"Skip build of variant {variant_name}")
+
+    return variant_build_dirs
+
+
+class UnsharingTargetHandler(TargetHandler):
+    """
+    Wraps a :class:`TargetHandler` to unshare hardlinked files under its output paths before writing, so writing
+    to a cloned tree never modifies the tree it's cloned from. The wrapped handler must report its output paths.
+
+    :param TargetHandler handler: Handler to wrap.
+    """
+    def __init__(self, handler: TargetHandler):
+        self.__handler = handler
+
+    def execute(self, targets: List[Target]):
+        if targets:
+            output_paths = self.__handler.output_paths(targets)
+            if output_paths is None:
+                raise Exception(
+                    f"Handler {type(self.__handler).__name__} doesn't report its output paths, "
+                    f"so it can't write to a cloned tree")
+            unshare_paths(output_paths)
+        self.__handler.execute(targets)
+
+    def output_paths(self, targets: List[Target]) -> Optional[List[Path]]:
+        return self.__handler.output_paths(targets)
+
+    def plan(self, targets: List[Target]) -> List[FileOperation]:
+        return self.__handler.plan(targets)
+
+    def unit_key(self, target: Target) -> str:
+        return self.__handler.unit_key(target)
+
+
+def clone_tree(source: Path, destination: Path):
+    """
+    Clone directory tree ``source`` to ``destination``. Files are reflinked if the filesystem supports it,
+    otherwise hardlinked, or copied if ``source`` and ``destination`` are on different filesystems.
+    Symlinks are recreated.
+
+    :param pathlib.Path source: Directory to clone.
+    :param pathlib.Path destination: Destination directory. Must not exist.
+    """
+    destination.mkdir(parents=True)
+
+    for dir_path, dir_names, filenames in os.walk(source):
+        relative_dir = Path(dir_path).relative_to(source)
+
+        for name in dir_names + filenames:
+            source_path = Path(dir_path, name)
+            destination_path = destination / relative_dir / name
+
+            if source_path.is_symlink():
+                os.symlink(os.readlink(source_path), destination_path)
+            elif source_path.is_dir():
+                destination_path.mkdir()
+                shutil.copystat(source_path, destination_path)
+            else:
+                _clone_file(source_path, destination_path)
+
+
+def _clone_file(source: Path, destination: Path):
+    if reflink(source, destination):
+        shutil.copystat(source, destination)
+    elif not hardlink(source, destination):
+        if not copy_file_range(source, destination):
+            shutil.copyfile(source, destination)
+        shutil.copystat(source, destination)
+
+
+def unshare_paths(paths: Iterable[Path]):
+    """
+    Replace hardlinked files under given paths with private copies.
+
+    :param Iterable[pathlib.Path] paths: Files or directories.
+    """
+    for path in paths:
+        if not path.exists() or path.is_symlink():
+            continue
+
+        if path.is_dir():
+            for dir_path, _, filenames in os.walk(path):
+                for filename in filenames:
+                    _unshare_file(Path(dir_path, filename))
+        else:
+            _unshare_file(path)
+
+
+def _unshare_file(path: Path):
+    stat = path.lstat()
+    if stat.st_nlink <= 1 or path.is_symlink():
+        return
+
+    defaults.DEFAULT_LOGGER.debug(f"Unsharing {path} ...")
+    temp_path = path.with_name(f".{path.name}.unshare")
+    shutil.copy2(path, temp_path)
+    os.replace(temp_path, path)
@@ -1,10 +1,14 @@
+import importlib
 import logging
+from dataclasses import dataclass, field
 from logging import Logger
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from typing import List, Set, Tuple
 
 import pytest
 
+from lbutils import DirectConfig
 from lbutils.logger import ConsoleHandler
 from shutil import rmtree
 
@@ -31,3 +35,37 @@ def test_iso_build_dir(logger: Logger):
             logger.debug(f'Cleaning up dangling tempdir {tempdir_path}')
             rmtree(tempdir_path)
             logger.debug(f'Tempdir {tempdir_path} removed')
+
+
+@dataclass
+class MockedLiveBuild:
+    # Operations are recorded with the name of their ISO build directory, other lb commands without the binary
+    operations: List[Tuple[str, str]] = field(default_factory=list)
+    commands: List[List[str]] = field(default_factory=list)
+    failing_operations: Set[str] = field(default_factory=set)
+
+    def run_lb_operation(self, operation, iso_build_dir):
+        self.operations.append((operation.value, iso_build_dir.name))
+        if operation.value in self.failing_operations:
+            raise Exception(f"lb {operation.value} failed")
+
+
+@pytest.fixture(scope="function")
+def mock_live_build(monkeypatch, tmp_path):
+    bootloader_dir = tmp_path / "bootloaders"
+    bootloader_dir.mkdir()
+    (bootloader_dir / "grub.cfg").write_text("grub\n")
+    live_build = MockedLiveBuild()
+
+    # lbutils.build_image is shadowed by the function exported from lbutils
+    for module in map(importlib.import_module, ("lbutils.build_image", "lbutils.variants")):
+        monkeypatch.setattr(
+            module, "copy_bootloaders",
+            lambda iso_build_dir: DirectConfig(
+                target_filepath=Path("/config/bootloaders"), get_source_file=lambda: bootloader_dir),
+        )
+        monkeypatch.setattr(module, "run_lb_operation", live_build.run_lb_operation)
+    monkeypatch.setattr(
+        "lbutils.live_build.run_command", lambda command, cwd: live_build.commands.append(command[1:]))
+
+    yield live_build
@@ -1,8 +1,9 @@
+import tempfile
 from tempfile import NamedTemporaryFile
 
 import pytest
 
-from lbutils import render_template_to_file, render_template_to_string
+from lbutils import render_template_to_file, render_template_to_string, get_template_environment
 from lbutils import escape_string_for_shell_script
 from lbutils import download_file
 from pathlib import Path
@@ -85,6 +86,47 @@ def test_render_template_to_string():
     assert rendered_template == content
 
 
+def test_template_environment_is_pooled(monkeypatch, tmp_path):
+    # Arrange
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    template = Path(str(files(__package__) / "template.j2"))
+
+    # Act
+    env = get_template_environment(template.parent)
+    same_env = get_template_environment(template.parent / ".")
+    cached_env = get_template_environment(template.parent, bytecode_cache=True)
+    cached_env.get_template(template.name)
+
+    # Assert
+    assert env is same_env
+    assert env.bytecode_cache is None
+    assert cached_env is not env
+    assert any(Path(cached_env.bytecode_cache.directory).iterdir())
+    assert Path(cached_env.bytecode_cache.directory).parent == tmp_path
+
+
+def test_render_template_to_file_renders_once(monkeypatch, tmp_path):
+    # Arrange
+    template = Path(str(files(__package__) / "template.j2"))
+    renders = []
+    render_template_to_string_ = render_template_to_string
+
+    def counted_render_template_to_string(template_path, **kwargs):
+        renders.append(template_path)
+        return render_template_to_string_(template_path, **kwargs)
+
+    monkeypatch.setattr("lbutils.file_helpers.render_template_to_string", counted_render_template_to_string)
+
+    # Act
+    rendered_template = render_template_to_file(
+        template_path=template, target_path=tmp_path / "rendered", content="some content",
+    )
+
+    # Assert
+    assert renders == [template]
+    assert rendered_template.read_text() == "some content"
+
+
 def test_escape_string_for_shell_script():
     # Arrange
     source_string = """
@@ -144,3 +144,36 @@ def test_success_run(test_data, test_iso_build_dir, subtests, logger):
         expected_files=test_data.expected_files,
         logger=logger,
     )
+
+
+def test_merge_duplicates(test_iso_build_dir):
+    # Arrange
+    targets = [
+        AptPreference(package="vim", pin="*", pin_priority=100, preference_type=AptPreferenceType.BUILD_TIME),
+        AptPreference(package="nano", pin="*", pin_priority=200, preference_type=AptPreferenceType.BUILD_TIME),
+        AptPreference(package="vim", pin="*", pin_priority=100, preference_type=AptPreferenceType.BUILD_TIME),
+        AptPreference(package="vim", pin="*", pin_priority=500, preference_type=AptPreferenceType.RUN_TIME),
+    ]
+
+    # Act
+    AptPreferencesWriter(iso_build_dir=test_iso_build_dir).execute(targets)
+
+    # Assert
+    assert (test_iso_build_dir / BUILD_TIME_APT_PREFERENCE_FILE).read_text() == \
+        "Package: vim\nPin: *\nPin-Priority: 100\n\nPackage: nano\nPin: *\nPin-Priority: 200\n\n"
+    assert (test_iso_build_dir / RUN_TIME_APT_PREFERENCE_FILE).read_text() == \
+        "Package: vim\nPin: *\nPin-Priority: 500\n\n"
+
+
+def test_conflicting_priorities(test_iso_build_dir):
+    # Arrange
+    targets = [
+        AptPreference(package="vim", pin="*", pin_priority=100, preference_type=AptPreferenceType.BUILD_TIME),
+        AptPreference(package="vim", pin="*", pin_priority=900, preference_type=AptPreferenceType.BUILD_TIME),
+    ]
+
+    # Act, Assert
+    with pytest.raises(Exception, match="vim pinned to \\* in build_time preferences has priorities 100 and 900"):
+        AptPreferencesWriter(iso_build_dir=test_iso_build_dir).execute(targets)
+
+    assert not (test_iso_build_dir / BUILD_TIME_APT_PREFERENCE_FILE).exists()
@@ -1,11 +1,14 @@
 from dataclasses import dataclass
+from pathlib import Path
 from typing import List
 
 import pytest
 
 from lbutils import CustomDeb
+from lbutils.deb_store import DebStore
 from lbutils.defaults import CHROOT_DEB_DIR
 from lbutils.target_writer import CustomDebWriter
+from tests.test_deb import write_deb
 from tests.validate_files import check_generated_files_expected, ExpectedFile
 
 
@@ -76,3 +79,32 @@ def test_success_run(test_data, generate_test_data, test_iso_build_dir, subtests
         expected_files=full_test_data.expected_files,
         logger=logger,
     )
+
+
+def test_deb_saved_under_canonical_name(tmp_path):
+    # Arrange
+    source_deb = write_deb(tmp_path / "hello-latest.deb")
+    iso_build_dir = tmp_path / "iso"
+
+    # Act
+    CustomDebWriter(iso_build_dir=iso_build_dir, dpkg_name_binary=Path("/nonexistent/dpkg-name")).execute(
+        [CustomDeb(get_deb=lambda: source_deb)])
+
+    # Assert
+    assert sorted(path.name for path in (iso_build_dir / CHROOT_DEB_DIR).iterdir()) == ["hello_2.10-3_amd64.deb"]
+
+
+def test_deb_linked_from_deb_store(tmp_path):
+    # Arrange
+    source_deb = write_deb(tmp_path / "hello-latest.deb")
+    deb_store = DebStore(tmp_path / "store")
+    iso_build_dirs = [tmp_path / "first", tmp_path / "second"]
+
+    # Act
+    for iso_build_dir in iso_build_dirs:
+        CustomDebWriter(iso_build_dir=iso_build_dir, deb_store=deb_store).execute([CustomDeb(get_deb=lambda: source_deb)])
+
+    # Assert
+    first_deb, second_deb = [iso_build_dir / CHROOT_DEB_DIR / "hello_2.10-3_amd64.deb" for iso_build_dir in iso_build_dirs]
+    assert first_deb.samefile(second_deb)
+    assert first_deb.samefile(deb_store.entries()[0].path)
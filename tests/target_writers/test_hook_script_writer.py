@@ -1,4 +1,5 @@
 import random
+import subprocess
 import string
 from dataclasses import dataclass
 from typing import List
@@ -171,3 +172,40 @@ def test_no_overlap(
         assert collected_order not in checked_order, f"order {collected_order} conflicted"
         assert collected_order not in reserved_order
         checked_order.append(collected_order)
+
+
+def test_bundle(generate_test_files, test_iso_build_dir, tmp_path):
+    # Arrange
+    output_file = tmp_path / "output"
+    hook_contents = [
+        ["#!/bin/sh\n", f"echo first >> {output_file}\n"],
+        ["#!/bin/sh\n", f"echo second >> {output_file}\n", ": <<'LBUTILS_HOOK_EOF'\n", "LBUTILS_HOOK_EOF\n"],
+        # Builtin hook 1000 runs before
+        ["#!/bin/sh\n", f"echo third >> {output_file}\n"],
+        ["#!/bin/sh\n", "exit 3\n", f"echo never >> {output_file}\n"],
+        ["binary hook\n"],
+    ]
+    targets = [
+        HookScript(get_script_file=lambda path=hook_file: path, hook_name=f"hook{i + 1}")
+        for i, hook_file in enumerate(generate_test_files(contents=hook_contents))
+    ]
+    writer = HookScriptWriter(iso_build_dir=test_iso_build_dir, normal_hook_order_start=998, bundle=True)
+
+    # Act
+    writer.execute(targets)
+
+    # Assert
+    hooks_dir = test_iso_build_dir / NORMAL_HOOKS_DIR
+    assert sorted(path.name for path in hooks_dir.iterdir()) == [
+        "0998-bundle-hook1.hook.chroot",
+        "1001-bundle-hook3.hook.chroot",
+        "1003-hook5.hook.chroot",
+    ]
+    assert writer.next_normal_hook_order == 1004
+
+    first_bundle = subprocess.run(["sh", hooks_dir / "0998-bundle-hook1.hook.chroot"], capture_output=True, text=True)
+    assert first_bundle.returncode == 0
+    second_bundle = subprocess.run(["sh", hooks_dir / "1001-bundle-hook3.hook.chroot"], capture_output=True, text=True)
+    assert second_bundle.returncode == 3
+    assert "E: Bundled hook 1002-hook4 failed with exit code 3" in second_bundle.stderr
+    assert output_file.read_text() == "first\nsecond\nthird\n"
@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+
+from lbutils import StaticFile, UpstreamPackages
+from lbutils.defaults import CHROOT_INCLUDE_DIR, PACKAGE_LIST_DIR
+from lbutils.manifest import BuildManifest
+from lbutils.target_writer import TargetWriter, StaticFileWriter, UpstreamPackagesWriter
+
+
+def write_incrementally(iso_build_dir: Path, targets: list) -> BuildManifest:
+    manifest = BuildManifest.load(iso_build_dir)
+    TargetWriter(
+        target_handlers={
+            StaticFile: StaticFileWriter(iso_build_dir=iso_build_dir),
+            UpstreamPackages: UpstreamPackagesWriter(iso_build_dir=iso_build_dir),
+        },
+        targets=targets,
+        manifest=manifest,
+    ).execute()
+
+    return BuildManifest.load(iso_build_dir)
+
+
+def test_skip_unchanged_targets(generate_test_files, test_iso_build_dir):
+    # Arrange
+    source_file, = generate_test_files(contents=[["file1\n"]])
+    targets = [
+        StaticFile(target_filepath=Path("/etc/file1"), get_source_file=lambda: source_file),
+        UpstreamPackages(packages=["vim"], package_set_code="editor"),
+    ]
+    output_file = test_iso_build_dir / CHROOT_INCLUDE_DIR / "etc" / "file1"
+
+    write_incrementally(test_iso_build_dir, targets)
+    first_mtime = output_file.stat().st_mtime_ns
+
+    # Act
+    manifest = write_incrementally(test_iso_build_dir, targets)
+
+    # Assert
+    assert output_file.stat().st_mtime_ns == first_mtime
+    assert (test_iso_build_dir / PACKAGE_LIST_DIR / "editor.list.chroot").read_text() == "vim\n"
+
+    entries = [entry for unit in manifest.units.values() for entry in unit.outputs]
+    assert sorted(entry.path for entry in entries) == sorted([
+        str(CHROOT_INCLUDE_DIR / "etc" / "file1"),
+        str(PACKAGE_LIST_DIR / "editor.list.chroot"),
+    ])
+
+
+def test_rewrite_changed_targets(generate_test_files, test_iso_build_dir):
+    # Arrange
+    source_file, = generate_test_files(contents=[["file1\n"]])
+    targets = [
+        StaticFile(target_filepath=Path("/etc/file1"), get_source_file=lambda: source_file),
+        UpstreamPackages(packages=["vim"], package_set_code="editor"),
+    ]
+    write_incrementally(test_iso_build_dir, targets)
+
+    # Act
+    source_file.write_text("changed\n")
+    targets[1].packages.append("nano")
+    write_incrementally(test_iso_build_dir, targets)
+
+    # Assert
+    assert (test_iso_build_dir / CHROOT_INCLUDE_DIR / "etc" / "file1").read_text() == "changed\n"
+    assert (test_iso_build_dir / PACKAGE_LIST_DIR / "editor.list.chroot").read_text() == "vim\nnano\n"
+
+
+def test_remove_deleted_targets(generate_test_files, test_iso_build_dir):
+    # Arrange
+    source_file_1, source_file_2 = generate_test_files(contents=[["file1\n"], ["file2\n"]])
+    targets = [
+        StaticFile(target_filepath=Path("/etc/file1"), get_source_file=lambda: source_file_1),
+        StaticFile(target_filepath=Path("/opt/app/file2"), get_source_file=lambda: source_file_2),
+    ]
+    write_incrementally(test_iso_build_dir, targets)
+
+    # Act
+    manifest = write_incrementally(test_iso_build_dir, targets[:1])
+
+    # Assert
+    assert (test_iso_build_dir / CHROOT_INCLUDE_DIR / "etc" / "file1").exists()
+    assert not (test_iso_build_dir / CHROOT_INCLUDE_DIR / "opt").exists()
+    assert len(manifest.units) == 1
+
+
+def test_rewrite_outputs_modified_with_same_size(generate_test_files, test_iso_build_dir):
+    # Arrange
+    source_file, = generate_test_files(contents=[["file1\n"]])
+    targets = [StaticFile(target_filepath=Path("/etc/file1"), get_source_file=lambda: source_file)]
+    write_incrementally(test_iso_build_dir, targets)
+    output_file = test_iso_build_dir / CHROOT_INCLUDE_DIR / "etc" / "file1"
+    output_file.write_text("edit1\n")
+    os.utime(output_file, ns=(0, 0))
+
+    # Act
+    write_incrementally(test_iso_build_dir, targets)
+
+    # Assert
+    assert output_file.read_text() == "file1\n"
@@ -1,4 +1,11 @@
-from lbutils.targets import Target
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from lbutils.manifest import BuildManifest
+from lbutils.targets import Target, StaticFile
 from lbutils.target_writer import TargetHandler, TargetWriter
 
 
@@ -23,3 +30,205 @@ def test_target_writer():
     ).execute()
 
     assert len(handler.received_target) == 3
+
+
+def test_resolve_callbacks_concurrently(generate_test_files):
+    # Arrange
+    source_files = generate_test_files(contents=[["file1\n"], ["file2\n"]])
+    # Both callbacks must be running at the same time to pass the barrier
+    barrier = threading.Barrier(len(source_files), timeout=10)
+
+    def get_source_file(path):
+        barrier.wait()
+        return path
+
+    handler = MockedTargetHandler()
+
+    # Act
+    TargetWriter(
+        target_handlers={
+            StaticFile: handler.execute
+        },
+        targets=[
+            StaticFile(target_filepath=path, get_source_file=lambda path=path: get_source_file(path))
+            for path in source_files
+        ],
+        resolve_workers=2,
+    ).execute()
+
+    # Assert
+    assert [target.get_source_file() for target in handler.received_target] == source_files
+
+
+def test_resolve_callbacks_in_calling_thread_by_default():
+    # Arrange
+    threads = []
+
+    def get_source_file():
+        threads.append(threading.current_thread())
+        return Path("/source")
+
+    handler = MockedTargetHandler()
+
+    # Act
+    TargetWriter(
+        target_handlers={
+            StaticFile: handler.execute
+        },
+        targets=[StaticFile(target_filepath=Path(f"/{name}"), get_source_file=get_source_file) for name in "ab"],
+    ).execute()
+
+    # Assert
+    assert threads == [threading.current_thread()] * 2
+
+
+def test_resolve_errors_are_aggregated():
+    # Arrange
+    def fail(message):
+        raise ValueError(message)
+
+    handler = MockedTargetHandler()
+
+    # Act
+    with pytest.raises(ExceptionGroup) as exc_info:
+        TargetWriter(
+            target_handlers={
+                StaticFile: handler.execute
+            },
+            targets=[
+                StaticFile(target_filepath=Path("/a"), get_source_file=lambda: fail("a")),
+                StaticFile(target_filepath=Path("/b"), get_source_file=lambda: fail("b")),
+            ],
+        ).execute()
+
+    # Assert
+    assert sorted(str(e) for e in exc_info.value.exceptions) == ["a", "b"]
+    assert handler.received_target is None
+
+
+class MockedOtherTarget(Target):
+    pass
+
+
+class PathsTargetHandler(TargetHandler):
+    def __init__(self, paths, on_execute):
+        self.__paths = paths
+        self.__on_execute = on_execute
+
+    def execute(self, targets):
+        self.__on_execute()
+
+    def output_paths(self, targets):
+        return self.__paths
+
+
+def test_run_independent_handlers_concurrently():
+    # Arrange
+    # Both handlers must be running at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=10)
+
+    # Act
+    TargetWriter(
+        target_handlers={
+            MockedTarget: PathsTargetHandler([Path("/iso/config/hooks")], barrier.wait),
+            MockedOtherTarget: PathsTargetHandler([Path("/iso/config/package-lists")], barrier.wait),
+        },
+        targets=[MockedTarget(), MockedOtherTarget()],
+        handler_workers=2,
+    ).execute()
+
+
+def test_serialize_overlapped_handlers():
+    # Arrange
+    executed = []
+    first_handler_started = threading.Event()
+
+    def first_handler():
+        first_handler_started.set()
+        # Give the second handler a chance to start if it is not blocked
+        time.sleep(0.1)
+        executed.append("first")
+
+    def second_handler():
+        assert first_handler_started.is_set()
+        executed.append("second")
+
+    # Act
+    TargetWriter(
+        target_handlers={
+            MockedTarget: PathsTargetHandler([Path("/iso/config/includes.chroot")], first_handler),
+            MockedOtherTarget: PathsTargetHandler(
+                [Path("/iso/config/includes.chroot/etc/apt/preferences")], second_handler),
+        },
+        targets=[MockedTarget(), MockedOtherTarget()],
+        handler_workers=2,
+    ).execute()
+
+    # Assert
+    assert executed == ["first", "second"]
+
+
+def test_handler_with_unknown_outputs(tmp_path):
+    # Arrange
+    handler = MockedTargetHandler()
+    targets = [MockedTarget()]
+
+    # Act
+    build_plan = TargetWriter(target_handlers={MockedTarget: handler}, targets=targets).plan()
+    for _ in range(2):
+        handler.received_target = None
+        TargetWriter(
+            target_handlers={MockedTarget: handler},
+            targets=targets,
+            manifest=BuildManifest.load(tmp_path),
+        ).execute()
+
+    # Assert
+    assert build_plan.operations == []
+    # Handlers with unknown outputs are executed in full on every incremental write
+    assert handler.received_target == targets
+
+
+class MockedSubTarget(MockedTarget):
+    pass
+
+
+def test_collect_nested_iterables_lazily():
+    # Arrange
+    handler = MockedTargetHandler()
+    consumed = []
+
+    def generate_targets():
+        for i in range(3):
+            consumed.append(i)
+            yield MockedTarget()
+
+    # Deeper than the recursion limit
+    deeply_nested = [MockedSubTarget()]
+    for _ in range(5000):
+        deeply_nested = [deeply_nested]
+
+    # Act
+    TargetWriter(
+        target_handlers={
+            MockedTarget: handler.execute
+        },
+        targets=[generate_targets(), (MockedTarget() for _ in range(2)), deeply_nested],
+        resolve_workers=1,
+    ).execute()
+
+    # Assert
+    assert consumed == [0, 1, 2]
+    assert len(handler.received_target) == 6
+    assert type(handler.received_target[-1]) is MockedSubTarget
+
+
+def test_unknown_target_type():
+    # Act / Assert
+    with pytest.raises(Exception, match="Unknown target type"):
+        TargetWriter(
+            target_handlers={
+                MockedTarget: MockedTargetHandler().execute
+            },
+            targets=[MockedTarget(), "not a target"],
+        ).execute()
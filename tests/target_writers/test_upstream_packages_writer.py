@@ -4,7 +4,7 @@ import pytest
 
 from lbutils import UpstreamPackages, PackagePriority
 from lbutils.defaults import PACKAGE_LIST_DIR
-from lbutils.target_writer import UpstreamPackagesWriter
+from lbutils.target_writer import UpstreamPackagesWriter, DuplicatePackage
 from tests.validate_files import check_generated_files_expected, ExpectedFile
 from dataclasses import dataclass
 
@@ -79,7 +79,59 @@ def success_run_test_data():
                 ]
             ),
             id="multiple package sets",
-        )
+        ),
+
+        pytest.param(
+            UpstreamPackagesTestData(
+                targets=[
+                    UpstreamPackages(
+                        packages=[
+                            "vim",
+                            "nano",
+                            "vim",
+                        ],
+                        package_set_code="editor",
+                    ),
+                    UpstreamPackages(
+                        packages=[
+                            "vim",
+                            "emacs",
+                        ],
+                        package_set_code="editor-extra",
+                    ),
+                    UpstreamPackages(
+                        packages=[
+                            "nano",
+                            "live-tools",
+                        ],
+                        package_set_code="editor",
+                        live_only=True,
+                    ),
+                ],
+                expected_files=[
+                    ExpectedFile(
+                        file_path=target_sub_dir / "editor.list.chroot",
+                        content=[
+                            "vim\n",
+                            "nano\n",
+                        ]
+                    ),
+                    ExpectedFile(
+                        file_path=target_sub_dir / "editor-extra.list.chroot",
+                        content=[
+                            "emacs\n",
+                        ]
+                    ),
+                    ExpectedFile(
+                        file_path=target_sub_dir / "editor.list.chroot_live",
+                        content=[
+                            "live-tools\n",
+                        ]
+                    ),
+                ]
+            ),
+            id="duplicated packages",
+        ),
     ]
 
 @pytest.mark.parametrize("test_data", success_run_test_data())
@@ -148,3 +200,46 @@ def test_priority(subtests, test_data, test_iso_build_dir, logger):
         expected_files=test_data.expected_files,
         logger=logger,
     )
+
+
+def test_duplicates_report(test_iso_build_dir):
+    # Arrange
+    writer = UpstreamPackagesWriter(iso_build_dir=test_iso_build_dir)
+
+    # Act
+    writer.execute([
+        UpstreamPackages(packages=["vim"], package_set_code="live", live_only=True),
+        UpstreamPackages(packages=["vim", "vim"], package_set_code="editor"),
+        UpstreamPackages(packages=["vim"], package_set_code="required", priority=PackagePriority.REQUIRED),
+    ])
+
+    # Assert
+    assert writer.duplicates == [
+        DuplicatePackage(package="vim", package_set_code="editor", first_package_set_code="editor"),
+        DuplicatePackage(package="vim", package_set_code="required", first_package_set_code="editor"),
+        DuplicatePackage(package="vim", package_set_code="live", first_package_set_code="editor"),
+    ]
+    assert (test_iso_build_dir / target_sub_dir / "live.list.chroot_live").read_text() == ""
+    assert (test_iso_build_dir / target_sub_dir / "required.list.chroot").read_text() == \
+        f"! Packages Priority {PackagePriority.REQUIRED}\n\n"
+
+
+def test_directives_and_conditional_packages_are_kept(test_iso_build_dir):
+    # Arrange
+    writer = UpstreamPackagesWriter(iso_build_dir=test_iso_build_dir)
+    conditional_packages = [
+        "#if ARCHITECTURES amd64", "firmware-misc-nonfree", "#endif", "#nif ARCHITECTURES amd64", "vim", "#endif",
+    ]
+
+    # Act
+    writer.execute([
+        UpstreamPackages(packages=["vim", *conditional_packages], package_set_code="base"),
+        UpstreamPackages(packages=[*conditional_packages, "firmware-misc-nonfree", "vim"], package_set_code="extra"),
+    ])
+
+    # Assert
+    assert writer.duplicates == [
+        DuplicatePackage(package="vim", package_set_code="extra", first_package_set_code="base"),
+    ]
+    assert (test_iso_build_dir / target_sub_dir / "extra.list.chroot").read_text().splitlines() == \
+        [*conditional_packages, "firmware-misc-nonfree"]
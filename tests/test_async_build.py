@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from pathlib import Path
+
+import pytest
+
+from lbutils import BuildContext, StaticFile, build_image_async
+from lbutils.defaults import CHROOT_INCLUDE_DIR, DEFAULT_LOGGER
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def build_context(tmp_path):
+    def _build_context(name, lb_build_script="echo building"):
+        bootloader_dir = tmp_path / "bootloaders"
+        bootloader_dir.mkdir(exist_ok=True)
+        (bootloader_dir / "grub.cfg").write_text("grub\n")
+
+        live_build_binary = tmp_path / f"lb-{name}"
+        live_build_binary.write_text(
+            "#!/bin/sh\n"
+            "echo \"lb $1 in $(basename $(pwd))\"\n"
+            f"if [ \"$1\" = build ]; then {lb_build_script}; fi\n"
+        )
+        live_build_binary.chmod(0o755)
+
+        logger = logging.getLogger(f"lbutils-test-{name}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = RecordingHandler()
+        logger.addHandler(handler)
+
+        context = BuildContext(
+            iso_build_dir=tmp_path / name,
+            logger=logger,
+            live_build_binary=live_build_binary,
+            source_bootloader_dir=bootloader_dir,
+        )
+        return context, handler
+
+    yield _build_context
+
+
+def test_build_image_async(build_context, tmp_path):
+    # Arrange
+    source_file = tmp_path / "motd"
+    source_file.write_text("hello\n")
+    contexts = [build_context("first"), build_context("second")]
+    default_handler = RecordingHandler()
+    DEFAULT_LOGGER.addHandler(default_handler)
+
+    async def build_all():
+        await asyncio.gather(*[
+            build_image_async(
+                targets=[StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: source_file)],
+                context=context,
+            )
+            for context, _ in contexts
+        ])
+
+    # Act
+    try:
+        asyncio.run(build_all())
+    finally:
+        DEFAULT_LOGGER.removeHandler(default_handler)
+
+    # Assert
+    for context, handler in contexts:
+        name = context.iso_build_dir.name
+        assert (context.iso_build_dir / CHROOT_INCLUDE_DIR / "etc" / "motd").read_text() == "hello\n"
+        assert f"lb config in {name}" in handler.messages
+        assert f"lb build in {name}" in handler.messages
+        other_name = "second" if name == "first" else "first"
+        assert f"lb build in {other_name}" not in handler.messages
+
+    assert default_handler.messages == []
+
+
+def test_build_image_async_cancel(build_context, tmp_path):
+    # Arrange
+    pid_file = tmp_path / "pid"
+    context, handler = build_context("cancelled", lb_build_script=f"sleep 60 & echo $! > {pid_file}; wait")
+
+    async def build_and_cancel():
+        task = asyncio.create_task(build_image_async(targets=[], context=context))
+        while not pid_file.exists() or not pid_file.read_text().strip():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        await task
+
+    # Act
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(build_and_cancel())
+
+    # Assert
+    # Killed processes may be left as zombies until reaped by init
+    status_file = Path("/proc") / pid_file.read_text().strip() / "status"
+    assert not status_file.exists() or "State:\tZ" in status_file.read_text()
+    assert any(message.startswith("Terminating command") for message in handler.messages)
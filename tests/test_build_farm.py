@@ -0,0 +1,109 @@
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from lbutils.build_farm import BuildFarm, BuildJob, JobState
+from lbutils.locking import file_lock
+
+
+def create_targets() -> list:
+    return []
+
+
+@pytest.fixture
+def mock_build_image(monkeypatch):
+    builds = []
+    running = []
+    peak_running = []
+    lock = threading.Lock()
+
+    def _build_image(targets, iso_build_dir, fail=False, **kwargs):
+        with lock:
+            running.append(iso_build_dir)
+            peak_running.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(iso_build_dir)
+            builds.append(iso_build_dir.name)
+        if fail:
+            raise Exception(f"Build {iso_build_dir.name} failed")
+
+    monkeypatch.setattr(sys.modules["lbutils.build_farm"], "build_image", _build_image)
+    yield builds, peak_running
+
+
+def test_run_by_priority(mock_build_image, tmp_path):
+    # Arrange
+    builds, _ = mock_build_image
+    farm = BuildFarm(farm_dir=tmp_path, max_workers=1, executor_factory=ThreadPoolExecutor)
+    farm.submit(BuildJob(name="low", targets_factory=create_targets, priority=0))
+    farm.submit(BuildJob(name="high", targets_factory=create_targets, priority=10))
+    farm.submit(BuildJob(name="failing", targets_factory=create_targets, priority=5, build_options={"fail": True}))
+    farm.submit(BuildJob(name="cancelled", targets_factory=create_targets))
+    farm.cancel("cancelled")
+
+    # Act
+    results = farm.run()
+
+    # Assert
+    assert builds == ["high", "failing", "low"]
+    assert results["high"].state is JobState.SUCCEEDED
+    assert results["high"].iso_build_dir == tmp_path / "high"
+    assert results["failing"].state is JobState.FAILED
+    assert str(results["failing"].error) == "Build failing failed"
+    assert results["cancelled"].state is JobState.CANCELLED
+
+    metrics = farm.metrics()
+    assert (metrics.queued, metrics.running, metrics.succeeded, metrics.failed, metrics.cancelled) == (0, 0, 2, 1, 1)
+    assert metrics.peak_queued == 4
+
+
+def test_concurrency_limit(mock_build_image, tmp_path):
+    # Arrange
+    builds, peak_running = mock_build_image
+    farm = BuildFarm(farm_dir=tmp_path, max_workers=2, executor_factory=ThreadPoolExecutor)
+    for i in range(6):
+        farm.submit(BuildJob(name=f"job-{i}", targets_factory=create_targets))
+
+    # Act
+    farm.run()
+
+    # Assert
+    assert len(builds) == 6
+    assert max(peak_running) == 2
+
+
+def test_locked_build_dir(mock_build_image, tmp_path):
+    # Arrange
+    builds, _ = mock_build_image
+    farm = BuildFarm(
+        farm_dir=tmp_path, max_workers=1,
+        executor_factory=lambda max_workers: ProcessPoolExecutor(
+            max_workers, mp_context=multiprocessing.get_context("fork")),
+    )
+    farm.submit(BuildJob(name="locked", targets_factory=create_targets))
+    farm.submit(BuildJob(name="free", targets_factory=create_targets))
+
+    # Act
+    with file_lock(tmp_path / ".locks" / "locked.lock"):
+        results = farm.run()
+
+    # Assert
+    assert results["locked"].state is JobState.FAILED
+    assert "is used by another job" in str(results["locked"].error)
+    assert results["free"].state is JobState.SUCCEEDED
+
+
+@pytest.mark.parametrize("name", ["", ".", "..", "../escaped", "/tmp/escaped", "nested/job", ".locks"])
+def test_reject_job_names_outside_farm_dir(name, tmp_path):
+    # Arrange
+    farm = BuildFarm(farm_dir=tmp_path / "farm", max_workers=1)
+
+    # Act / Assert
+    with pytest.raises(Exception, match="must be a single path component"):
+        farm.submit(BuildJob(name=name, targets_factory=create_targets))
@@ -0,0 +1,187 @@
+import functools
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from lbutils.callback_cache import CallbackCache, ENTRY_FILE, callback_key
+from lbutils.targets import StaticFile
+
+
+def write_source(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return path
+
+
+def counted(source, calls):
+    def callback():
+        calls.append(source.name)
+        return source
+    return callback
+
+
+def test_second_call_hits_cache(tmp_path):
+    # Arrange
+    callback_cache = CallbackCache(tmp_path / "cache")
+    source = write_source(tmp_path / "rendered" / "motd", "hello")
+    calls = []
+
+    # Act
+    first = callback_cache.cached(counted(source, calls), key="motd")()
+    second = callback_cache.cached(counted(source, calls), key="motd")()
+
+    # Assert
+    assert calls == ["motd"]
+    assert first != second
+    assert first.name == second.name == "motd"
+    assert first.read_text() == second.read_text() == "hello"
+
+
+def test_cache_directory_result(tmp_path):
+    # Arrange
+    callback_cache = CallbackCache(tmp_path / "cache")
+    write_source(tmp_path / "rendered" / "etc" / "motd", "hello")
+    os.symlink("motd", tmp_path / "rendered" / "etc" / "issue")
+
+    # Act
+    result = callback_cache.get("etc", lambda: tmp_path / "rendered" / "etc")
+
+    # Assert
+    assert result.name == "etc"
+    assert (result / "motd").read_text() == "hello"
+    assert os.readlink(result / "issue") == "motd"
+
+
+def test_expired_entry_is_recomputed(tmp_path):
+    # Arrange
+    callback_cache = CallbackCache(tmp_path / "cache", ttl=60)
+    source = write_source(tmp_path / "motd", "old")
+    callback_cache.get("motd", lambda: source)
+    entry_file = next((tmp_path / "cache").glob(f"*/{ENTRY_FILE}"))
+    metadata = json.loads(entry_file.read_text())
+    metadata["stored_at"] -= 120
+    entry_file.write_text(json.dumps(metadata))
+    source.write_text("new")
+
+    # Act
+    result = callback_cache.get("motd", lambda: source)
+
+    # Assert
+    assert result.read_text() == "new"
+
+
+def test_invalidate(tmp_path):
+    # Arrange
+    callback_cache = CallbackCache(tmp_path / "cache")
+    sources = {name: write_source(tmp_path / name, name) for name in ("first", "second")}
+    calls = []
+    for name, source in sources.items():
+        callback_cache.get(name, counted(source, calls))
+
+    # Act
+    callback_cache.invalidate("first")
+    for name, source in sources.items():
+        callback_cache.get(name, counted(source, calls))
+    callback_cache.invalidate()
+    callback_cache.get("second", counted(sources["second"], calls))
+
+    # Assert
+    assert calls == ["first", "second", "first", "second"]
+
+
+def test_prune_least_recently_used(tmp_path):
+    # Arrange
+    callback_cache = CallbackCache(tmp_path / "cache", max_bytes=12)
+    sources = {name: write_source(tmp_path / name, name * 2) for name in ("old", "new")}
+    sources["latest"] = write_source(tmp_path / "latest", "latest")
+    calls = []
+    for name in ("old", "new"):
+        callback_cache.get(name, counted(sources[name], calls))
+    for time, name in enumerate(("old", "new"), start=1):
+        entry_file = next(
+            entry_file for entry_file in (tmp_path / "cache").glob(f"*/{ENTRY_FILE}")
+            if json.loads(entry_file.read_text())["key"] == name
+        )
+        os.utime(entry_file, (time, time))
+    # Hits record usage
+    callback_cache.get("old", counted(sources["old"], calls))
+    calls.clear()
+
+    # Act
+    callback_cache.get("latest", counted(sources["latest"], calls))
+    for name in ("old", "new"):
+        callback_cache.get(name, counted(sources[name], calls))
+
+    # Assert
+    assert calls == ["latest", "new"]
+
+
+def test_results_survive_pruning(tmp_path):
+    # Arrange
+    callback_cache = CallbackCache(tmp_path / "cache", max_bytes=150)
+    first = callback_cache.get("first", lambda: write_source(tmp_path / "first", "a" * 100))
+
+    # Act
+    callback_cache.get("second", lambda: write_source(tmp_path / "second", "b" * 100))
+
+    # Assert
+    assert first.read_text() == "a" * 100
+
+
+class Fetch:
+    def __init__(self, url):
+        self.url = url
+
+    def __repr__(self):
+        return f"Fetch({self.url!r})"
+
+    def get(self):
+        return self.url
+
+
+def test_callback_key_follows_callback_identity():
+    # Arrange
+    def make_callback(name):
+        return lambda: name
+
+    # Act
+    first_key = callback_key(make_callback("a"))
+    same_key = callback_key(make_callback("a"))
+    other_key = callback_key(make_callback("b"))
+    default_key = callback_key(lambda name="a": name)
+    other_default_key = callback_key(lambda name="b": name)
+    method_key = callback_key(Fetch("a").get)
+    same_method_key = callback_key(Fetch("a").get)
+    other_method_key = callback_key(Fetch("b").get)
+
+    # Assert
+    assert first_key == same_key
+    assert first_key != other_key
+    assert default_key != other_default_key
+    assert method_key == same_method_key
+    assert method_key != other_method_key
+
+
+def test_callback_key_refuses_unidentifiable_callbacks():
+    # Act / Assert
+    with pytest.raises(Exception, match="explicit cache key"):
+        callback_key(functools.partial(print, "a"))
+
+
+def test_cache_target(tmp_path):
+    # Arrange
+    callback_cache = CallbackCache(tmp_path / "cache")
+    source = write_source(tmp_path / "motd", "hello")
+    target = StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: source)
+    callback_cache.cache_target(target, key="motd").get_source_file()
+    # Callback would fail to be stored if it's called again
+    source.unlink()
+
+    # Act
+    cached_target = callback_cache.cache_target(target, key="motd")
+
+    # Assert
+    assert cached_target.target_filepath == target.target_filepath
+    assert cached_target.get_source_file().read_text() == "hello"
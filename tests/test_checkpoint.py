@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import pytest
+
+from lbutils import build_image, StaticFile, UpstreamPackages
+from lbutils.checkpoint import BuildCheckpoints, BuildPhase
+from lbutils.defaults import CHROOT_INCLUDE_DIR, PACKAGE_LIST_DIR, LB_STAGE_DIR, LB_CONFIG_STAGE_FILE
+
+
+def test_resume_build_image(mock_live_build, tmp_path):
+    # Arrange
+    iso_build_dir = tmp_path / "iso"
+    source_file = tmp_path / "motd"
+    source_file.write_text("hello\n")
+
+    def create_targets():
+        return [StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: source_file)]
+
+    mock_live_build.failing_operations.add("build")
+    with pytest.raises(Exception, match="lb build failed"):
+        build_image(targets=create_targets(), iso_build_dir=iso_build_dir, resume=True)
+    mock_live_build.failing_operations.clear()
+    mock_live_build.operations.clear()
+
+    # Act
+    build_image(targets=create_targets(), iso_build_dir=iso_build_dir, resume=True)
+    resumed_operations = list(mock_live_build.operations)
+    mock_live_build.operations.clear()
+
+    source_file.write_text("changed\n")
+    build_image(targets=create_targets(), iso_build_dir=iso_build_dir, resume=True)
+
+    # Assert
+    assert resumed_operations == [("build", "iso")]
+    assert mock_live_build.operations == [("build", "iso")]
+    assert (iso_build_dir / CHROOT_INCLUDE_DIR / "etc" / "motd").read_text() == "changed\n"
+    assert set(BuildCheckpoints.load(iso_build_dir).phases.keys()) == {phase.value for phase in BuildPhase}
+
+
+def test_resume_after_input_change(mock_live_build, tmp_path):
+    # Arrange
+    iso_build_dir = tmp_path / "iso"
+    build_image(targets=[], iso_build_dir=iso_build_dir, resume=True, skip_build=True)
+    mock_live_build.operations.clear()
+
+    # Act
+    build_image(targets=[], iso_build_dir=iso_build_dir, resume=True, distribution="bookworm")
+
+    # Assert
+    assert mock_live_build.operations == [("config", "iso"), ("build", "iso")]
+
+
+def test_resume_after_input_change_invalidates_stages(mock_live_build, tmp_path):
+    # Arrange
+    iso_build_dir = tmp_path / "iso"
+    source_file = tmp_path / "motd"
+    source_file.write_text("hello\n")
+    targets = [StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: source_file)]
+    build_image(targets=targets, iso_build_dir=iso_build_dir, resume=True)
+    # Stages recorded by lb build
+    (iso_build_dir / LB_STAGE_DIR).mkdir()
+    (iso_build_dir / LB_CONFIG_STAGE_FILE).touch()
+    (iso_build_dir / LB_STAGE_DIR / "bootstrap").touch()
+    mock_live_build.operations.clear()
+
+    # Act
+    build_image(targets=targets, iso_build_dir=iso_build_dir, resume=True, distribution="bookworm")
+
+    # Assert
+    assert mock_live_build.operations == [("config", "iso"), ("build", "iso")]
+    assert mock_live_build.commands == [["clean", "noauto", "--chroot", "--binary"]]
+    assert [stage_file.name for stage_file in (iso_build_dir / LB_STAGE_DIR).iterdir()] == ["config"]
+
+
+def test_resume_replaces_outputs_of_changed_targets(mock_live_build, tmp_path):
+    # Arrange
+    iso_build_dir = tmp_path / "iso"
+    source_file = tmp_path / "motd"
+    source_file.write_text("hello\n")
+
+    build_image(
+        targets=[
+            UpstreamPackages(packages=["vim"], package_set_code="editors"),
+            StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: source_file),
+        ],
+        iso_build_dir=iso_build_dir, resume=True,
+    )
+    # Stages recorded by lb build
+    (iso_build_dir / LB_STAGE_DIR).mkdir()
+    (iso_build_dir / LB_CONFIG_STAGE_FILE).touch()
+    (iso_build_dir / LB_STAGE_DIR / "chroot_install-packages.install").touch()
+    mock_live_build.operations.clear()
+
+    # Act
+    build_image(
+        targets=[UpstreamPackages(packages=["vim", "nano"], package_set_code="editors")],
+        iso_build_dir=iso_build_dir, resume=True,
+    )
+
+    # Assert
+    package_lists = list((iso_build_dir / PACKAGE_LIST_DIR).iterdir())
+    assert [package_list.read_text().split() for package_list in package_lists] == [["vim", "nano"]]
+    assert not (iso_build_dir / CHROOT_INCLUDE_DIR / "etc" / "motd").exists()
+    assert mock_live_build.commands == [["clean", "noauto", "--chroot", "--binary"]]
+    assert [stage_file.name for stage_file in (iso_build_dir / LB_STAGE_DIR).iterdir()] == ["config"]
+    assert mock_live_build.operations == [("build", "iso")]
@@ -0,0 +1,236 @@
+import os
+
+import pytest
+
+from lbutils import StaticFile, CopyStrategy, SyncOptions
+from lbutils.copy_engine import CopyEngine
+from lbutils.defaults import CHROOT_INCLUDE_DIR
+from lbutils.target_writer import StaticFileWriter
+
+
+def write_tree(root, files):
+    for relative_path, content in files.items():
+        (root / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (root / relative_path).write_text(content)
+
+
+def test_copy_sparse_file_keeps_holes(tmp_path):
+    # Arrange
+    source = tmp_path / "sparse.img"
+    with open(source, "wb") as f:
+        f.write(b"head")
+        f.seek(64 * 1024 * 1024)
+        f.write(b"tail")
+    destination = tmp_path / "copy.img"
+    copy_engine = CopyEngine(strategy=CopyStrategy.COPY_FILE_RANGE)
+
+    # Act
+    used_strategy = copy_engine.copy_file(source, destination)
+
+    # Assert
+    assert used_strategy is CopyStrategy.COPY_FILE_RANGE
+    assert destination.read_bytes() == source.read_bytes()
+    assert destination.stat().st_blocks <= source.stat().st_blocks * 2
+
+
+def test_auto_never_hardlinks(tmp_path):
+    # Arrange
+    read_only = tmp_path / "read_only"
+    read_only.write_text("read only")
+    read_only.chmod(0o444)
+    writable = tmp_path / "writable"
+    writable.write_text("writable")
+    copy_engine = CopyEngine(strategy=CopyStrategy.AUTO)
+
+    # Act
+    read_only_strategy = copy_engine.copy_file(read_only, tmp_path / "read_only_copy")
+    writable_strategy = copy_engine.copy_file(writable, tmp_path / "writable_copy")
+
+    # Assert
+    assert CopyStrategy.HARDLINK not in (read_only_strategy, writable_strategy)
+    assert not os.path.samefile(read_only, tmp_path / "read_only_copy")
+    assert not os.path.samefile(writable, tmp_path / "writable_copy")
+    assert (tmp_path / "writable_copy").read_text() == "writable"
+    assert sum(copy_engine.report.files.values()) == 2
+    assert sum(copy_engine.report.bytes.values()) == len("read only") + len("writable")
+
+
+def test_default_strategy_copies(tmp_path):
+    # Arrange
+    source = tmp_path / "source"
+    source.write_text("content")
+    source.chmod(0o444)
+
+    # Act
+    used_strategy = CopyEngine().copy_file(source, tmp_path / "copy")
+
+    # Assert
+    assert used_strategy is CopyStrategy.COPY
+    assert not os.path.samefile(source, tmp_path / "copy")
+
+
+def test_copy_tree_preserves_symlinks_and_replaces_links(tmp_path):
+    # Arrange
+    source = tmp_path / "source"
+    (source / "sub").mkdir(parents=True)
+    (source / "sub" / "file").write_text("new")
+    (source / "link").symlink_to("sub/file")
+    destination = tmp_path / "destination"
+    (destination / "sub").mkdir(parents=True)
+    outside = tmp_path / "outside"
+    outside.write_text("outside")
+    os.link(outside, destination / "sub" / "file")
+
+    # Act
+    CopyEngine(strategy=CopyStrategy.COPY).copy(source, destination)
+
+    # Assert
+    assert (destination / "sub" / "file").read_text() == "new"
+    assert os.readlink(destination / "link") == "sub/file"
+    assert outside.read_text() == "outside"
+
+
+def test_copy_file_into_existing_directory(tmp_path):
+    # Arrange
+    source = tmp_path / "motd"
+    source.write_text("hello")
+    destination = tmp_path / "etc"
+    destination.mkdir()
+
+    # Act
+    CopyEngine().copy(source, destination)
+
+    # Assert
+    assert (destination / "motd").read_text() == "hello"
+
+
+def test_copy_missing_source(tmp_path):
+    # Arrange
+    destination = tmp_path / "destination" / "etc"
+
+    # Act / Assert
+    with pytest.raises(FileNotFoundError):
+        CopyEngine().copy(tmp_path / "missing", destination)
+    with pytest.raises(FileNotFoundError):
+        CopyEngine().sync(tmp_path / "missing", destination)
+    assert not (tmp_path / "destination").exists()
+
+
+def test_static_file_copy_strategy_overrides_engine_strategy(tmp_path):
+    # Arrange
+    source = tmp_path / "source"
+    source.write_text("content")
+    copy_engine = CopyEngine(strategy=CopyStrategy.HARDLINK)
+    writer = StaticFileWriter(iso_build_dir=tmp_path / "iso", copy_engine=copy_engine)
+    target = StaticFile(
+        get_source_file=lambda: source,
+        target_filepath=tmp_path / "etc" / "motd",
+        copy_strategy=CopyStrategy.COPY,
+    )
+
+    # Act
+    writer.execute([target])
+
+    # Assert
+    written = tmp_path / "iso" / CHROOT_INCLUDE_DIR / (tmp_path / "etc" / "motd").relative_to("/")
+    assert written.read_text() == "content"
+    assert not os.path.samefile(source, written)
+    assert copy_engine.report.files == {CopyStrategy.COPY: 1}
+
+
+def test_sync_skips_unchanged_files(tmp_path):
+    # Arrange
+    source = tmp_path / "source"
+    destination = tmp_path / "destination"
+    write_tree(source, {"a": "a", "sub/b": "b"})
+    (source / "link").symlink_to("a")
+    copy_engine = CopyEngine(strategy=CopyStrategy.COPY)
+    first_report = copy_engine.sync(source, destination)
+    (source / "sub" / "b").write_text("changed")
+
+    # Act
+    second_report = copy_engine.sync(source, destination)
+
+    # Assert
+    assert sorted(first_report.copied) == [destination / "a", destination / "link", destination / "sub" / "b"]
+    assert second_report.copied == [destination / "sub" / "b"]
+    assert sorted(second_report.skipped) == [destination / "a", destination / "link"]
+    assert (destination / "sub" / "b").read_text() == "changed"
+
+
+def test_sync_with_checksum_ignores_times(tmp_path):
+    # Arrange
+    source = tmp_path / "source"
+    destination = tmp_path / "destination"
+    write_tree(source, {"same": "same", "different": "old"})
+    write_tree(destination, {"same": "same", "different": "new"})
+
+    # Act
+    report = CopyEngine(strategy=CopyStrategy.COPY).sync(source, destination, checksum=True)
+
+    # Assert
+    assert report.copied == [destination / "different"]
+    assert report.skipped == [destination / "same"]
+    assert (destination / "different").read_text() == "old"
+
+
+def test_sync_deletes_extraneous_files(tmp_path):
+    # Arrange
+    source = tmp_path / "source"
+    destination = tmp_path / "destination"
+    write_tree(source, {"keep": "keep"})
+    write_tree(destination, {"keep": "keep", "stale": "stale", "stale_dir/file": "stale"})
+
+    # Act
+    report = CopyEngine(strategy=CopyStrategy.COPY).sync(source, destination, delete=True)
+
+    # Assert
+    assert report.deleted == [destination / "stale", destination / "stale_dir"]
+    assert sorted(path.name for path in destination.iterdir()) == ["keep"]
+    assert report.summary() == "1 copied, 0 skipped, 2 deleted"
+
+
+def test_static_file_sync(tmp_path):
+    # Arrange
+    source = tmp_path / "source"
+    write_tree(source, {"index.html": "docs"})
+    writer = StaticFileWriter(iso_build_dir=tmp_path / "iso", copy_engine=CopyEngine(strategy=CopyStrategy.COPY))
+    target = StaticFile(
+        get_source_file=lambda: source,
+        target_filepath=tmp_path / "docs",
+        sync=SyncOptions(delete=True),
+    )
+    written = tmp_path / "iso" / CHROOT_INCLUDE_DIR / (tmp_path / "docs").relative_to("/")
+    write_tree(written, {"stale.html": "stale"})
+
+    # Act
+    writer.execute([target])
+
+    # Assert
+    assert sorted(path.name for path in written.iterdir()) == ["index.html"]
+
+
+def test_parallel_copy_matches_sequential_copy(tmp_path):
+    # Arrange
+    source = tmp_path / "source"
+    write_tree(source, {f"dir{i}/file{j}": f"{i}-{j}" for i in range(10) for j in range(20)})
+    (source / "dir0" / "relative_link").symlink_to("file0")
+    (source / "dir_link").symlink_to("dir1")
+    (source / "dangling_link").symlink_to("missing")
+    copy_engine = CopyEngine(strategy=CopyStrategy.COPY, workers=4)
+
+    # Act
+    copy_engine.copy(source, tmp_path / "parallel")
+    CopyEngine(strategy=CopyStrategy.COPY, workers=1).copy(source, tmp_path / "sequential")
+
+    # Assert
+    def snapshot(root):
+        return {
+            str(path.relative_to(root)): os.readlink(path) if path.is_symlink() else
+            path.read_text() if path.is_file() else None
+            for path in root.rglob("*")
+        }
+
+    assert snapshot(tmp_path / "parallel") == snapshot(tmp_path / "sequential") == snapshot(source)
+    assert (tmp_path / "parallel" / "dir_link").is_symlink()
+    assert copy_engine.report.files == {CopyStrategy.COPY: 200}
@@ -0,0 +1,92 @@
+import io
+import tarfile
+
+import pytest
+import zstandard
+
+from lbutils.deb import read_deb_metadata, parse_control_fields, is_ar_archive
+
+
+CONTROL = """Package: hello
+Version: 1:2.10-3
+Architecture: amd64
+Maintainer: Someone <someone@example.com>
+Description: example package
+ with a long description
+"""
+
+
+def ar_member(name, content):
+    header = f"{name:<16}{0:<12}{0:<6}{0:<6}{100644:<8}{len(content):<10}`\n".encode("ascii")
+    return header + content + (b"\n" if len(content) % 2 else b"")
+
+
+def write_deb(path, control=CONTROL, compression="gz"):
+    control_tar = io.BytesIO()
+    # tarfile can't write zstd before Python 3.14
+    with tarfile.open(fileobj=control_tar, mode="w:" if compression == "zst" else f"w:{compression}") as tar:
+        content = control.encode()
+        tar_info = tarfile.TarInfo("./control")
+        tar_info.size = len(content)
+        tar.addfile(tar_info, io.BytesIO(content))
+    control_member = control_tar.getvalue()
+    if compression == "zst":
+        control_member = zstandard.ZstdCompressor().compress(control_member)
+
+    path.write_bytes(
+        b"!<arch>\n" +
+        ar_member("debian-binary", b"2.0\n") +
+        ar_member(f"control.tar.{compression}", control_member) +
+        ar_member("data.tar.xz", b"data")
+    )
+    return path
+
+
+@pytest.mark.parametrize("compression", ["gz", "xz", "zst"])
+def test_read_deb_metadata(tmp_path, compression):
+    # Arrange
+    deb_path = write_deb(tmp_path / "hello.deb", compression=compression)
+
+    # Act
+    metadata = read_deb_metadata(deb_path)
+
+    # Assert
+    assert (metadata.package, metadata.version, metadata.architecture) == ("hello", "1:2.10-3", "amd64")
+    assert metadata.canonical_name == "hello_2.10-3_amd64.deb"
+    assert metadata.fields["Description"] == "example package\nwith a long description"
+
+
+def test_read_zst_deb_metadata_without_zstandard(monkeypatch, tmp_path):
+    # Arrange
+    deb_path = write_deb(tmp_path / "hello.deb", compression="zst")
+    monkeypatch.setattr("lbutils.deb.zstandard", None)
+
+    # Act / Assert
+    with pytest.raises(Exception, match=r"zstd extra"):
+        read_deb_metadata(deb_path)
+
+
+def test_read_deb_metadata_without_required_fields(tmp_path):
+    # Arrange
+    deb_path = write_deb(tmp_path / "broken.deb", control="Package: broken\n")
+
+    # Act / Assert
+    with pytest.raises(Exception, match="misses fields"):
+        read_deb_metadata(deb_path)
+
+
+def test_parse_control_fields_reads_first_paragraph():
+    # Act
+    fields = parse_control_fields("\nPackage: a\nDepends: b,\n c\n\nPackage: d\n")
+
+    # Assert
+    assert fields == {"Package": "a", "Depends": "b,\nc"}
+
+
+def test_is_ar_archive(tmp_path):
+    # Arrange
+    (tmp_path / "text.deb").write_text("not a deb")
+
+    # Act / Assert
+    assert is_ar_archive(write_deb(tmp_path / "hello.deb"))
+    assert not is_ar_archive(tmp_path / "text.deb")
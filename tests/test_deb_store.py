@@ -0,0 +1,87 @@
+import os
+
+from lbutils.copy_engine import hardlink
+from lbutils.deb_store import DebStore
+from lbutils.fingerprint import hash_file
+from lbutils.locking import file_lock
+from tests.test_deb import write_deb
+
+
+def test_link_shares_one_stored_copy(tmp_path):
+    # Arrange
+    deb_store = DebStore(tmp_path / "store")
+    source_deb = write_deb(tmp_path / "hello.deb")
+    first_destination = tmp_path / "first" / "hello_2.10-3_amd64.deb"
+    second_destination = tmp_path / "second" / "hello_2.10-3_amd64.deb"
+    first_destination.parent.mkdir()
+    second_destination.parent.mkdir()
+
+    # Act
+    first_stored = deb_store.link(source_deb, first_destination)
+    second_stored = deb_store.link(source_deb, second_destination)
+
+    # Assert
+    assert first_stored == second_stored
+    assert first_stored.sha256 == hash_file(source_deb)
+    assert (first_stored.package, first_stored.version, first_stored.architecture) == ("hello", "1:2.10-3", "amd64")
+    assert os.path.samefile(first_destination, second_destination)
+    assert len(deb_store.entries()) == 1
+    assert deb_store.find(first_stored.sha256) == first_stored
+
+
+def test_store_non_deb_without_metadata(tmp_path):
+    # Arrange
+    deb_store = DebStore(tmp_path / "store")
+    (tmp_path / "fake.deb").write_text("fake")
+
+    # Act
+    stored_deb = deb_store.add(tmp_path / "fake.deb")
+
+    # Assert
+    assert stored_deb.package is None
+    assert stored_deb.path.read_text() == "fake"
+
+
+def test_prune_least_recently_used(tmp_path):
+    # Arrange
+    deb_store = DebStore(tmp_path / "store", max_bytes=12)
+    for name in ("old", "new"):
+        (tmp_path / name).write_bytes(name.encode() * 2)
+    old = deb_store.add(tmp_path / "old")
+    new = deb_store.add(tmp_path / "new")
+    os.utime(old.path, (1, 1))
+    os.utime(new.path, (2, 2))
+    (tmp_path / "latest").write_bytes(b"latest")
+
+    # Act
+    deb_store.add(tmp_path / "latest")
+
+    # Assert
+    assert deb_store.find(old.sha256) is None
+    assert deb_store.find(new.sha256) is not None
+    assert sorted(stored_deb.size for stored_deb in deb_store.entries()) == [6, 6]
+
+
+def test_link_holds_store_lock(monkeypatch, tmp_path):
+    # Arrange
+    deb_store = DebStore(tmp_path / "store")
+    source_deb = write_deb(tmp_path / "hello.deb")
+    lock_states = []
+
+    def locked_hardlink(source, destination):
+        # A concurrent prune can't take the lock while the stored deb is linked
+        try:
+            with file_lock(tmp_path / "store" / ".lock", blocking=False):
+                lock_states.append("free")
+        except BlockingIOError:
+            lock_states.append("held")
+        return hardlink(source, destination)
+
+    monkeypatch.setattr("lbutils.deb_store.hardlink", locked_hardlink)
+
+    # Act
+    deb_store.link(source_deb, tmp_path / "hello_2.10-3_amd64.deb")
+
+    # Assert
+    assert lock_states == ["held"]
+    assert (tmp_path / "hello_2.10-3_amd64.deb").read_bytes() == source_deb.read_bytes()
@@ -0,0 +1,73 @@
+from pathlib import Path
+
+from lbutils import StaticFile, UpstreamPackages, HookScript, freeze_target, thaw_target
+from lbutils.fingerprint import fingerprint_target, hash_path
+from lbutils.target_writer import TargetWriter
+
+
+def test_fingerprint_follows_source_content(tmp_path):
+    # Arrange
+    source = tmp_path / "motd"
+    source.write_text("hello")
+    target = StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: source)
+    first_fingerprint = fingerprint_target(target)
+
+    # Act
+    source.write_text("changed")
+
+    # Assert
+    assert fingerprint_target(target) != first_fingerprint
+    assert fingerprint_target(
+        StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: source)) == fingerprint_target(target)
+    assert fingerprint_target(
+        StaticFile(target_filepath=Path("/etc/issue"), get_source_file=lambda: source)) != fingerprint_target(target)
+
+
+def test_hash_path_of_directory(tmp_path):
+    # Arrange
+    (tmp_path / "dir" / "sub").mkdir(parents=True)
+    (tmp_path / "dir" / "sub" / "file").write_text("content")
+    (tmp_path / "dir" / "link").symlink_to("sub/file")
+    first_hash = hash_path(tmp_path / "dir")
+
+    # Act
+    (tmp_path / "dir" / "link").unlink()
+    (tmp_path / "dir" / "link").symlink_to("sub")
+
+    # Assert
+    assert hash_path(tmp_path / "dir") != first_hash
+
+
+def test_frozen_targets(tmp_path):
+    # Arrange
+    script = tmp_path / "hook.sh"
+    script.write_text("#!/bin/sh\n")
+    targets = [
+        UpstreamPackages(packages=["vim", "nano"], package_set_code="editor"),
+        HookScript(get_script_file=lambda: script, hook_name="hook"),
+    ]
+
+    # Act
+    frozen_targets = [freeze_target(target) for target in targets]
+
+    # Assert
+    assert frozen_targets[0].packages == ("vim", "nano")
+    assert isinstance(frozen_targets[0], UpstreamPackages)
+    assert len({frozen_targets[0], freeze_target(targets[0])}) == 1
+    assert not hasattr(frozen_targets[0], "__dict__")
+    assert [fingerprint_target(target) for target in frozen_targets] == [fingerprint_target(target) for target in targets]
+    assert thaw_target(frozen_targets[0]) == targets[0]
+
+
+def test_target_writer_handles_frozen_targets():
+    # Arrange
+    received = []
+
+    # Act
+    TargetWriter(
+        target_handlers={UpstreamPackages: received.extend},
+        targets=[freeze_target(UpstreamPackages(packages=["vim"], package_set_code="editor"))],
+    ).execute()
+
+    # Assert
+    assert [target.package_set_code for target in received] == ["editor"]
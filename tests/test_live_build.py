@@ -45,3 +45,69 @@ def test_remove_build_dir(mock_remove_dir, test_iso_build_dir):
 
     # Act
     remove_build_dir(test_iso_build_dir)
+
+
+def test_remove_build_dir_keep_cache(tmp_path):
+    # Arrange
+    iso_build_dir = tmp_path / "iso_build"
+    cached_package = iso_build_dir / "cache" / "packages.chroot" / "vim_9.1_amd64.deb"
+    cached_package.parent.mkdir(parents=True)
+    cached_package.write_bytes(b"vim")
+    (iso_build_dir / "config" / "hooks").mkdir(parents=True)
+    (iso_build_dir / "chroot").mkdir()
+    (iso_build_dir / "auto").write_text("auto")
+
+    # Act
+    remove_build_dir(iso_build_dir, keep_cache=True)
+
+    # Assert
+    assert [path.name for path in iso_build_dir.iterdir()] == ["cache"]
+    assert cached_package.read_bytes() == b"vim"
+
+
+def test_remove_build_dir_background(tmp_path):
+    # Arrange
+    iso_build_dir = tmp_path / "iso_build"
+    (iso_build_dir / "chroot" / "usr" / "bin").mkdir(parents=True)
+    (iso_build_dir / "chroot" / "usr" / "bin" / "sh").write_text("sh")
+    (iso_build_dir / "cache").mkdir()
+    stale_trash_dir = tmp_path / ".iso_build.trash-stale"
+    (stale_trash_dir / "chroot").mkdir(parents=True)
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+
+    # Act
+    thread = remove_build_dir(iso_build_dir, keep_cache=True, background=True)
+    thread.join()
+
+    # Assert
+    assert [path.name for path in iso_build_dir.iterdir()] == ["cache"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["iso_build", "other"]
+
+
+def test_remove_build_dir_removes_stale_trash_in_foreground(tmp_path):
+    # Arrange
+    iso_build_dir = tmp_path / "iso_build"
+    (iso_build_dir / "chroot").mkdir(parents=True)
+    stale_trash_dir = tmp_path / ".iso_build.trash-stale"
+    (stale_trash_dir / "chroot" / "usr").mkdir(parents=True)
+
+    # Act
+    thread = remove_build_dir(iso_build_dir)
+
+    # Assert
+    assert thread is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_background_removal_failures_are_logged(monkeypatch, tmp_path, caplog):
+    # Arrange
+    iso_build_dir = tmp_path / "iso_build"
+    (iso_build_dir / "chroot").mkdir(parents=True)
+    monkeypatch.setattr("lbutils.trash.shutil.rmtree", lambda path, ignore_errors: None)
+
+    # Act
+    remove_build_dir(iso_build_dir, background=True).join()
+
+    # Assert
+    assert "Failed to remove" in caplog.text
@@ -0,0 +1,60 @@
+import os
+
+from lbutils.package_cache import PackageCache
+
+
+def write_package(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+def test_save_and_restore(tmp_path):
+    # Arrange
+    package_cache = PackageCache(tmp_path / "shared")
+    first_build_dir = tmp_path / "first"
+    second_build_dir = tmp_path / "second"
+    downloaded = write_package(first_build_dir / "cache" / "packages.chroot" / "vim_9.1_amd64.deb", b"vim")
+    write_package(first_build_dir / "cache" / "packages.chroot" / "Packages", b"index")
+
+    # Act
+    package_cache.save(first_build_dir)
+    package_cache.restore(second_build_dir)
+
+    # Assert
+    restored = second_build_dir / "cache" / "packages.chroot" / "vim_9.1_amd64.deb"
+    assert restored.read_bytes() == b"vim"
+    assert os.path.samefile(restored, downloaded)
+    assert not (tmp_path / "shared" / "packages.chroot" / "Packages").exists()
+
+
+def test_restore_keeps_existing_packages(tmp_path):
+    # Arrange
+    package_cache = PackageCache(tmp_path / "shared")
+    write_package(tmp_path / "shared" / "packages.binary" / "grub_2.12_amd64.deb", b"shared")
+    existing = write_package(tmp_path / "build" / "cache" / "packages.binary" / "grub_2.12_amd64.deb", b"local")
+
+    # Act
+    package_cache.restore(tmp_path / "build")
+
+    # Assert
+    assert existing.read_bytes() == b"local"
+
+
+def test_prune_least_recently_used(tmp_path):
+    # Arrange
+    package_cache = PackageCache(tmp_path / "shared", max_bytes=6)
+    old = write_package(tmp_path / "shared" / "packages.chroot" / "old_1_all.deb", b"old")
+    used = write_package(tmp_path / "shared" / "packages.chroot" / "used_1_all.deb", b"use")
+    new = write_package(tmp_path / "shared" / "packages.bootstrap" / "new_1_all.deb", b"new")
+    os.utime(old, (1, 1))
+    os.utime(new, (2, 2))
+    os.utime(used, (3, 3))
+
+    # Act
+    package_cache.prune()
+
+    # Assert
+    assert not old.exists()
+    assert new.exists()
+    assert used.exists()
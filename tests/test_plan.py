@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from lbutils import build_image, StaticFile, UpstreamPackages, CustomDeb
+from lbutils.defaults import CHROOT_INCLUDE_DIR, PACKAGE_LIST_DIR
+from lbutils.plan import FileOperationType
+
+
+def test_plan_build_image(mock_live_build, tmp_path):
+    # Arrange
+    iso_build_dir = tmp_path / "iso"
+    source_dir = tmp_path / "source"
+    (source_dir / "sub").mkdir(parents=True)
+    (source_dir / "sub" / "file1").write_text("12345")
+    (source_dir / "link").symlink_to("sub/file1")
+    source_deb = tmp_path / "custom.deb"
+    source_deb.write_text("deb")
+
+    # Act
+    build_plan = build_image(
+        targets=[
+            StaticFile(target_filepath=Path("/opt/docs"), get_source_file=lambda: source_dir),
+            UpstreamPackages(packages=["vim", "nano"], package_set_code="editor"),
+            CustomDeb(get_deb=lambda: source_deb),
+        ],
+        iso_build_dir=iso_build_dir,
+        plan=True,
+    )
+
+    # Assert
+    assert not iso_build_dir.exists()
+
+    copied = {
+        operation.destination: operation.size for operation in build_plan.operations
+        if operation.operation_type is FileOperationType.COPY
+    }
+    assert copied[iso_build_dir / CHROOT_INCLUDE_DIR / "opt" / "docs" / "sub" / "file1"] == 5
+    assert copied[iso_build_dir / CHROOT_INCLUDE_DIR / "opt" / "docs" / "link"] == 0
+    assert build_plan.bytes_to_copy == 5 + 3 + len("grub\n")
+
+    appended = [
+        operation for operation in build_plan.operations if operation.operation_type is FileOperationType.APPEND
+    ]
+    assert [operation.destination for operation in appended] == [iso_build_dir / PACKAGE_LIST_DIR / "editor.list.chroot"]
+    assert appended[0].size == len("vim\nnano\n")
+
+    assert build_plan.file_counts()["StaticFileWriter"] == 2
+    assert [operation.command[1] for operation in build_plan.commands] == ["config", "build"]
+    assert mock_live_build.operations == []
@@ -0,0 +1,164 @@
+import gzip
+
+import pytest
+
+from lbutils import UpstreamPackages, CustomDeb, AptPreference, AptPreferenceType
+from lbutils.preflight import PackageIndex, check_packages, compare_versions, parse_dependencies, Dependency
+from tests.test_deb import write_deb
+
+PACKAGES = """Package: vim
+Version: 2:9.0.1378-2
+Architecture: amd64
+Depends: vim-common (= 2:9.0.1378-2), libc6 (>= 2.34)
+Installed-Size: 3800
+
+Package: vim-common
+Version: 2:9.0.1378-2
+Architecture: all
+Installed-Size: 400
+
+Package: libc6
+Version: 2.36-9
+Architecture: amd64
+Installed-Size: 12000
+
+Package: libc6
+Version: 2.37-1
+Architecture: amd64
+Installed-Size: 12500
+
+Package: libc6
+Version: 2.36-9
+Architecture: arm64
+Installed-Size: 11000
+
+Package: postfix
+Version: 3.7.10-0
+Architecture: amd64
+Provides: mail-transport-agent
+Depends: libc6
+Installed-Size: 4000
+
+Package: mutt
+Version: 2.2.9-1
+Architecture: amd64
+Depends: default-mta | mail-transport-agent, libnotmuch5
+Installed-Size: 7000
+"""
+
+
+@pytest.fixture
+def package_index(tmp_path):
+    index_dir = tmp_path / "mirror" / "dists" / "bookworm" / "main" / "binary-amd64"
+    index_dir.mkdir(parents=True)
+    (index_dir / "Packages.gz").write_bytes(gzip.compress(PACKAGES.encode()))
+    return PackageIndex.load([tmp_path / "mirror" / "dists"])
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("1.0", "1.0", 0),
+    ("1.0~rc1", "1.0", -1),
+    ("1:0.9", "2.0", 1),
+    ("1.0-1", "1.0-2", -1),
+    ("1.0+b1", "1.0", 1),
+    ("1.10", "1.9", 1),
+])
+def test_compare_versions(a, b, expected):
+    # Act
+    result = compare_versions(a, b)
+
+    # Assert
+    assert (result > 0) - (result < 0) == expected
+
+
+def test_parse_dependencies():
+    # Act
+    groups = parse_dependencies("libc6 (>= 2.34) [amd64], default-mta | mail-transport-agent, python3:any (> 3)")
+
+    # Assert
+    assert groups == [
+        [Dependency("libc6", ">=", "2.34")],
+        [Dependency("default-mta"), Dependency("mail-transport-agent")],
+        [Dependency("python3", ">=", "3")],
+    ]
+
+
+def test_check_resolves_dependencies(package_index):
+    # Act
+    report = check_packages([UpstreamPackages(packages=["vim"], package_set_code="editor")], package_index)
+
+    # Assert
+    assert report.errors == []
+    assert sorted(report.resolved) == ["libc6", "vim", "vim-common"]
+    assert report.resolved["libc6"].version == "2.37-1"
+    assert report.installed_size == 3800 + 400 + 12500
+
+
+def test_check_reports_missing_packages_and_unsatisfiable_dependencies(package_index):
+    # Act
+    report = check_packages(
+        [UpstreamPackages(packages=["mutt", "no-such-package"], package_set_code="mail")], package_index)
+
+    # Assert
+    assert report.errors == [
+        "Package no-such-package of package set mail is not found.",
+        "mutt 2.2.9-1 depends on libnotmuch5, which can't be satisfied.",
+    ]
+    assert "postfix" in report.resolved
+    with pytest.raises(ExceptionGroup):
+        report.raise_for_errors()
+
+
+def test_check_evaluates_package_list_directives(package_index):
+    # Act
+    report = check_packages(
+        [
+            UpstreamPackages(
+                packages=[
+                    "vim",
+                    "#if ARCHITECTURES arm64", "arm-only-firmware", "#endif",
+                    "#nif ARCHITECTURES arm64", "postfix", "#endif",
+                    "#if DISTRIBUTION trixie", "trixie-only-tool", "#endif",
+                    "#include <other.list.chroot>",
+                ],
+                package_set_code="base",
+            ),
+        ],
+        package_index,
+    )
+
+    # Assert
+    assert report.errors == []
+    assert report.warnings == [
+        "Conditional package trixie-only-tool of package set base is not found, it may not be installed anyway.",
+    ]
+    assert sorted(report.resolved) == ["libc6", "postfix", "vim", "vim-common"]
+
+
+def test_check_applies_version_pins(package_index):
+    # Act
+    report = check_packages(
+        [
+            UpstreamPackages(packages=["libc6"], package_set_code="base"),
+            AptPreference(
+                package="libc6", pin="version 2.37*", pin_priority=-1, preference_type=AptPreferenceType.BUILD_TIME),
+        ],
+        package_index,
+    )
+
+    # Assert
+    assert report.resolved["libc6"].version == "2.36-9"
+
+
+def test_check_custom_deb_dependencies(package_index, tmp_path):
+    # Arrange
+    deb_path = write_deb(
+        tmp_path / "tool.deb",
+        control="Package: tool\nVersion: 1.0\nArchitecture: amd64\nDepends: libc6 (>= 2.38)\nInstalled-Size: 10\n",
+    )
+
+    # Act
+    report = check_packages([CustomDeb(get_deb=lambda: deb_path)], package_index)
+
+    # Assert
+    assert report.errors == ["tool 1.0 depends on libc6 (>= 2.38), which can't be satisfied."]
@@ -0,0 +1,51 @@
+import json
+import threading
+
+from lbutils.trace import Tracer
+
+
+def test_export_spans(tmp_path):
+    # Arrange
+    tracer = Tracer()
+    trace_file = tmp_path / "trace.json"
+
+    # Act
+    with tracer.span("outer", iso_build_dir=tmp_path):
+        with tracer.span("inner"):
+            pass
+
+    def run_in_thread():
+        with tracer.span("in thread"):
+            pass
+
+    thread = threading.Thread(target=run_in_thread, name="worker")
+    thread.start()
+    thread.join()
+
+    tracer.export(trace_file)
+
+    # Assert
+    with open(trace_file) as f:
+        events = json.load(f)["traceEvents"]
+
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert set(spans.keys()) == {"outer", "inner", "in thread"}
+    assert spans["outer"]["args"] == {"iso_build_dir": str(tmp_path)}
+    assert spans["outer"]["ts"] <= spans["inner"]["ts"]
+    assert spans["inner"]["ts"] + spans["inner"]["dur"] <= spans["outer"]["ts"] + spans["outer"]["dur"]
+
+    thread_names = {event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert thread_names[spans["in thread"]["tid"]] == "worker"
+    assert thread_names[spans["outer"]["tid"]] == threading.current_thread().name
+
+
+def test_disabled_tracer_records_nothing():
+    # Arrange
+    tracer = Tracer(enabled=False)
+
+    # Act
+    with tracer.span("span"):
+        pass
+
+    # Assert
+    assert tracer.events == []
@@ -0,0 +1,81 @@
+from pathlib import Path
+
+from lbutils import StaticFile, DirectConfig, UpstreamPackages, HookScript, AptPreference, AptPreferenceType
+from lbutils.target_writer import TargetWriter, create_target_handlers
+from lbutils.validation import IssueType
+
+
+def validate(iso_build_dir, targets):
+    return TargetWriter(
+        target_handlers=create_target_handlers(iso_build_dir), targets=targets, resolve_workers=1,
+    ).validate()
+
+
+def test_valid_targets(tmp_path):
+    # Act
+    report = validate(tmp_path, [
+        StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: tmp_path / "motd"),
+        StaticFile(target_filepath=Path("/etc/issue"), get_source_file=lambda: tmp_path / "issue"),
+        UpstreamPackages(packages=["vim"], package_set_code="editor"),
+        UpstreamPackages(packages=["nano"], package_set_code="other-editor"),
+        HookScript(get_script_file=lambda: tmp_path / "a.sh", hook_name="a"),
+        HookScript(get_script_file=lambda: tmp_path / "b.sh", hook_name="b"),
+    ])
+
+    # Assert
+    assert report.issues == []
+    report.raise_for_issues()
+
+
+def test_conflicting_targets(tmp_path):
+    # Act
+    report = validate(tmp_path, [
+        StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: tmp_path / "motd"),
+        StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: tmp_path / "other_motd"),
+        StaticFile(target_filepath=Path("/opt/docs"), get_source_file=lambda: tmp_path / "docs"),
+        StaticFile(target_filepath=Path("/opt/docs/index.html"), get_source_file=lambda: tmp_path / "index.html"),
+        DirectConfig(target_filepath=Path("/config/hooks/live/0001-extra.hook.chroot"),
+                     get_source_file=lambda: tmp_path / "extra"),
+        UpstreamPackages(packages=["vim"], package_set_code="editor"),
+        UpstreamPackages(packages=["nano"], package_set_code="editor", live_only=True),
+        HookScript(get_script_file=lambda: tmp_path / "a.sh", hook_name="a"),
+        HookScript(get_script_file=lambda: tmp_path / "a.sh", hook_name="a"),
+    ])
+
+    # Assert
+    issue_types = sorted(issue.issue_type for issue in report.issues)
+    assert issue_types == sorted([
+        IssueType.OVERLAPPING_OUTPUT,  # Same static file path
+        IssueType.SHADOWED_FILE,  # index.html inside docs
+        IssueType.OVERLAPPING_OUTPUT,  # Direct config inside hook directory
+        IssueType.DUPLICATE_PACKAGE_SET,
+        IssueType.DUPLICATE_HOOK,  # Hook name and script file
+    ])
+
+
+def test_apt_preferences_only_own_their_preference_file(tmp_path):
+    # Act
+    report = validate(tmp_path, [
+        AptPreference(package="vim", pin="release n=trixie", pin_priority=900,
+                      preference_type=AptPreferenceType.BUILD_TIME),
+        StaticFile(target_filepath=Path("/etc/apt"), get_source_file=lambda: tmp_path / "apt"),
+    ])
+
+    # Assert
+    assert report.issues == []
+
+
+def test_hooks_sharing_names_or_scripts_are_reported_once(tmp_path):
+    # Act
+    report = validate(tmp_path, [
+        HookScript(get_script_file=lambda: tmp_path / "a.sh", hook_name="a"),
+        HookScript(get_script_file=lambda: tmp_path / "a.sh", hook_name="b"),
+        HookScript(get_script_file=lambda: tmp_path / "c.sh", hook_name="b"),
+        HookScript(get_script_file=lambda: tmp_path / "d.sh", hook_name="d"),
+        HookScript(get_script_file=lambda: tmp_path / "d.sh", hook_name="e"),
+    ])
+
+    # Assert
+    assert [issue.issue_type for issue in report.issues] == [IssueType.DUPLICATE_HOOK] * 2
+    assert report.issues[0].message.startswith("Hooks a, b, b share")
+    assert report.issues[1].message.startswith("Hooks d, e share")
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+
+from lbutils import StaticFile, UpstreamPackages, HookScript
+from lbutils.defaults import CHROOT_INCLUDE_DIR, PACKAGE_LIST_DIR, NORMAL_HOOKS_DIR
+from lbutils.variants import ImageVariant, build_variants, BASE_VARIANT_NAME
+
+
+def test_build_variants(mock_live_build, tmp_path):
+    # Arrange
+    common_file, server_file, desktop_hook = tmp_path / "common", tmp_path / "server", tmp_path / "hook"
+    common_file.write_text("common\n")
+    server_file.write_text("server\n")
+    desktop_hook.write_text("hook\n")
+    variants_build_dir = tmp_path / "variants"
+
+    # Act
+    variant_build_dirs = build_variants(
+        common_targets=[
+            StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: common_file),
+            UpstreamPackages(packages=["vim"], package_set_code="base"),
+            HookScript(get_script_file=lambda: common_file, hook_name="common"),
+        ],
+        variants=[
+            ImageVariant(name="desktop", targets=[
+                UpstreamPackages(packages=["gnome"], package_set_code="base"),
+                HookScript(get_script_file=lambda: desktop_hook, hook_name="desktop"),
+            ]),
+            ImageVariant(name="server", targets=[
+                StaticFile(target_filepath=Path("/etc/motd"), get_source_file=lambda: server_file),
+            ]),
+        ],
+        variants_build_dir=variants_build_dir,
+    )
+
+    # Assert
+    base_build_dir = variants_build_dir / BASE_VARIANT_NAME
+    desktop_build_dir = variant_build_dirs["desktop"]
+    server_build_dir = variant_build_dirs["server"]
+
+    assert mock_live_build.operations == [("config", BASE_VARIANT_NAME), ("build", "desktop"), ("build", "server")]
+
+    motd = CHROOT_INCLUDE_DIR / "etc" / "motd"
+    assert (base_build_dir / motd).read_text() == "common\n"
+    assert (desktop_build_dir / motd).read_text() == "common\n"
+    assert (server_build_dir / motd).read_text() == "server\n"
+
+    package_list = PACKAGE_LIST_DIR / "base.list.chroot"
+    assert (base_build_dir / package_list).read_text() == "vim\n"
+    assert (desktop_build_dir / package_list).read_text() == "vim\ngnome\n"
+    assert (server_build_dir / package_list).read_text() == "vim\n"
+
+    assert sorted(path.name for path in (desktop_build_dir / NORMAL_HOOKS_DIR).iterdir()) == [
+        "0001-common.hook.chroot", "0002-desktop.hook.chroot"]
+
+
+def test_reject_duplicated_variant_names(tmp_path):
+    with pytest.raises(Exception):
+        build_variants(
+            common_targets=[],
+            variants=[ImageVariant(name="desktop"), ImageVariant(name="desktop")],
+            variants_build_dir=tmp_path,
+        )
+
+
+@pytest.mark.parametrize("name", ["", "..", "../escaped", "/tmp/escaped", "nested/variant", ".hidden", BASE_VARIANT_NAME])
+def test_reject_variant_names_outside_variants_build_dir(name, tmp_path):
+    # Arrange
+    variants_build_dir = tmp_path / "variants"
+
+    # Act / Assert
+    with pytest.raises(Exception, match="must be"):
+        build_variants(common_targets=[], variants=[ImageVariant(name=name)], variants_build_dir=variants_build_dir)
+    assert not variants_build_dir.exists()